@@ -1,94 +1,303 @@
 import os
+import sys
 import json
-import uuid
+import time
+import atexit
+import threading
+from collections import Counter
 from datetime import datetime, timezone
 
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, g, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
 
-from emotai import AIAgent
+from history import (
+    HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, decode_cursor, history_page, history_statement,
+)
+from models import db, create_schema, Message, Feedback, valid_rating
+import identity
+import integrations
+import metrics
+import migrations
+import purge
+import rollups
+import runtime
+from profiler import SamplingProfiler
+from writebehind import MessageRecord, WriteBehindWriter
 
 # --- Load .env file if present ---
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = "supersecret"
-CORS(app)
+app.secret_key = identity.SECRET_KEY
+CORS(app, expose_headers=[identity.TOKEN_HEADER])
 
 # --- SQLite database setup ---
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///emotiai.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = runtime.DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+db.init_app(app)
 
-# --- SQLAlchemy Models ---
-class User(db.Model):
-    id = db.Column(db.String, primary_key=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+agent = runtime.build_agent()
+sentence_cache = agent.sentiment.cache
+analysis_pool = agent.pool
+preferences = agent.preferences
 
-class Message(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String, db.ForeignKey('user.id'))
-    text = db.Column(db.Text)
-    suggestion = db.Column(db.Text)  # JSON: {"emojis":[], "explanation":"", ...}
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+MAX_BATCH_SIZE = int(os.getenv("EMOTAI_MAX_BATCH_SIZE", "1000"))
 
-class Feedback(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
-    user_id = db.Column(db.String, db.ForeignKey('user.id'))
-    rating = db.Column(db.Integer)  # 1=bad, 2=ok, 3=good
-    comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+# Commits that find the SQLite database locked are retried with backoff
+DB_COMMIT_RETRIES = int(os.getenv("EMOTAI_DB_COMMIT_RETRIES", "3"))
+DB_RETRY_DELAY = float(os.getenv("EMOTAI_DB_RETRY_DELAY", "0.01"))
 
-with app.app_context():
-    db.create_all()
+profiler = SamplingProfiler()
 
-agent = AIAgent()
+user_tokens = identity.UserTokens()
+known_users = identity.KnownUsers()
+revoked_users = identity.RevokedUsers()
+runtime.register_user_metrics(known_users)
+
+purger = purge.Purger(app, preferences=preferences)
+atexit.register(purger.shutdown)
+
+webhooks = integrations.init_app(app, agent)
+atexit.register(webhooks.shutdown)
+
+# Optional write-behind persistence for /suggest: the response goes out
+# right after analysis and a background thread batches the inserts
+write_behind = None
+if os.getenv("EMOTAI_WRITE_BEHIND", "0") == "1":
+    write_behind = WriteBehindWriter(
+        app,
+        max_size=int(os.getenv("EMOTAI_WRITE_BEHIND_QUEUE", "10000")),
+        batch_size=int(os.getenv("EMOTAI_WRITE_BEHIND_BATCH", "500")),
+        flush_interval=float(os.getenv("EMOTAI_WRITE_BEHIND_INTERVAL", "0.05")),
+        policy=os.getenv("EMOTAI_WRITE_BEHIND_POLICY", "block"),
+        users=known_users,
+    )
+    atexit.register(write_behind.shutdown)
+    metrics.REGISTRY.register(metrics.Gauge(
+        "emotai_write_behind_queue_depth", "Messages waiting for the write-behind writer.",
+    ).set_function(lambda: write_behind.snapshot()["queue_depth"]))
+
+# Schema creation runs once, from warm_up() or else the first request,
+# instead of at import time
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            with app.app_context():
+                create_schema()
+            _schema_ready = True
+
+@app.before_request
+def before_request():
+    g.request_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    ensure_schema()
+
+@app.after_request
+def record_request(response):
+    if g.get("new_user_id"):
+        # Lets clients without cookies keep the identity
+        response.headers[identity.TOKEN_HEADER] = user_tokens.issue(g.new_user_id)
+    # Labelled by route pattern, so ids in URLs don't create new series
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.REQUESTS.labels(route, request.method, response.status_code).inc()
+    if "request_start" in g:
+        metrics.REQUEST_SECONDS.labels(route, request.method).observe(time.perf_counter() - g.request_start)
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    if "request_start" in g:
+        metrics.IN_FLIGHT.dec()
+
+def warm_up():
+    # Post-fork hook for process managers (e.g. gunicorn's post_worker_init):
+    # creates the schema and loads the analysis backends so the worker's
+    # first request is served at warm latency
+    ensure_schema()
+    agent.warm_up()
+    webhooks.start()
 
 def get_user_id():
-    if "user_id" not in session:
-        user_id = str(uuid.uuid4())
+    # From the signed token or session cookie, without touching the
+    # database (bar the periodic revocation refresh); a new id's user row
+    # is written with its first write. Purged ids start over as new users.
+    if revoked_users.due():
+        revoked_users.refresh(db.session)
+    user_id = user_tokens.verify(request.headers.get(identity.TOKEN_HEADER))
+    if user_id is not None and not revoked_users.is_revoked(user_id):
+        source = "token"
+    elif "user_id" in session and not revoked_users.is_revoked(session["user_id"]):
+        user_id, source = session["user_id"], "session"
+    else:
+        user_id, source = identity.new_user_id(), "new"
         session["user_id"] = user_id
-        if not User.query.get(user_id):
-            db.session.add(User(id=user_id))
-            db.session.commit()
-    return session["user_id"]
+        g.new_user_id = user_id
+    metrics.USER_IDS.labels(source).inc()
+    return user_id
+
+def add_user(user_id):
+    # In a write transaction: the user row, unless it is known to exist.
+    # Call known_users.add([user_id]) once it has committed.
+    identity.insert_users(db.session, known_users.missing([user_id]))
+
+def commit_with_retry(work):
+    # Runs work() (which adds to the session) and commits; when SQLite is
+    # locked by another writer the transaction is rolled back and redone
+    for attempt in range(DB_COMMIT_RETRIES + 1):
+        try:
+            result = work()
+            with metrics.DB_COMMIT.time():
+                db.session.commit()
+            return result
+        except OperationalError as exc:
+            db.session.rollback()
+            if attempt == DB_COMMIT_RETRIES or "locked" not in str(exc.orig):
+                raise
+            metrics.DB_RETRIES.inc()
+            time.sleep(DB_RETRY_DELAY * 2 ** attempt)
+
+def save_message(user_id, message, suggestion_dict):
+    # Persists one suggestion (queued in write-behind mode); returns the
+    # (message_id, created_at) to hand back to the client
+    if preferences is not None:
+        preferences.record_usage(user_id, suggestion_dict["emojis"])
+    if write_behind is not None:
+        record = MessageRecord(
+            id=write_behind.ids.next_id(),
+            user_id=user_id,
+            text=message,
+            suggestion=suggestion_dict,
+            created_at=datetime.now(timezone.utc),
+        )
+        write_behind.submit(record)
+        return record.id, record.created_at
+
+    def work():
+        add_user(user_id)
+        msg_obj = Message.from_suggestion(user_id, message, suggestion_dict)
+        db.session.add(msg_obj)
+        rollups.apply_counts(rollups.message_counts(suggestion_dict))
+        return msg_obj
+
+    msg_obj = commit_with_retry(work)
+    known_users.add([user_id])
+    return msg_obj.id, msg_obj.created_at
 
 @app.route("/suggest", methods=["POST"])
 def suggest():
     data = request.get_json()
     message = data.get("message", "")
+    # "explain": false skips building the explanation strings
+    explain = data.get("explain", True) is not False
     user_id = get_user_id()
-    suggestion = agent.suggest_emojis(message, username=user_id)
-    msg_obj = Message(
-        user_id=user_id,
-        text=message,
-        suggestion=json.dumps(suggestion.dict())
-    )
-    db.session.add(msg_obj)
-    db.session.commit()
+    suggestion = agent.suggest_emojis(message, username=user_id, explain=explain)
+    start = time.perf_counter()
     result = suggestion.dict()
-    result["created_at"] = msg_obj.created_at.isoformat()
-    result["message_id"] = msg_obj.id
-    return jsonify(result)
+    serialize = time.perf_counter() - start
+    message_id, created_at = save_message(user_id, message, dict(result))
+    result["created_at"] = created_at.isoformat()
+    result["message_id"] = message_id
+    start = time.perf_counter()
+    response = jsonify(result)
+    metrics.SERIALIZE.observe(serialize + time.perf_counter() - start)
+    return response
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route("/suggest/stream", methods=["POST"])
+def suggest_stream():
+    # Server-Sent Events: one "sentence" event per sentence as soon as it is
+    # analyzed, then a "done" event with the stored message's id
+    data = request.get_json()
+    message = data.get("message", "")
+    explain = data.get("explain", True) is not False
+    user_id = get_user_id()
+
+    def generate():
+        config = agent.sentiment.config
+        results = []
+        for result in agent.iter_suggestions(message, username=user_id, explain=explain, config=config):
+            results.append(result)
+            yield sse_event("sentence", {"index": len(results) - 1, **result})
+        suggestion = agent.combine(message, results, config.version).dict()
+        message_id, created_at = save_message(user_id, message, dict(suggestion))
+        yield sse_event("done", {
+            "message_id": message_id,
+            "created_at": created_at.isoformat(),
+            "emojis": suggestion["emojis"],
+            "sentiment": suggestion["sentiment"],
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/suggest/batch", methods=["POST"])
+def suggest_batch():
+    data = request.get_json()
+    messages = data.get("messages")
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({"error": "messages must be a list of strings"}), 400
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"at most {MAX_BATCH_SIZE} messages per batch"}), 400
+    user_id = get_user_id()
+    explain = data.get("explain", True) is not False
+    suggestions = [s.dict() for s in agent.suggest_emojis_batch(messages, username=user_id, explain=explain)]
+    if preferences is not None:
+        preferences.record_usage(user_id, [e for s in suggestions for e in s["emojis"]])
+    counts = Counter()
+    for suggestion in suggestions:
+        counts.update(rollups.message_counts(suggestion))
+
+    def work():
+        add_user(user_id)
+        msg_objs = [
+            Message.from_suggestion(user_id, message, suggestion)
+            for message, suggestion in zip(messages, suggestions)
+        ]
+        if write_behind is not None:
+            # Ids must come from the same allocator as queued messages
+            for msg_obj in msg_objs:
+                msg_obj.id = write_behind.ids.next_id()
+        db.session.add_all(msg_objs)
+        rollups.apply_counts(counts)
+        return msg_objs
+
+    msg_objs = commit_with_retry(work)
+    known_users.add([user_id])
+    results = []
+    for result, msg_obj in zip(suggestions, msg_objs):
+        result["created_at"] = msg_obj.created_at.isoformat()
+        result["message_id"] = msg_obj.id
+        results.append(result)
+    return jsonify({"results": results})
 
 @app.route("/history", methods=["GET"])
 def history():
     user_id = get_user_id()
-    messages = Message.query.filter_by(user_id=user_id).order_by(Message.created_at.desc()).all()
-    history = []
-    for msg in messages:
-        item = json.loads(msg.suggestion)
-        item["message"] = msg.text
-        item["created_at"] = msg.created_at.isoformat()
-        item["message_id"] = msg.id
-        feedback = Feedback.query.filter_by(message_id=msg.id, user_id=user_id).first()
-        if feedback:
-            item["feedback"] = {"rating": feedback.rating, "comment": feedback.comment}
-        history.append(item)
-    return jsonify({"history": history})
+    if write_behind is not None:
+        write_behind.flush()  # read-your-writes for just-suggested messages
+    try:
+        limit = min(int(request.args.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        cursor = request.args.get("cursor")
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "invalid limit or cursor"}), 400
+    if limit < 1:
+        return jsonify({"error": "invalid limit or cursor"}), 400
+    rows = db.session.execute(history_statement(user_id, position, limit)).all()
+    return jsonify(history_page(rows, limit))
 
 @app.route("/feedback", methods=["POST"])
 def feedback():
@@ -99,57 +308,190 @@ def feedback():
     comment = data.get("comment", "")
     if not message_id or not rating:
         return jsonify({"error": "message_id and rating required"}), 400
-    fb = Feedback.query.filter_by(message_id=message_id, user_id=user_id).first()
-    if fb:
-        fb.rating = rating
-        fb.comment = comment
-        fb.created_at = datetime.now(timezone.utc)
-    else:
-        fb = Feedback(
-            message_id=message_id, user_id=user_id,
-            rating=rating, comment=comment
-        )
-        db.session.add(fb)
-    db.session.commit()
+    if not valid_rating(rating):
+        return jsonify({"error": "rating must be 1, 2 or 3"}), 400
+    if write_behind is not None and write_behind.is_pending(message_id):
+        write_behind.flush()
+
+    def work():
+        # Returns the rating this replaces, if any
+        fb = Feedback.query.filter_by(message_id=message_id, user_id=user_id).first()
+        previous = fb.rating if fb else None
+        if fb:
+            # The old rating comes off the hour it was counted in
+            rollups.apply_counts(rollups.rating_counts(None, fb.rating), when=fb.created_at)
+            rollups.apply_counts(rollups.rating_counts(rating))
+            fb.rating = rating
+            fb.comment = comment
+            fb.created_at = datetime.now(timezone.utc)
+        else:
+            fb = Feedback(
+                message_id=message_id, user_id=user_id,
+                rating=rating, comment=comment
+            )
+            db.session.add(fb)
+            rollups.apply_counts(rollups.rating_counts(rating))
+        add_user(user_id)
+        return previous
+
+    previous = commit_with_retry(work)
+    known_users.add([user_id])
+    if preferences is not None:
+        msg_obj = db.session.get(Message, message_id)
+        if msg_obj is not None and msg_obj.user_id == user_id:
+            emojis = json.loads(msg_obj.suggestion or "{}").get("emojis", [])
+            preferences.record_rating(user_id, emojis, rating, previous)
     return jsonify({"msg": "Feedback recorded"})
 
 @app.route("/analytics", methods=["GET"])
 def analytics():
-    emoji_counter = {}
-    sentiment_counter = {"positive": 0, "negative": 0, "neutral": 0, "other": 0}
-    feedback_counter = {1: 0, 2: 0, 3: 0}
-    messages = Message.query.all()
-    for msg in messages:
-        s = json.loads(msg.suggestion)
-        for emoji in s.get("emojis", []):
-            emoji_counter[emoji] = emoji_counter.get(emoji, 0) + 1
-        explanation = s.get("explanation", "")
-        if "positive" in explanation:
-            sentiment_counter["positive"] += 1
-        elif "negative" in explanation:
-            sentiment_counter["negative"] += 1
-        elif "neutral" in explanation:
-            sentiment_counter["neutral"] += 1
-        else:
-            sentiment_counter["other"] += 1
-    for fb in Feedback.query.all():
-        feedback_counter[fb.rating] = feedback_counter.get(fb.rating, 0) + 1
-    return jsonify({
-        "emoji_usage": [{"emoji": k, "count": v} for k, v in emoji_counter.items()],
-        "sentiment_stats": sentiment_counter,
-        "feedback_stats": feedback_counter,
-        "message_count": len(messages)
-    })
+    # Served from the rollup table; ?hours=N limits it to the last N hours
+    try:
+        hours = int(request.args["hours"]) if "hours" in request.args else None
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+    if hours is not None and hours < 1:
+        return jsonify({"error": "hours must be at least 1"}), 400
+    return jsonify(rollups.read_analytics(hours))
+
+@app.route("/stats/cache", methods=["GET"])
+def cache_stats():
+    if sentence_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **sentence_cache.stats()})
+
+@app.route("/stats/write_behind", methods=["GET"])
+def write_behind_stats():
+    if write_behind is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **write_behind.snapshot()})
+
+@app.route("/stats/pool", methods=["GET"])
+def pool_stats():
+    if analysis_pool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **analysis_pool.snapshot()})
+
+@app.route("/stats/model", methods=["GET"])
+def model_stats():
+    if agent.model is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **agent.model.snapshot()})
+
+@app.route("/stats/preferences", methods=["GET"])
+def preference_stats():
+    if preferences is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **preferences.snapshot()})
+
+@app.route("/stats/lexicon", methods=["GET"])
+def lexicon_stats():
+    return jsonify(agent.sentiment.config.info())
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/profiler", methods=["GET", "POST"])
+def admin_profiler():
+    # POST {"enabled": true, "interval_ms": 5} starts sampling, {"enabled":
+    # false} stops it; GET reports the hottest functions, or the collapsed
+    # stacks for a flame graph with ?format=folded
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "admin token required"}), 403
+    if request.method == "GET":
+        if request.args.get("format") == "folded":
+            return Response(profiler.folded(), mimetype="text/plain")
+        try:
+            top = int(request.args.get("top", 20))
+        except ValueError:
+            return jsonify({"error": "top must be an integer"}), 400
+        return jsonify(profiler.snapshot(top))
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get("enabled"), bool):
+        return jsonify({"error": "enabled must be true or false"}), 400
+    if data["enabled"]:
+        try:
+            interval = float(data.get("interval_ms", 5)) / 1000
+        except (TypeError, ValueError):
+            interval = 0
+        if not 0.001 <= interval <= 1:
+            return jsonify({"error": "interval_ms must be between 1 and 1000"}), 400
+        profiler.start(interval, include_idle=data.get("include_idle") is True)
+    else:
+        profiler.stop()
+    return jsonify(profiler.snapshot())
+
+@app.route("/admin/lexicon/reload", methods=["POST"])
+def reload_lexicon():
+    # Recompiles the lexicon file and swaps it in; in-flight requests finish
+    # on the version they started with
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "admin token required"}), 403
+    try:
+        changed = agent.sentiment.reload_config()
+    except (OSError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"reloaded": changed, **agent.sentiment.config.info()})
 
 @app.route("/delete_user_data", methods=["POST"])
 def delete_user_data():
     user_id = get_user_id()
-    Feedback.query.filter_by(user_id=user_id).delete()
-    Message.query.filter_by(user_id=user_id).delete()
-    User.query.filter_by(id=user_id).delete()
-    db.session.commit()
+    if write_behind is not None:
+        write_behind.flush()
+    data = request.get_json(silent=True) or {}
+    background = data.get("background", purge.BACKGROUND) is True
     session.pop("user_id", None)
-    return jsonify({"msg": "All your data has been deleted."})
+    known_users.discard(user_id)
+    revoked_users.revoke(db.session, user_id)
+    db.session.commit()
+    if background:
+        job = purger.submit(user_id)
+        return jsonify({
+            "msg": "Your data is being deleted.",
+            "status_url": f"/delete_user_data/status/{job.id}",
+            **job.info(),
+        }), 202
+    job = purger.run(purger.create(user_id))
+    return jsonify({"msg": "All your data has been deleted.", **job.info()})
+
+@app.route("/delete_user_data/status/<job_id>", methods=["GET"])
+def delete_user_data_status(job_id):
+    job = purger.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.info())
+
+@app.cli.command("messages-migrate")
+def messages_migrate():
+    """Fill the structured sentiment columns for messages stored before them."""
+    ensure_schema()
+    migrated = migrations.backfill_structured_sentiment(agent)
+    print(f"Migrated {migrated} messages; rebuilt {rollups.backfill()} rollup rows.")
+
+@app.cli.command("rollups-backfill")
+def rollups_backfill():
+    """Rebuild the analytics rollups from the message and feedback tables."""
+    ensure_schema()
+    print(f"Wrote {rollups.backfill()} rollup rows.")
+
+@app.cli.command("rollups-check")
+def rollups_check():
+    """Compare the analytics rollups against a full recount."""
+    ensure_schema()
+    mismatches = rollups.check()
+    for kind, key, stored, expected in mismatches:
+        print(f"{kind}/{key}: rollup={stored} recount={expected}")
+    if mismatches:
+        sys.exit(1)
+    print("Rollups match a full recount.")
+
+@app.cli.command("init-db")
+def init_db():
+    """Create the database schema, or add tables and columns missing from it."""
+    ensure_schema()
+    print("Schema is up to date.")
 
 if __name__ == "__main__":
+    warm_up()
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,433 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.datastructures import MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from db import PRAGMAS
+from history import (
+    HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, decode_cursor, history_page, history_statement,
+)
+from models import create_schema, Message, Feedback, valid_rating
+from profiler import SamplingProfiler
+import identity
+import metrics
+import purge
+import rollups
+import runtime
+
+# ASGI entry point serving the same contract as app.py on an asyncio event
+# loop:  uvicorn asgi:app --port 5000 (from the backend directory).
+# Database access goes through SQLAlchemy's asyncio extension; the
+# CPU-bound analysis runs on a thread pool so it never blocks the loop
+# (and on the process pool too when EMOTAI_WORKER_POOL_SIZE is set).
+
+engine = create_async_engine(
+    runtime.async_database_uri(),
+    pool_size=int(os.getenv("EMOTAI_ASGI_DB_POOL_SIZE", "10")),
+    connect_args={"timeout": 30},
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _record):
+        # Same settings as db.py's pool: WAL so /history and /analytics reads
+        # do not wait on /suggest commits
+        cursor = dbapi_connection.cursor()
+        for pragma in PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+agent = runtime.build_agent()
+profiler = SamplingProfiler()
+user_tokens = identity.UserTokens()
+known_users = identity.KnownUsers()
+revoked_users = identity.RevokedUsers()
+runtime.register_user_metrics(known_users)
+# Only the job registry: the batches run on the event loop (run_purge)
+purger = purge.Purger(preferences=agent.preferences)
+purge_tasks = set()
+# SQLite has a single writer; queueing writes on an asyncio lock is fair,
+# while many connections polling the file lock under busy_timeout starve.
+# Created per event loop in lifespan().
+write_lock = None
+
+
+@asynccontextmanager
+async def writing():
+    if write_lock is None:
+        yield
+        return
+    async with write_lock:
+        yield
+
+
+analysis_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMOTAI_ASGI_ANALYSIS_THREADS", "0")) or os.cpu_count(),
+    thread_name_prefix="emotai-analysis",
+)
+
+
+async def run_analysis(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(analysis_executor, fn, *args)
+
+
+def error(message, status_code=400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def get_user_id(request):
+    # Same as app.py: no database access (UserTokenMiddleware refreshes the
+    # revocations); UserTokenMiddleware hands a new id's token back in the
+    # response
+    user_id = user_tokens.verify(request.headers.get(identity.TOKEN_HEADER))
+    if user_id is not None and not revoked_users.is_revoked(user_id):
+        source = "token"
+    elif "user_id" in request.session and not revoked_users.is_revoked(request.session["user_id"]):
+        user_id, source = request.session["user_id"], "session"
+    else:
+        user_id, source = identity.new_user_id(), "new"
+        request.session["user_id"] = user_id
+        request.state.new_user_id = user_id
+    metrics.USER_IDS.labels(source).inc()
+    return user_id
+
+
+def add_user(session, user_id):
+    # For db.run_sync inside the write transaction, like app.add_user
+    identity.insert_users(session, known_users.missing([user_id]))
+
+
+async def json_body(request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def suggest(request):
+    data = await json_body(request)
+    message = data.get("message", "")
+    async with Session() as db:
+        user_id = get_user_id(request)
+        explain = data.get("explain", True) is not False
+        suggestion = await run_analysis(agent.suggest_emojis, message, user_id, explain)
+        start = time.perf_counter()
+        result = suggestion.dict()
+        serialize = time.perf_counter() - start
+        if agent.preferences is not None:
+            agent.preferences.record_usage(user_id, result["emojis"])
+        msg_obj = Message.from_suggestion(user_id, message, dict(result))
+        db.add(msg_obj)
+        async with writing():
+            await db.run_sync(add_user, user_id)
+            await db.run_sync(
+                lambda s: rollups.apply_counts(rollups.message_counts(result), session=s)
+            )
+            with metrics.DB_COMMIT.time():
+                await db.commit()
+        known_users.add([user_id])
+    result["created_at"] = msg_obj.created_at.isoformat()
+    result["message_id"] = msg_obj.id
+    start = time.perf_counter()
+    response = JSONResponse(result)
+    metrics.SERIALIZE.observe(serialize + time.perf_counter() - start)
+    return response
+
+
+async def history(request):
+    try:
+        limit = min(int(request.query_params.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        cursor = request.query_params.get("cursor")
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return error("invalid limit or cursor")
+    if limit < 1:
+        return error("invalid limit or cursor")
+    async with Session() as db:
+        user_id = get_user_id(request)
+        rows = (await db.execute(history_statement(user_id, position, limit))).all()
+    return JSONResponse(history_page(rows, limit))
+
+
+async def feedback(request):
+    data = await json_body(request)
+    message_id = data.get("message_id")
+    rating = data.get("rating")
+    comment = data.get("comment", "")
+    async with Session() as db:
+        user_id = get_user_id(request)
+        if not message_id or not rating:
+            return error("message_id and rating required")
+        if not valid_rating(rating):
+            return error("rating must be 1, 2 or 3")
+        async with writing():
+            fb = (await db.execute(
+                select(Feedback).filter_by(message_id=message_id, user_id=user_id).limit(1)
+            )).scalar()
+            if agent.preferences is not None:
+                msg_obj = await db.get(Message, message_id)
+                if msg_obj is not None and msg_obj.user_id == user_id:
+                    emojis = json.loads(msg_obj.suggestion or "{}").get("emojis", [])
+                    agent.preferences.record_rating(user_id, emojis, rating, fb.rating if fb else None)
+            if fb:
+                # The old rating comes off the hour it was counted in
+                previous = rollups.rating_counts(None, fb.rating)
+                previous_at = fb.created_at
+                await db.run_sync(lambda s: rollups.apply_counts(previous, when=previous_at, session=s))
+                counts = rollups.rating_counts(rating)
+                fb.rating = rating
+                fb.comment = comment
+                fb.created_at = datetime.now(timezone.utc)
+            else:
+                db.add(Feedback(
+                    message_id=message_id, user_id=user_id,
+                    rating=rating, comment=comment
+                ))
+                counts = rollups.rating_counts(rating)
+            await db.run_sync(lambda s: rollups.apply_counts(counts, session=s))
+            await db.run_sync(add_user, user_id)
+            await db.commit()
+        known_users.add([user_id])
+    return JSONResponse({"msg": "Feedback recorded"})
+
+
+async def analytics(request):
+    try:
+        hours = int(request.query_params["hours"]) if "hours" in request.query_params else None
+    except ValueError:
+        return error("hours must be an integer")
+    if hours is not None and hours < 1:
+        return error("hours must be at least 1")
+    async with Session() as db:
+        result = await db.run_sync(lambda s: rollups.read_analytics(hours, session=s))
+    return JSONResponse(result)
+
+
+async def preference_stats(request):
+    if agent.preferences is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **agent.preferences.snapshot()})
+
+
+async def lexicon_stats(request):
+    return JSONResponse(agent.sentiment.config.info())
+
+
+async def prometheus_metrics(request):
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+async def admin_profiler(request):
+    # Same contract as app.py's /admin/profiler
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return error("admin token required", 403)
+    if request.method == "GET":
+        if request.query_params.get("format") == "folded":
+            return PlainTextResponse(profiler.folded())
+        try:
+            top = int(request.query_params.get("top", 20))
+        except ValueError:
+            return error("top must be an integer")
+        return JSONResponse(profiler.snapshot(top))
+    data = await json_body(request)
+    if not isinstance(data.get("enabled"), bool):
+        return error("enabled must be true or false")
+    if data["enabled"]:
+        try:
+            interval = float(data.get("interval_ms", 5)) / 1000
+        except (TypeError, ValueError):
+            interval = 0
+        if not 0.001 <= interval <= 1:
+            return error("interval_ms must be between 1 and 1000")
+        profiler.start(interval, include_idle=data.get("include_idle") is True)
+    else:
+        await run_analysis(profiler.stop)
+    return JSONResponse(profiler.snapshot())
+
+
+async def reload_lexicon(request):
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return error("admin token required", 403)
+    try:
+        changed = await run_analysis(agent.sentiment.reload_config)
+    except (OSError, ValueError) as exc:
+        return error(str(exc))
+    return JSONResponse({"reloaded": changed, **agent.sentiment.config.info()})
+
+
+async def run_purge(job):
+    # purge.Purger.run for the event loop: the write lock is taken per
+    # batch, so queued /suggest commits go in between batches
+    job.state, job.started_at = "running", time.time()
+    try:
+        await run_analysis(purger.prepare, job.user_id)
+        async with Session() as db:
+            while True:
+                async with writing():
+                    deleted = await db.run_sync(
+                        lambda s: purge.purge_batch(job.user_id, purger.batch_size, session=s)
+                    )
+                    await db.commit()
+                if not deleted:
+                    break
+                job.deleted.update(deleted)
+                job.batches += 1
+                await asyncio.sleep(purger.pause)
+        while True:
+            deleted = await run_analysis(purge.purge_store_batch, job.user_id, purger.batch_size)
+            if not deleted:
+                break
+            job.deleted.update(deleted)
+            job.batches += 1
+            await asyncio.sleep(purger.pause)
+    except Exception as exc:
+        job.state, job.error, job.finished_at = "failed", str(exc), time.time()
+        raise
+    job.state, job.finished_at = "done", time.time()
+    return job
+
+
+async def delete_user_data(request):
+    user_id = get_user_id(request)
+    data = await json_body(request)
+    background = data.get("background", purge.BACKGROUND) is True
+    request.session.pop("user_id", None)
+    known_users.discard(user_id)
+    async with Session() as db:
+        async with writing():
+            await db.run_sync(revoked_users.revoke, user_id)
+            await db.commit()
+    job = purger.create(user_id)
+    if background:
+        task = asyncio.create_task(run_purge(job))
+        purge_tasks.add(task)
+        task.add_done_callback(purge_tasks.discard)
+        return JSONResponse({
+            "msg": "Your data is being deleted.",
+            "status_url": f"/delete_user_data/status/{job.id}",
+            **job.info(),
+        }, status_code=202)
+    await run_purge(job)
+    return JSONResponse({"msg": "All your data has been deleted.", **job.info()})
+
+
+async def delete_user_data_status(request):
+    job = purger.get(request.path_params["job_id"])
+    if job is None:
+        return error("unknown job", 404)
+    return JSONResponse(job.info())
+
+
+class MetricsMiddleware:
+    # Request counts and latency by route, like app.py's request hooks
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        metrics.IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            metrics.IN_FLIGHT.dec()
+            # The router records the matched endpoint in the scope
+            route = ROUTE_PATHS.get(scope.get("endpoint"), "unmatched")
+            metrics.REQUESTS.labels(route, scope["method"], status[0]).inc()
+            metrics.REQUEST_SECONDS.labels(route, scope["method"]).observe(time.perf_counter() - start)
+
+
+class UserTokenMiddleware:
+    # Adds the signed token of a user id minted during the request
+    # (get_user_id) to the response, for clients that don't keep cookies,
+    # and reloads other workers' revocations when they are due
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if revoked_users.due():
+            async with Session() as db:
+                await db.run_sync(revoked_users.refresh)
+
+        async def send_token(message):
+            if message["type"] == "http.response.start":
+                user_id = scope.get("state", {}).get("new_user_id")
+                if user_id is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(identity.TOKEN_HEADER, user_tokens.issue(user_id))
+            await send(message)
+
+        await self.app(scope, receive, send_token)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global write_lock
+    if engine.dialect.name == "sqlite":
+        write_lock = asyncio.Lock()
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema)
+    # Runs in every worker after fork, before it accepts connections
+    await run_analysis(agent.warm_up)
+    yield
+    await engine.dispose()
+    profiler.stop()
+    analysis_executor.shutdown(wait=False, cancel_futures=True)
+
+
+routes = [
+    Route("/suggest", suggest, methods=["POST"]),
+    Route("/history", history, methods=["GET"]),
+    Route("/feedback", feedback, methods=["POST"]),
+    Route("/analytics", analytics, methods=["GET"]),
+    Route("/delete_user_data", delete_user_data, methods=["POST"]),
+    Route("/delete_user_data/status/{job_id}", delete_user_data_status, methods=["GET"]),
+    Route("/stats/preferences", preference_stats, methods=["GET"]),
+    Route("/stats/lexicon", lexicon_stats, methods=["GET"]),
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+    Route("/admin/profiler", admin_profiler, methods=["GET", "POST"]),
+    Route("/admin/lexicon/reload", reload_lexicon, methods=["POST"]),
+]
+ROUTE_PATHS = {route.endpoint: route.path for route in routes}
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(
+            CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+            expose_headers=[identity.TOKEN_HEADER],
+        ),
+        Middleware(SessionMiddleware, secret_key=identity.SECRET_KEY),
+        Middleware(UserTokenMiddleware),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,405 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Offline re-scoring of message archives, without going through the HTTP
+# API (from the backend directory):
+#
+#   python bulk.py chats.jsonl -o scored.jsonl --workers 8
+#   python bulk.py chats.csv -o scored.db --text-field text --unordered
+#
+# The input (JSONL objects or CSV rows) is streamed in chunks to a pool of
+# worker processes, each running its own AIAgent. Results go to JSONL or a
+# SQLite table. After every chunk written, a checkpoint records what is
+# done, so an interrupted run picks up where it stopped with --resume.
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+CHECKPOINT_SUFFIX = ".checkpoint"
+RESULT_COLUMNS = (
+    "id", "emojis", "sentiment", "intensity", "mixed", "polarity", "lexicon_version", "explanation",
+)
+
+# Agent owned by each worker process, built once by _init_worker
+_worker_agent = None
+
+
+def _init_worker(polarity):
+    global _worker_agent
+    try:
+        from .emotai import AIAgent
+    except ImportError:
+        from emotai import AIAgent
+
+    _worker_agent = AIAgent(polarity=polarity)
+    _worker_agent.warm_up()
+
+
+def score_chunk(index, records, output_format, explain, seed):
+    # Scores one chunk of (id, text) records. Returns (index, records,
+    # sentences, payload); the payload is already in the output's shape
+    # (JSONL text or SQLite rows) so the parent only writes it.
+    agent = _worker_agent
+    if seed is not None:
+        # Per chunk, so emoji choices do not depend on which worker ran it
+        agent.sentiment.rng.seed(seed * 1000003 + index)
+    suggestions = agent.suggest_emojis_batch([text for _, text in records], explain=explain)
+    rows = []
+    sentences = 0
+    for (record_id, _), suggestion in zip(records, suggestions):
+        sentences += len(suggestion.sentences)
+        rows.append({
+            "id": record_id,
+            "emojis": suggestion.emojis,
+            "sentiment": suggestion.sentiment,
+            "intensity": suggestion.intensity,
+            "mixed": suggestion.mixed,
+            "polarity": suggestion.polarity,
+            "lexicon_version": suggestion.lexicon_version,
+            "explanation": suggestion.explanation,
+        })
+    if output_format == "jsonl":
+        payload = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    else:
+        payload = [
+            tuple(
+                json.dumps(row["emojis"], ensure_ascii=False) if column == "emojis"
+                else str(row["id"]) if column == "id"
+                else row[column]
+                for column in RESULT_COLUMNS
+            )
+            for row in rows
+        ]
+    return index, len(records), sentences, payload
+
+
+def read_records(path, input_format, text_field, id_field):
+    # Yields (id, text); the id defaults to the record's position
+    with open(path, newline="", encoding="utf-8") as f:
+        if input_format == "csv":
+            for n, row in enumerate(csv.DictReader(f)):
+                yield row.get(id_field) or n, row.get(text_field) or ""
+            return
+        n = 0
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"{path}:{line_no}: invalid JSON: {exc}") from None
+            if not isinstance(row, dict):
+                raise ValueError(f"{path}:{line_no}: expected a JSON object")
+            text = row.get(text_field)
+            yield row.get(id_field, n), text if isinstance(text, str) else ""
+            n += 1
+
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_ranges(indexes):
+    # {0, 1, 2, 5} -> [[0, 3], [5, 6]], to keep checkpoints small
+    ranges = []
+    for i in sorted(indexes):
+        if ranges and ranges[-1][1] == i:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return ranges
+
+
+def from_ranges(ranges):
+    return {i for start, end in ranges for i in range(start, end)}
+
+
+class JsonlSink:
+    # Appends chunk payloads to a JSONL file. The sidecar checkpoint holds
+    # the finished chunks and the file size after them; on resume anything
+    # past that size (a chunk cut short by a crash) is truncated away.
+
+    def __init__(self, path, run_info, resume, overwrite):
+        if not (resume or overwrite) and os.path.exists(path) and os.path.getsize(path):
+            raise ValueError(f"{path} exists; pass --resume to continue it or --overwrite")
+        self.path = Path(path)
+        self.checkpoint_path = Path(str(path) + CHECKPOINT_SUFFIX)
+        self.run_info = run_info
+        self.done = set()
+        offset = 0
+        if resume and self.checkpoint_path.exists():
+            state = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+            check_run_info(state["run"], run_info)
+            self.done = from_ranges(state["done"])
+            offset = state["offset"]
+        self.file = open(self.path, "r+b" if offset else "wb")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write(self, index, payload):
+        self.file.write(payload.encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done.add(index)
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "run": self.run_info, "done": to_ranges(self.done), "offset": self.file.tell(),
+        }), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteSink:
+    # Writes result rows to `table`; the chunk's checkpoint row is inserted
+    # in the same transaction, so a chunk is either fully there or not.
+
+    def __init__(self, path, table, run_info, resume, overwrite):
+        self.table = table
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone()
+        if exists and not (resume or overwrite):
+            self.conn.close()
+            raise ValueError(f"table {table} exists in {path}; pass --resume to continue it or --overwrite")
+        if overwrite:
+            self.conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.conn.execute(f'DROP TABLE IF EXISTS "{table}_checkpoint"')
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT, emojis TEXT, sentiment TEXT, '
+            "intensity INTEGER, mixed TEXT, polarity REAL, lexicon_version TEXT, explanation TEXT)"
+        )
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}_checkpoint" (chunk INTEGER PRIMARY KEY, run TEXT)'
+        )
+        self.done = set()
+        for chunk, run in self.conn.execute(f'SELECT chunk, run FROM "{table}_checkpoint"'):
+            check_run_info(json.loads(run), run_info)
+            self.done.add(chunk)
+        self.run_json = json.dumps(run_info)
+        self.insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" for _ in RESULT_COLUMNS)})'
+
+    def write(self, index, payload):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(self.insert, payload)
+            self.conn.execute(
+                f'INSERT INTO "{self.table}_checkpoint" (chunk, run) VALUES (?, ?)',
+                (index, self.run_json),
+            )
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self.done.add(index)
+
+    def close(self):
+        self.conn.close()
+
+
+def check_run_info(stored, current):
+    # Chunk numbers only line up when input and chunking are the same
+    for key in ("input", "chunk_size", "ordered"):
+        if stored.get(key) != current.get(key):
+            raise ValueError(
+                f"checkpoint was written with {key}={stored.get(key)!r}, not {current.get(key)!r}"
+            )
+
+
+def peak_rss_mb():
+    # (this process, largest worker) in MB; ru_maxrss is KiB on Linux
+    if resource is None:
+        return None, None
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL or CSV archive of messages offline.")
+    parser.add_argument("input", help="JSONL (one object per line) or CSV file")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or SQLite database (.db/.sqlite)")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"))
+    parser.add_argument("--output-format", choices=("jsonl", "sqlite"))
+    parser.add_argument("--table", default="scores", help="SQLite table for the results")
+    parser.add_argument("--text-field", default="message")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes; 0 scores in this process")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--max-pending", type=int, default=0,
+                        help="chunks in flight or waiting to be written (default 2 per worker)")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument("--ordered", dest="ordered", action="store_true", default=True,
+                       help="write results in input order (default)")
+    order.add_argument("--unordered", dest="ordered", action="store_false",
+                       help="write chunks as they finish")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--resume", action="store_true", help="continue from the output's checkpoint")
+    start.add_argument("--overwrite", action="store_true", help="replace existing output")
+    parser.add_argument("--explain", action="store_true", help="include explanations")
+    parser.add_argument("--seed", type=int, help="seed for reproducible emoji choices")
+    parser.add_argument("--polarity", help="polarity backend (default EMOTAI_POLARITY_BACKEND)")
+    parser.add_argument("--quiet", action="store_true", help="no progress lines")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1 or args.workers < 0:
+        parser.error("--chunk-size must be positive and --workers not negative")
+    args.input_format = args.input_format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    args.output_format = args.output_format or (
+        "sqlite" if args.output.lower().endswith(SQLITE_SUFFIXES) else "jsonl"
+    )
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    return args
+
+
+def run(args) -> dict:
+    run_info = {
+        "input": os.path.abspath(args.input),
+        "chunk_size": args.chunk_size,
+        "ordered": args.ordered,
+    }
+    if args.output_format == "sqlite":
+        sink = SqliteSink(args.output, args.table, run_info, args.resume, args.overwrite)
+    else:
+        sink = JsonlSink(args.output, run_info, args.resume, args.overwrite)
+    skipped = set(sink.done)
+
+    executor = None
+    if args.workers:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.polarity,),
+        )
+    else:
+        _init_worker(args.polarity)
+    max_pending = args.max_pending or max(2, 2 * args.workers)
+
+    totals = {"records": 0, "sentences": 0, "chunks": 0, "skipped_chunks": len(skipped)}
+    started = last_report = time.perf_counter()
+    in_flight = set()
+    finished = {}  # chunk index -> result, waiting for its turn (ordered mode)
+    next_write = 0
+
+    def write(result):
+        index, n_records, n_sentences, payload = result
+        sink.write(index, payload)
+        totals["records"] += n_records
+        totals["sentences"] += n_sentences
+        totals["chunks"] += 1
+
+    def write_ready():
+        nonlocal next_write
+        while True:
+            while next_write in skipped:
+                next_write += 1
+            if next_write not in finished:
+                return
+            write(finished.pop(next_write))
+            next_write += 1
+
+    def collect(block):
+        nonlocal last_report
+        if executor is not None and in_flight:
+            done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                result = future.result()
+                if args.ordered:
+                    finished[result[0]] = result
+                else:
+                    write(result)
+            if args.ordered:
+                write_ready()
+        now = time.perf_counter()
+        if not args.quiet and now - last_report >= 2.0:
+            last_report = now
+            elapsed = now - started
+            print(
+                f"{totals['records']} records, {totals['sentences']} sentences "
+                f"({totals['sentences'] / elapsed:.0f} sentences/s)",
+                file=sys.stderr,
+            )
+
+    try:
+        records = read_records(args.input, args.input_format, args.text_field, args.id_field)
+        for index, chunk in enumerate(chunked(records, args.chunk_size)):
+            if index in skipped:
+                continue
+            if executor is None:
+                write(score_chunk(index, chunk, args.output_format, args.explain, args.seed))
+                collect(block=False)
+                continue
+            while len(in_flight) + len(finished) >= max_pending:
+                collect(block=True)
+            in_flight.add(executor.submit(
+                score_chunk, index, chunk, args.output_format, args.explain, args.seed
+            ))
+            collect(block=False)
+        while in_flight:
+            collect(block=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        sink.close()
+
+    elapsed = time.perf_counter() - started
+    parent_mb, worker_mb = peak_rss_mb()
+    totals.update(
+        elapsed_s=elapsed,
+        records_per_s=totals["records"] / elapsed if elapsed else 0.0,
+        sentences_per_s=totals["sentences"] / elapsed if elapsed else 0.0,
+        peak_rss_mb=parent_mb,
+        peak_worker_rss_mb=worker_mb if executor is not None else None,
+    )
+    return totals
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        totals = run(args)
+    except ValueError as exc:
+        sys.exit(f"error: {exc}")
+    print(
+        f"Scored {totals['records']} records ({totals['sentences']} sentences) in "
+        f"{totals['elapsed_s']:.1f} s: {totals['records_per_s']:.0f} records/s, "
+        f"{totals['sentences_per_s']:.0f} sentences/s"
+        + (f"; skipped {totals['skipped_chunks']} chunks done earlier" if totals["skipped_chunks"] else "")
+    )
+    if totals["peak_rss_mb"] is not None:
+        workers = (
+            f", largest worker {totals['peak_worker_rss_mb']:.0f} MB"
+            if totals["peak_worker_rss_mb"] is not None else ""
+        )
+        print(f"Peak RSS: {totals['peak_rss_mb']:.0f} MB{workers}")
+    return totals
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+logger = logging.getLogger(__name__)
+
+# Optional transformer sentence classifier (EMOTAI_MODEL) on top of the
+# rule engine. Sentences from concurrent requests are queued and run
+# through the model together in micro-batches; a request whose sentences
+# cannot be queued or answered in time keeps its rule-based result.
+# torch and transformers are only imported when a model is configured.
+
+MODEL = os.getenv("EMOTAI_MODEL", "")
+MAX_BATCH = int(os.getenv("EMOTAI_MODEL_MAX_BATCH", "16"))
+MAX_WAIT = float(os.getenv("EMOTAI_MODEL_MAX_WAIT_MS", "5")) / 1000
+MAX_QUEUE = int(os.getenv("EMOTAI_MODEL_MAX_QUEUE", "256"))
+TIMEOUT = float(os.getenv("EMOTAI_MODEL_TIMEOUT", "1.0"))
+THREADS = int(os.getenv("EMOTAI_MODEL_THREADS", "0"))
+QUANTIZE = os.getenv("EMOTAI_MODEL_QUANTIZE", "1") == "1"
+
+# Model labels -> SentimentAnalyzer sentiments. Covers the usual emotion
+# (GoEmotions/Ekman-style), sentiment and irony heads; labels missing here
+# (and "neutral") add nothing to the rule result.
+LABEL_SENTIMENTS = {
+    "joy": "happy", "happiness": "happy", "positive": "happy", "pos": "happy",
+    "sadness": "sad", "negative": "sad", "neg": "sad", "grief": "sad",
+    "love": "love", "admiration": "love", "caring": "love",
+    "surprise": "excited", "excitement": "excited",
+    "anger": "angry", "disgust": "angry", "annoyance": "angry",
+    "fear": "nervous", "nervousness": "nervous",
+    "confusion": "confused",
+    "sarcasm": "sarcasm", "irony": "sarcasm",
+}
+# Probability -> intensity; labels below the first step are ignored
+INTENSITY_STEPS = ((0.9, 3), (0.6, 2), (0.35, 1))
+# A second label this likely is kept too, so mixed patterns can match
+SECONDARY_MIN = 0.35
+
+
+def label_intensity(probability: float) -> int:
+    for threshold, intensity in INTENSITY_STEPS:
+        if probability >= threshold:
+            return intensity
+    return 0
+
+
+def to_sentiments(ranked: List[Tuple[str, float]], known=None) -> Dict[str, int]:
+    # Top label, plus the runner-up when it is likely enough, as
+    # {sentiment: intensity}; `known` limits it to a config's sentiments
+    found = {}
+    for rank, (label, probability) in enumerate(ranked[:2]):
+        if rank and probability < SECONDARY_MIN:
+            break
+        name = LABEL_SENTIMENTS.get(label.lower())
+        intensity = label_intensity(probability)
+        if name is None or not intensity or (known is not None and name not in known):
+            continue
+        found[name] = max(found.get(name, 0), intensity)
+    return found
+
+
+class TransformerClassifier:
+    # A Hugging Face sequence classifier on CPU, dynamically quantized to
+    # int8 Linear layers unless quantize=False
+    def __init__(self, model: str = MODEL, threads: int = THREADS, quantize: bool = QUANTIZE, max_length: int = 128):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self._torch = torch
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        network = AutoModelForSequenceClassification.from_pretrained(model).eval()
+        if quantize:
+            network = torch.ao.quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = network
+        config = network.config
+        self.labels = [config.id2label[i] for i in range(config.num_labels)]
+
+    def predict(self, texts: List[str]) -> List[List[Tuple[str, float]]]:
+        # Labels with their probabilities, most likely first, per text
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt",
+        )
+        with self._torch.inference_mode():
+            probabilities = self._torch.softmax(self.model(**inputs).logits, dim=-1).tolist()
+        return [
+            sorted(zip(self.labels, row), key=lambda item: item[1], reverse=True)
+            for row in probabilities
+        ]
+
+
+class MicroBatcher:
+    # One inference thread takes the first queued sentence, then keeps
+    # collecting until max_batch sentences or max_wait seconds, and runs
+    # them as one batch. submit() never blocks: with max_queue sentences
+    # waiting it returns None and the caller keeps the rule result.
+
+    def __init__(self, classifier=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_queue=MAX_QUEUE, timeout=TIMEOUT):
+        # classifier: anything with predict(texts); loaded on first use
+        # (or warm_up) when None
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "submitted": 0, "batches": 0, "predicted": 0, "saturated": 0, "timeouts": 0,
+            "errors": 0, "max_batch_seen": 0,
+        }
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def warm_up(self) -> None:
+        self._ensure_started()
+        self.classify(["warm up"])
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._load_lock:
+            if self._thread is None:
+                if self.classifier is None:
+                    self.classifier = TransformerClassifier()
+                self._thread = threading.Thread(target=self._run, name="emotai-model", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> Optional[List[Future]]:
+        # All of a request's sentences get in, or none do
+        self._ensure_started()
+        futures = []
+        try:
+            for text in texts:
+                future = Future()
+                self._queue.put_nowait((text, future))
+                futures.append(future)
+        except queue.Full:
+            for future in futures:
+                future.cancel()
+            self._count("saturated")
+            metrics.MODEL_FALLBACKS.labels("saturated").inc()
+            return None
+        self._count("submitted", len(texts))
+        return futures
+
+    def classify(self, texts: List[str], timeout: Optional[float] = None) -> Optional[List[List[Tuple[str, float]]]]:
+        # Ranked labels per text, or None when the request should fall back
+        # to the rules (queue full, too slow, or the model failed)
+        if not texts:
+            return []
+        futures = self.submit(texts)
+        if futures is None:
+            return None
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        try:
+            return [future.result(max(0.0, deadline - time.monotonic())) for future in futures]
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            self._count("timeouts")
+            metrics.MODEL_FALLBACKS.labels("timeout").inc()
+        except Exception:
+            metrics.MODEL_FALLBACKS.labels("error").inc()
+        return None
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get(timeout=0.1)]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Sentences whose request already gave up are not worth running
+        return [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                continue
+            if not batch:
+                continue
+            try:
+                with metrics.MODEL_INFERENCE.time():
+                    predictions = self.classifier.predict([text for text, _ in batch])
+            except Exception as exc:
+                self._count("errors")
+                logger.exception("model: batch of %d failed", len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                future.set_result(prediction)
+            with self._stats_lock:
+                self.stats["batches"] += 1
+                self.stats["predicted"] += len(batch)
+                self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            metrics.MODEL_BATCH_SIZE.observe(len(batch))
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(
+            queue_depth=self._queue.qsize(),
+            max_batch=self.max_batch,
+            max_wait_ms=self.max_wait * 1000,
+            mean_batch=stats["predicted"] / stats["batches"] if stats["batches"] else 0.0,
+        )
+        return stats
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,23 +1,122 @@
+import os
+import queue
 import sqlite3
+from collections import Counter
 from contextlib import contextmanager
 from pathlib import Path
 import threading
 
-DB_PATH = Path(__file__).parent / "instance" / "emotiai.db"
+DB_PATH = Path(os.getenv("EMOTAI_DB_PATH", Path(__file__).parent / "instance" / "emotiai.db"))
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 _connection_lock = threading.Lock()
 
+# Applied to every pooled connection. WAL lets readers run alongside the
+# single writer; synchronous=NORMAL is durable across app crashes in WAL
+# mode and only fsyncs at checkpoints.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",  # KiB, i.e. ~20 MB per connection
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+class ConnectionPool:
+    # Thread-safe pool of long-lived connections. Reusing connections keeps
+    # sqlite3's per-connection prepared statement cache warm.
+
+    def __init__(self, path, size=8, timeout=30.0, cached_statements=256):
+        self.path = str(path)
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly by
+        # transaction(), so reads never hold a write lock
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with _connection_lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with _connection_lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with _connection_lock:
+            self._created = 0
+
+_pool = ConnectionPool(DB_PATH, size=int(os.getenv("EMOTAI_DB_POOL_SIZE", "8")))
+
+def configure(path=None, size=None):
+    # Points the module at another database file (tests, benchmarks)
+    global _pool
+    _pool.close()
+    _pool = ConnectionPool(path or _pool.path, size=size or _pool.size)
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    conn = _pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        _pool.release(conn)
 
-def init_db():
+@contextmanager
+def transaction():
+    # One write transaction per logical operation. BEGIN IMMEDIATE takes the
+    # write lock up front, so busy_timeout can wait for it instead of failing
+    # on a read-to-write lock upgrade. SQLite may have rolled back already
+    # (SQLITE_FULL, some busy errors), so ROLLBACK only runs if still open.
     with get_db() as db:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+            db.execute("COMMIT")
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+
+def init_db():
+    with transaction() as db:
         db.execute("""
             CREATE TABLE IF NOT EXISTS suggestions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,15 +152,63 @@ def init_db():
                 username TEXT,
                 emoji TEXT,
                 usage_count INTEGER DEFAULT 1,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                rating_sum INTEGER DEFAULT 0,
+                rating_count INTEGER DEFAULT 0
             );
         """)
-        db.commit()
+        # Feedback ratings per emoji (see preferences.py), on tables created
+        # before they were added
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(user_preferences)")}
+        for column in ("rating_sum", "rating_count"):
+            if column not in columns:
+                db.execute(f"ALTER TABLE user_preferences ADD COLUMN {column} INTEGER DEFAULT 0")
+        # The upsert in store_suggestion needs a unique (username, emoji)
+        # index; fold any duplicate rows together before creating it
+        db.execute("""
+            UPDATE user_preferences SET usage_count = (
+                SELECT SUM(p.usage_count) FROM user_preferences p
+                WHERE p.username IS user_preferences.username AND p.emoji IS user_preferences.emoji
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM user_preferences GROUP BY username, emoji HAVING COUNT(*) > 1
+            );
+        """)
+        db.execute("""
+            DELETE FROM user_preferences
+            WHERE id NOT IN (SELECT MIN(id) FROM user_preferences GROUP BY username, emoji);
+        """)
+        db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_user_preferences_username_emoji ON user_preferences (username, emoji);")
+        db.execute("CREATE INDEX IF NOT EXISTS ix_suggestions_username_created ON suggestions (username, created_at);")
+        db.execute("CREATE INDEX IF NOT EXISTS ix_emoji_analytics_emoji ON emoji_analytics (emoji);")
+        db.execute("CREATE INDEX IF NOT EXISTS ix_feedback_created ON feedback (created_at);")
+        # Per-user deletes (delete_user_batch) would scan these tables otherwise
+        db.execute("CREATE INDEX IF NOT EXISTS ix_emoji_analytics_username ON emoji_analytics (username);")
+        db.execute("CREATE INDEX IF NOT EXISTS ix_feedback_username ON feedback (username);")
+
+INSERT_SUGGESTION = "INSERT INTO suggestions (username, message, emojis, explanation) VALUES (?, ?, ?, ?)"
+UPSERT_PREFERENCE = """
+    INSERT INTO user_preferences (username, emoji, usage_count, last_used)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(username, emoji) DO UPDATE SET
+      usage_count = usage_count + excluded.usage_count,
+      last_used = CURRENT_TIMESTAMP
+"""
+
+UPSERT_PREFERENCE_DELTA = """
+    INSERT INTO user_preferences (username, emoji, usage_count, rating_sum, rating_count, last_used)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(username, emoji) DO UPDATE SET
+      usage_count = usage_count + excluded.usage_count,
+      rating_sum = rating_sum + excluded.rating_sum,
+      rating_count = rating_count + excluded.rating_count,
+      last_used = CURRENT_TIMESTAMP
+"""
 
 def store_suggestion(username, message, suggestion):
-    with get_db() as db:
+    with transaction() as db:
         db.execute(
-            "INSERT INTO suggestions (username, message, emojis, explanation) VALUES (?, ?, ?, ?)",
+            INSERT_SUGGESTION,
             (
                 username,
                 message,
@@ -69,17 +216,11 @@ def store_suggestion(username, message, suggestion):
                 suggestion.explanation or "",
             ),
         )
-        db.commit()
         # Update user preferences
-        for emoji in suggestion.emojis:
-            db.execute("""
-                INSERT INTO user_preferences (username, emoji, usage_count, last_used)
-                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
-                ON CONFLICT(username, emoji) DO UPDATE SET
-                  usage_count = usage_count + 1,
-                  last_used = CURRENT_TIMESTAMP
-            """, (username, emoji))
-        db.commit()
+        db.executemany(
+            UPSERT_PREFERENCE,
+            [(username, emoji, n) for emoji, n in Counter(suggestion.emojis).items()],
+        )
 
 def fetch_user_history(username):
     with get_db() as db:
@@ -98,12 +239,11 @@ def fetch_user_history(username):
         ]
 
 def record_emoji_usage(username, emoji, sentiment):
-    with get_db() as db:
+    with transaction() as db:
         db.execute(
             "INSERT INTO emoji_analytics (username, emoji, sentiment) VALUES (?, ?, ?)",
             (username, emoji, sentiment),
         )
-        db.commit()
 
 def get_usage_stats():
     with get_db() as db:
@@ -113,12 +253,11 @@ def get_usage_stats():
         return [{"emoji": row["emoji"], "count": row["count"]} for row in rows]
 
 def store_feedback(username, message, feedback, rating):
-    with get_db() as db:
+    with transaction() as db:
         db.execute(
             "INSERT INTO feedback (username, message, feedback, rating) VALUES (?, ?, ?, ?)",
             (username, message, feedback, rating),
         )
-        db.commit()
 
 def get_feedback():
     with get_db() as db:
@@ -142,4 +281,42 @@ def fetch_user_preferences(username):
             "SELECT emoji FROM user_preferences WHERE username=? ORDER BY usage_count DESC, last_used DESC LIMIT 5",
             (username,),
         ).fetchall()
-        return [row["emoji"] for row in rows]
\ No newline at end of file
+        return [row["emoji"] for row in rows]
+
+def load_user_preference_stats(username):
+    # {emoji: (usage_count, rating_sum, rating_count)} for one user
+    with get_db() as db:
+        rows = db.execute(
+            "SELECT emoji, usage_count, rating_sum, rating_count FROM user_preferences WHERE username=?",
+            (username,),
+        ).fetchall()
+        return {
+            row["emoji"]: (row["usage_count"] or 0, row["rating_sum"] or 0, row["rating_count"] or 0)
+            for row in rows
+        }
+
+def add_user_preference_stats(deltas):
+    # deltas: [(username, emoji, usage, rating_sum, rating_count)], added to
+    # the stored counters in one transaction
+    if not deltas:
+        return
+    with transaction() as db:
+        db.executemany(UPSERT_PREFERENCE_DELTA, deltas)
+
+# Every table holding per-user rows, in the order a purge empties them
+PURGE_TABLES = ("suggestions", "emoji_analytics", "feedback", "user_preferences")
+
+def delete_user_batch(table, username, limit):
+    # Deletes up to `limit` of a user's rows from one of PURGE_TABLES in a
+    # short transaction of its own; returns how many were deleted
+    if table not in PURGE_TABLES:
+        raise ValueError(f"unknown table {table!r}")
+    with transaction() as db:
+        return db.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE username=? LIMIT ?)",
+            (username, limit),
+        ).rowcount
+
+def delete_user_preferences(username):
+    with transaction() as db:
+        db.execute("DELETE FROM user_preferences WHERE username=?", (username,))
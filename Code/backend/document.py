@@ -0,0 +1,47 @@
+import re
+from typing import List, Tuple
+
+# Where a sentence ends: whitespace after ".", "!" or "?". Same splits as
+# SENTENCE_SPLIT, but without a lookbehind tried at every position.
+SENTENCE_END = re.compile(r"[.!?]\s+")
+
+
+class Document:
+    # A message scanned once: the lowered text and the sentence boundaries
+    # as offsets into it. The sentences are the pieces AIAgent has always
+    # used (the stripped message split on SENTENCE_SPLIT, each stripped),
+    # and every stage reads its sentence out of the shared lowered text
+    # with pos/endpos instead of lowering or slicing a copy of it.
+    __slots__ = ("text", "lower", "bounds")
+
+    def __init__(self, text: str):
+        self.text = text
+        lower = text.lower()
+        # A few characters lower to more than one (e.g. "İ"), after which
+        # offsets no longer line up; such messages keep lower=None and
+        # each sentence is lowered on its own
+        self.lower = lower if len(lower) == len(text) else None
+        start = len(text) - len(text.lstrip())
+        end = len(text.rstrip())
+        bounds = []
+        for match in SENTENCE_END.finditer(text, start, end):
+            bounds.append((start, match.start() + 1))
+            start = match.end()
+        if start < end:
+            bounds.append((start, end))
+        self.bounds = bounds
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def texts(self) -> List[str]:
+        text = self.text
+        return [text[start:end] for start, end in self.bounds]
+
+    def lowered(self, index: int) -> Tuple[str, int, int]:
+        # (lowered text, start, end) to scan sentence `index` in
+        start, end = self.bounds[index]
+        if self.lower is None:
+            sentence = self.text[start:end].lower()
+            return sentence, 0, len(sentence)
+        return self.lower, start, end
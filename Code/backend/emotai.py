@@ -1,228 +1,417 @@
+import os
 import random
 import re
+import threading
+import weakref
+from time import perf_counter
 from pydantic import BaseModel
-from typing import List, Tuple, Optional
-from textblob import TextBlob
+from typing import Iterator, List, Tuple, Optional, Union
+
+try:
+    from . import metrics
+    from .cache import LRUCache
+    from .classifier import to_sentiments
+    from .document import Document
+    from .lexicon_config import LexiconConfig, default_lexicon, load_lexicon
+    from .polarity import PolarityScorer, polarity_backend, polarity_bucket
+except ImportError:
+    import metrics
+    from cache import LRUCache
+    from classifier import to_sentiments
+    from document import Document
+    from lexicon_config import LexiconConfig, default_lexicon, load_lexicon
+    from polarity import PolarityScorer, polarity_backend, polarity_bucket
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+NEUTRAL_EXPLANATION = "No sentiment detected, defaulting to neutral."
+
+# Unseeded emoji RNGs are reseeded in forked workers, so they do not all
+# replay the parent's sequence
+_unseeded_rngs = weakref.WeakSet()
+
+def _reseed_after_fork():
+    for rng in list(_unseeded_rngs):
+        rng.seed()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_after_fork)
+
+def _choose(options, rand, ranking=None):
+    # Random, weighted towards the user's ranked options: each option
+    # counts once plus its preference score
+    if ranking:
+        weights = [1 + ranking.get(option, 0) for option in options]
+        point = rand() * sum(weights)
+        for option, weight in zip(options, weights):
+            point -= weight
+            if point < 0:
+                return option
+        return options[-1]
+    return options[int(rand() * len(options))]
 
 class EmojiSuggestion(BaseModel):
     emojis: List[str]
     message: str
     explanation: Optional[str] = None
     sentences: Optional[List[dict]] = None  # Per-sentence results
+    # Message-level summary: the strongest sentence's primary sentiment,
+    # the first mixed emotion found and the mean polarity
+    sentiment: Optional[str] = None
+    intensity: Optional[int] = None
+    mixed: Optional[str] = None
+    polarity: Optional[float] = None
+    lexicon_version: Optional[str] = None  # LexiconConfig.version that produced it
 
 class SentimentAnalyzer:
-    def __init__(self):
-        self.emoji_library = {
-            "happy": {
-                "mild": ["😊", "🙂", "😄", "😀"],
-                "moderate": ["😃", "😁", "😆"],
-                "strong": ["🤩", "🥳", "😻", "🎉", "🎊"],
-            },
-            "sad": {
-                "mild": ["😔", "😞", "🥺", "😟"],
-                "moderate": ["😢", "😥", "😭"],
-                "strong": ["😩", "😣", "😿", "💔"],
-            },
-            "love": {
-                "mild": ["🥰", "😍", "❤️", "😘"],
-                "moderate": ["💖", "💕", "💞", "💓"],
-                "strong": ["💘", "💝", "💟"],
-            },
-            "excited": {
-                "mild": ["😎", "😏", "😺", "🤩"],
-                "moderate": ["🤩", "🥳", "😻", "🙌"],
-                "strong": ["🚀", "🔥", "🎉", "🎊"],
-            },
-            "greeting": {
-                "mild": ["👋", "🤚", "🖐️", "🤝"],
-                "moderate": ["✌️", "🤞", "👌", "🤙"],
-                "strong": ["🤟", "🖖", "✋", "🙏"],
-            },
-            "angry": {
-                "mild": ["😠", "😒", "😤"],
-                "moderate": ["😡", "🤬"],
-                "strong": ["👿"],
-            },
-            "danger": {
-                "mild": ["⚠️", "🚨", "🆘", "🛑"],
-                "moderate": ["😰", "😨", "😬", "😱"],
-                "strong": ["🔥", "💣", "💥"],
-            },
-            "confused": {
-                "mild": ["😕", "🤔", "🧐", "🤷"],
-                "moderate": ["😖", "😣", "🤨", "😟"],
-                "strong": ["😵", "😓", "🤯", "❓"],
-            },
-            "neutral": {
-                "mild": ["😐", "😑", "😶", "😌"],
-                "moderate": ["😒", "🙄", "😏", "😶"],
-                "strong": ["🤨", "🧐", "🗿", "🧊"],
-            },
-            "mixed": {
-                "happy_sad": ["😊😢", "😄😔", "🥲"],
-                "excited_nervous": ["🤩😬", "😃😅", "😁😰"],
-                "love_hate": ["🥰😒", "😍🙄"],
-                "angry_confused": ["😡😕", "🤬🤔"],
-            },
-            "sarcasm": {
-                "strong": ["🙃", "😏", "😒"]
-            }
-        }
-        self.sentiment_map = {
-            "happy": ["happy", "joy", "good", "great", "awesome", "cheerful"],
-            "sad": ["sad", "bad", "upset", "unhappy", "depressed"],
-            "love": ["love", "heart", "adore", "cherish"],
-            "excited": ["excited", "wow", "amazing", "thrilled"],
-            "greeting": ["hello", "hi", "hey", "greetings"],
-            "angry": ["angry", "furious", "mad", "irritated"],
-            "danger": ["danger", "warning", "alert", "emergency"],
-            "confused": ["confused", "why", "huh", "what"],
-            "nervous": ["nervous", "anxious", "worried", "apprehensive"],
-        }
-        self.mixed_patterns = [
-            ({"happy", "sad"}, "happy_sad"),
-            ({"excited", "nervous"}, "excited_nervous"),
-            ({"love", "angry"}, "love_hate"),
-            ({"angry", "confused"}, "angry_confused"),
-        ]
-        self.strong_keywords = {
-            "marvelous", "amazing", "wonderful", "terrible", "horrible",
-            "furious", "enraged", "urgent",
-        }
-        self.intensity_words = {
-            "slightly": 1, "a little": 1, "very": 2, "really": 2,
-            "extremely": 3, "seriously": 3, "so": 2, "completely": 3,
-        }
-        self.intensity_levels = {1: "mild", 2: "moderate", 3: "strong"}
-        self.sentiment_priority = {
-            "excited": 1, "love": 2, "happy": 3, "angry": 4, "danger": 5,
-            "sad": 6, "nervous": 7, "greeting": 8, "confused": 9, "neutral": 10, "sarcasm": 11,
-        }
+    def __init__(self, cache: Optional[LRUCache] = None, polarity: Union[str, PolarityScorer, None] = None, seed: Optional[int] = None, config: Optional[LexiconConfig] = None, preferences=None):
+        # Optional sentence -> detect_sentiment result cache (opt-in)
+        self.cache = cache
+        # Emoji selection RNG; pass a seed for reproducible choices
+        self.rng = random.Random(seed)
+        if seed is None:
+            _unseeded_rngs.add(self.rng)
+        # Polarity backend: a PolarityScorer, a backend name, or None for
+        # EMOTAI_POLARITY_BACKEND (default "textblob"). The name is checked
+        # now; the backend (and TextBlob) is only loaded on first use.
+        if isinstance(polarity, PolarityScorer):
+            self._scorer, self._scorer_class = polarity, type(polarity)
+        else:
+            self._scorer, self._scorer_class = None, polarity_backend(polarity)
+        self._scorer_lock = threading.Lock()
+        # Emoji/keyword tables from the versioned lexicon file. Swapped as a
+        # whole by reload_config(); each call reads self.config once.
+        self.config = config if config is not None else default_lexicon()
+        self._reload_lock = threading.Lock()
+        # Optional preferences.PreferenceCache; get_emojis ranks each
+        # sentiment's options by the user's usage and ratings
+        self.preferences = preferences
+
+    def reload_config(self, path=None) -> bool:
+        # Loads and compiles the lexicon file (the current one by default)
+        # and swaps it in. Returns False when the content is unchanged.
+        with self._reload_lock:
+            config = load_lexicon(path or self.config.source)
+            if config.digest == self.config.digest:
+                return False
+            self.config = config
+            return True
+
+    # The current config's tables, for callers that read them directly
+    emoji_library = property(lambda self: self.config.emoji_library)
+    sentiment_map = property(lambda self: self.config.sentiment_map)
+    mixed_patterns = property(lambda self: self.config.mixed_patterns)
+    strong_keywords = property(lambda self: self.config.strong_keywords)
+    intensity_words = property(lambda self: self.config.intensity_words)
+    intensity_levels = property(lambda self: self.config.intensity_levels)
+    sentiment_priority = property(lambda self: self.config.sentiment_priority)
+    lexicon = property(lambda self: self.config.lexicon)
+
+    @property
+    def scorer(self) -> PolarityScorer:
+        if self._scorer is None:
+            with self._scorer_lock:
+                if self._scorer is None:
+                    self._scorer = self._scorer_class()
+        return self._scorer
+
+    def warm_up(self) -> None:
+        # Loads the polarity backend and its data ahead of the first request
+        self._classify("warm up")
+
+    def polarity(self, message: str) -> float:
+        return self.scorer.score(message)
+
+    def polarity_batch(self, messages: List[str]) -> List[float]:
+        with metrics.POLARITY.time():
+            return self.scorer.score_batch(messages)
+
+    def analyze(self, message: str, config: Optional[LexiconConfig] = None, doc: Optional[Document] = None, index: int = 0) -> Tuple[List[Tuple[str, int]], float]:
+        # (detect_sentiment result, polarity score) for one sentence; with a
+        # doc, message is its sentence `index` and is classified from it
+        config = config or self.config
+        if self.cache is None:
+            return self._classify(message, config=config, doc=doc, index=index)
+        # Keyed by config digest too, so a reload never serves results of
+        # the previous lexicon; those entries just age out of the LRU
+        key = (config.digest, message)
+        cached = self.cache.get(key)
+        if cached is None:
+            sentiments, polarity = self._classify(message, config=config, doc=doc, index=index)
+            cached = (tuple(sentiments), polarity)
+            self.cache.put(key, cached)
+        return list(cached[0]), cached[1]
+
+    def analyze_batch(self, messages: List[str], config: Optional[LexiconConfig] = None, sources: Optional[List[Tuple[Document, int]]] = None) -> List[Tuple[List[Tuple[str, int]], float]]:
+        # Repeated sentences in a batch are analyzed only once. sources, when
+        # given, is the (doc, index) each message was taken from
+        config = config or self.config
+        sources = dict(zip(messages, sources)) if sources is not None else {}
+        results = {}
+        unique = []
+        for message in dict.fromkeys(messages):
+            cached = self.cache.get((config.digest, message)) if self.cache is not None else None
+            if cached is None:
+                unique.append(message)
+            else:
+                results[message] = (list(cached[0]), cached[1])
+        polarities = self.polarity_batch(unique)
+        for message, polarity in zip(unique, polarities):
+            doc, index = sources.get(message, (None, 0))
+            results[message] = self._classify(message, polarity, config, doc, index)
+            if self.cache is not None:
+                self.cache.put((config.digest, message), (tuple(results[message][0]), polarity))
+        return [results[message] for message in messages]
 
     def detect_sentiment(self, message: str) -> List[Tuple[str, int]]:
-        lower_msg = message.lower()
-        words = re.findall(r"\b\w+\b|[^\w\s]", lower_msg)
+        return self.analyze(message)[0]
+
+    def detect_sentiment_batch(self, messages: List[str]) -> List[List[Tuple[str, int]]]:
+        return [sentiments for sentiments, _ in self.analyze_batch(messages)]
+
+    def _classify(self, message: str, polarity: Optional[float] = None, config: Optional[LexiconConfig] = None, doc: Optional[Document] = None, index: int = 0) -> Tuple[List[Tuple[str, int]], float]:
+        config = config or self.config
+        lexicon = config.lexicon
+        start = perf_counter()
+        if doc is None:
+            lower_msg = message.lower()
+            begin, end = 0, len(lower_msg)
+        else:
+            # The sentence inside the message's lowered text
+            lower_msg, begin, end = doc.lowered(index)
+        words = lexicon.tokenize(lower_msg, begin, end)
         sentiment_intensities = {}
 
         # Sarcasm detection
-        if "yeah right" in lower_msg or "as if" in lower_msg or "sure..." in lower_msg:
+        if lexicon.is_sarcastic(lower_msg, begin, end):
             sentiment_intensities["sarcasm"] = 3
 
-        # TextBlob polarity
-        blob = TextBlob(message)
-        polarity = blob.sentiment.polarity
-        if polarity > 0.6:
-            sentiment_intensities["happy"] = max(sentiment_intensities.get("happy", 0), 3)
-        elif polarity > 0.2:
-            sentiment_intensities["happy"] = max(sentiment_intensities.get("happy", 0), 2)
-        elif polarity < -0.6:
-            sentiment_intensities["sad"] = max(sentiment_intensities.get("sad", 0), 3)
-        elif polarity < -0.2:
-            sentiment_intensities["sad"] = max(sentiment_intensities.get("sad", 0), 2)
-
-        for sent, keywords in self.sentiment_map.items():
-            for keyword in keywords:
-                if re.search(r"\b" + re.escape(keyword) + r"\b", lower_msg):
-                    base_intensity = 3 if keyword in self.strong_keywords else 1
-                    if sent not in sentiment_intensities or base_intensity > sentiment_intensities[sent]:
-                        sentiment_intensities[sent] = base_intensity
-
-        for sent, current_intensity in list(sentiment_intensities.items()):
-            for keyword in self.sentiment_map.get(sent, []):
-                keyword_indices = [i for i, word in enumerate(words) if word == keyword]
-                for idx in keyword_indices:
-                    for i in range(max(0, idx - 3), idx):
-                        if words[i] in self.intensity_words:
-                            sentiment_intensities[sent] = max(
-                                current_intensity, self.intensity_words[words[i]]
-                            )
-
-        if "?" in message and "confused" not in sentiment_intensities:
+        # Polarity score; the keyword stage is timed around it
+        scored = perf_counter()
+        if polarity is None:
+            polarity = self.scorer.score(message, words)
+            metrics.POLARITY.observe(perf_counter() - scored)
+        keywords = perf_counter()
+        bucket = polarity_bucket(polarity)
+        if bucket is not None:
+            sentiment_intensities[bucket[0]] = bucket[1]
+
+        # Keywords and intensity modifiers in one pass over the tokens
+        lexicon.apply(words, sentiment_intensities)
+
+        if lower_msg.find("?", begin, end) != -1 and "confused" not in sentiment_intensities:
             sentiment_intensities["confused"] = 1
 
         if not sentiment_intensities:
             sentiment_intensities["neutral"] = 1
+        metrics.KEYWORDS.observe((scored - start) + (perf_counter() - keywords))
 
+        priority = config.sentiment_priority
         detected_sentiments = sorted(
             sentiment_intensities.items(),
-            key=lambda x: self.sentiment_priority.get(x[0], 99),
+            key=lambda x: priority.get(x[0], 99),
         )
-        return detected_sentiments
-
-    def get_mixed_emotion(self, sentiments: List[Tuple[str, int]]) -> Optional[str]:
-        sentiment_set = {s[0] for s in sentiments}
-        for pattern, mixed_type in self.mixed_patterns:
-            if pattern.issubset(sentiment_set):
-                intensities = {s[0]: s[1] for s in sentiments}
-                if all(intensities.get(sent, 0) >= 1 for sent in pattern):
-                    return mixed_type
-        return None
-
-    def get_emojis(self, sentiments: List[Tuple[str, int]], username: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        return detected_sentiments, polarity
+
+    def merge_prediction(self, sentiments: List[Tuple[str, int]], ranked, config: Optional[LexiconConfig] = None) -> List[Tuple[str, int]]:
+        # Adds a model's labels (classifier.MicroBatcher) to the rule result:
+        # each mapped sentiment keeps the stronger of the two intensities
+        config = config or self.config
+        priority = config.sentiment_priority
+        found = to_sentiments(ranked, priority)
+        if not found:
+            return sentiments
+        sentiment_intensities = dict(sentiments)
+        sentiment_intensities.pop("neutral", None)
+        for name, intensity in found.items():
+            sentiment_intensities[name] = max(sentiment_intensities.get(name, 0), intensity)
+        return sorted(sentiment_intensities.items(), key=lambda x: priority.get(x[0], 99))
+
+    def get_mixed_emotion(self, sentiments: List[Tuple[str, int]], config: Optional[LexiconConfig] = None) -> Optional[str]:
+        entry = (config or self.config).match_mixed(sentiments)
+        return entry[1] if entry is not None else None
+
+    def get_emojis(self, sentiments: List[Tuple[str, int]], username: Optional[str] = None, explain: bool = True, config: Optional[LexiconConfig] = None) -> Tuple[List[str], Optional[str]]:
+        # With explain=False no explanation is built and None is returned
+        config = config or self.config
+        rand = self.rng.random
+        ranking = None
+        if username and self.preferences is not None:
+            ranking = self.preferences.ranking(username)
         if not sentiments:
-            neutral_msg = "No sentiment detected, defaulting to neutral."
-            return ([random.choice(self.emoji_library["neutral"]["mild"])], neutral_msg)
+            options = config.neutral_options
+            return [_choose(options, rand, ranking)], NEUTRAL_EXPLANATION if explain else None
 
-        mixed_type = self.get_mixed_emotion(sentiments)
-        if mixed_type:
-            mixed_emojis = self.emoji_library["mixed"].get(mixed_type, [])
-            if mixed_emojis:
-                explanation = f"Mixed emotions detected: {mixed_type.replace('_', ' + ')}."
-                return [random.choice(mixed_emojis)], explanation
+        mixed = config.match_mixed(sentiments)
+        if mixed is not None and mixed[2]:
+            options = mixed[2]
+            return [_choose(options, rand, ranking)], mixed[3] if explain else None
 
         primary_sentiment, primary_intensity = sentiments[0]
-        intensity_level = self.intensity_levels.get(primary_intensity, "mild")
-        emoji_options = self.emoji_library.get(primary_sentiment, {}).get(
-            intensity_level, self.emoji_library["neutral"]["mild"]
-        )
-        primary_emoji = random.choice(emoji_options)
-        secondary_emoji = None
-        explanation = f"Primary sentiment: {primary_sentiment} ({intensity_level})."
-        if len(sentiments) > 1 and sentiments[1][1] >= 2:
+        slot = config.slot(primary_sentiment, primary_intensity)
+        options = slot[0]
+        emojis = [_choose(options, rand, ranking)]
+        explanation = slot[2] if explain else None
+        if len(sentiments) > 1:
             secondary_sentiment, secondary_intensity = sentiments[1]
-            sec_intensity_level = self.intensity_levels.get(
-                secondary_intensity, "mild"
-            )
-            secondary_options = self.emoji_library.get(
-                secondary_sentiment, {}
-            ).get(sec_intensity_level, [])
-            if secondary_options:
-                secondary_emoji = random.choice(secondary_options)
-                explanation += f" Secondary sentiment: {secondary_sentiment} ({sec_intensity_level})."
-        elif len(sentiments) > 1:
-            explanation += f" Secondary sentiment ({sentiments[1][0]}) not strong enough for emoji."
-
-        emojis = [primary_emoji]
-        if secondary_emoji:
-            emojis.append(secondary_emoji)
+            secondary = config.slot(secondary_sentiment, secondary_intensity)
+            if secondary_intensity >= 2:
+                options = secondary[1]
+                if options:
+                    emojis.append(_choose(options, rand, ranking))
+                    if explain:
+                        explanation = config.join_explanation(explanation, secondary[3])
+            elif explain:
+                explanation = config.join_explanation(explanation, secondary[4])
         return emojis, explanation
 
 class AIAgent:
-    def __init__(self):
-        self.sentiment = SentimentAnalyzer()
-
-    def suggest_emojis(self, message: str, username: Optional[str] = None) -> EmojiSuggestion:
-        # Split message into sentences (simple split, use nltk for better results if you want)
-        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', message.strip()) if s.strip()]
-        sentence_results = []
-        all_emojis = []
-        explanations = []
-        for sent in sentences:
-            sentiments = self.sentiment.detect_sentiment(sent)
-            emojis, explanation = self.sentiment.get_emojis(sentiments, username)
-            # Scale number of emojis with sentence length (1 emoji per 5 words, min 1)
-            n_emoji = max(1, len(sent.split()) // 5)
-            chosen_emojis = (emojis * ((n_emoji + len(emojis) - 1) // len(emojis)))[:n_emoji]
-            all_emojis.extend(chosen_emojis)
-            sentence_results.append({
-                "sentence": sent,
-                "emojis": chosen_emojis,
-                "explanation": explanation
-            })
-            explanations.append(f'"{sent}": {explanation}')
+    def __init__(self, cache: Optional[LRUCache] = None, polarity: Union[str, PolarityScorer, None] = None, pool=None, seed: Optional[int] = None, preferences=None, model=None):
+        self.sentiment = SentimentAnalyzer(cache=cache, polarity=polarity, seed=seed, preferences=preferences)
+        self.preferences = preferences
+        # Optional pool.AnalysisPool; sentence analysis falls back to
+        # self.sentiment when the pool is saturated or too slow
+        self.pool = pool
+        # Optional classifier.MicroBatcher refining the rule results; they
+        # are used as they are when it is saturated or too slow
+        self.model = model
+
+    def warm_up(self) -> None:
+        # Everything the first request would otherwise pay for: the polarity
+        # backend and, when configured, spawning the worker processes
+        self.sentiment.warm_up()
+        if self.pool is not None:
+            self.pool.start()
+        if self.model is not None:
+            self.model.warm_up()
+
+    def parse(self, message: str) -> Document:
+        # Simple split (see Document), use nltk for better results if you
+        # want. The message is lowered here once for all its sentences.
+        with metrics.SPLIT.time():
+            return Document(message)
+
+    def iter_sentences(self, message: str) -> Iterator[str]:
+        return iter(self.parse(message).texts())
+
+    def split_sentences(self, message: str) -> List[str]:
+        return self.parse(message).texts()
+
+    def analyze_sentences(self, sentences: List[str], config: Optional[LexiconConfig] = None, doc: Optional[Document] = None) -> List[Tuple[List[Tuple[str, int]], float]]:
+        # doc: the Document the sentences came from, in order
+        config = config or self.sentiment.config
+        metrics.SENTENCES.inc(len(sentences))
+        # Wall time of the whole analysis; with a pool the per-sentence
+        # stages run (and are counted) in the worker processes
+        with metrics.ANALYSIS.time():
+            if self.pool is not None:
+                analyses = self.pool.analyze_batch(
+                    sentences,
+                    fallback=lambda batch: self.sentiment.analyze_batch(batch, config),
+                    lexicon=config,
+                )
+            else:
+                analyses = [self.sentiment.analyze(sent, config, doc, i) for i, sent in enumerate(sentences)]
+        return self.apply_model(sentences, analyses, config)
+
+    def apply_model(self, sentences: List[str], analyses, config: Optional[LexiconConfig] = None):
+        if self.model is None or not sentences:
+            return analyses
+        with metrics.MODEL.time():
+            predictions = self.model.classify(sentences)
+        if predictions is None:
+            return analyses
+        return [
+            (self.sentiment.merge_prediction(sentiments, ranked, config), polarity)
+            for (sentiments, polarity), ranked in zip(analyses, predictions)
+        ]
+
+    def suggest_emojis(self, message: str, username: Optional[str] = None, explain: bool = True) -> EmojiSuggestion:
+        # One config snapshot per suggestion, even if a reload lands mid-way
+        config = self.sentiment.config
+        doc = self.parse(message)
+        sentences = doc.texts()
+        analyses = self.analyze_sentences(sentences, config, doc)
+        return self._build_suggestion(message, sentences, analyses, username, explain, config)
+
+    def suggest_emojis_batch(self, messages: List[str], username: Optional[str] = None, explain: bool = True) -> List[EmojiSuggestion]:
+        # Sentences from every message are analyzed together, then regrouped
+        # so the results line up with the inputs.
+        config = self.sentiment.config
+        docs = [self.parse(message) for message in messages]
+        split = [doc.texts() for doc in docs]
+        flat = [sent for sentences in split for sent in sentences]
+        if self.pool is not None:
+            flat_analyses = self.analyze_sentences(flat, config)
+        else:
+            sources = [(doc, i) for doc in docs for i in range(len(doc))]
+            metrics.SENTENCES.inc(len(flat))
+            with metrics.ANALYSIS.time():
+                flat_analyses = self.sentiment.analyze_batch(flat, config, sources)
+            flat_analyses = self.apply_model(flat, flat_analyses, config)
+        results = []
+        start = 0
+        for message, sentences in zip(messages, split):
+            end = start + len(sentences)
+            results.append(
+                self._build_suggestion(message, sentences, flat_analyses[start:end], username, explain, config)
+            )
+            start = end
+        return results
+
+    def iter_suggestions(self, message: str, username: Optional[str] = None, explain: bool = True, config: Optional[LexiconConfig] = None) -> Iterator[dict]:
+        # Yields each sentence's result as soon as it is analyzed
+        config = config or self.sentiment.config
+        doc = self.parse(message)
+        for i, sent in enumerate(doc.texts()):
+            metrics.SENTENCES.inc()
+            [(sentiments, polarity)] = self.apply_model([sent], [self.sentiment.analyze(sent, config, doc, i)], config)
+            yield self._sentence_result(sent, sentiments, polarity, username, explain, config)
+
+    def _sentence_result(self, sent, sentiments, polarity, username=None, explain=True, config=None) -> dict:
+        with metrics.EMOJI_SELECTION.time():
+            emojis, explanation = self.sentiment.get_emojis(sentiments, username, explain, config)
+        # Scale number of emojis with sentence length (1 emoji per 5 words, min 1)
+        n_emoji = max(1, len(sent.split()) // 5)
+        chosen_emojis = (emojis * ((n_emoji + len(emojis) - 1) // len(emojis)))[:n_emoji]
+        return {
+            "sentence": sent,
+            "emojis": chosen_emojis,
+            "explanation": explanation,
+            "sentiment": sentiments[0][0],
+            "intensity": sentiments[0][1],
+            "mixed": self.sentiment.get_mixed_emotion(sentiments, config),
+            "polarity": polarity,
+        }
+
+    def _build_suggestion(self, message, sentences, analyses, username=None, explain=True, config=None) -> EmojiSuggestion:
+        config = config or self.sentiment.config
+        sentence_results = [
+            self._sentence_result(sent, sentiments, polarity, username, explain, config)
+            for sent, (sentiments, polarity) in zip(sentences, analyses)
+        ]
+        return self.combine(message, sentence_results, config.version)
+
+    def combine(self, message: str, sentence_results: List[dict], lexicon_version: Optional[str] = None) -> EmojiSuggestion:
+        all_emojis = [emoji for r in sentence_results for emoji in r["emojis"]]
+        # Explanations are only joined when they were asked for
+        explanation = None
+        if all(r["explanation"] is not None for r in sentence_results):
+            explanation = "\n".join(f'"{r["sentence"]}": {r["explanation"]}' for r in sentence_results)
+        summary = {}
+        if sentence_results:
+            # Strongest sentence wins; ties go to the earliest one
+            strongest = max(sentence_results, key=lambda r: r["intensity"])
+            summary = {
+                "sentiment": strongest["sentiment"],
+                "intensity": strongest["intensity"],
+                "mixed": next((r["mixed"] for r in sentence_results if r["mixed"]), None),
+                "polarity": sum(r["polarity"] for r in sentence_results) / len(sentence_results),
+            }
         return EmojiSuggestion(
             emojis=all_emojis,
             message=message,
-            explanation="\n".join(explanations),
-            sentences=sentence_results
-        )
\ No newline at end of file
+            explanation=explanation,
+            sentences=sentence_results,
+            lexicon_version=lexicon_version or self.sentiment.config.version,
+            **summary
+        )
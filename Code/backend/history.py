@@ -0,0 +1,61 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import selectinload
+
+from models import Feedback, Message
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(msg):
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    created_at, msg_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(msg_id)
+
+
+def history_statement(user_id, position=None, limit=HISTORY_PAGE_SIZE):
+    # Keyset pagination on (created_at, id), newest first, with each
+    # message's feedback fetched by the same query. One extra row is read to
+    # tell whether there is a next page.
+    stmt = (
+        select(Message, Feedback)
+        .outerjoin(
+            Feedback,
+            and_(Feedback.message_id == Message.id, Feedback.user_id == user_id),
+        )
+        .where(Message.user_id == user_id)
+        .options(selectinload(Message.sentences))
+    )
+    if position is not None:
+        created_at, msg_id = position
+        stmt = stmt.where(
+            or_(
+                Message.created_at < created_at,
+                and_(Message.created_at == created_at, Message.id < msg_id),
+            )
+        )
+    return stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+
+
+def history_page(rows, limit) -> dict:
+    history = []
+    seen = set()
+    for msg, feedback in rows[:limit]:
+        if msg.id in seen:
+            continue  # more than one feedback row for the message
+        seen.add(msg.id)
+        item = msg.to_suggestion()
+        item["created_at"] = msg.created_at.isoformat()
+        item["message_id"] = msg.id
+        if feedback:
+            item["feedback"] = {"rating": feedback.rating, "comment": feedback.comment}
+        history.append(item)
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return {"history": history, "next_cursor": next_cursor}
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import LRUCache
+from models import RevokedUser, User
+
+# Who is calling, without a database round trip. A user id lives in the
+# signed session cookie, or in a signed token sent as TOKEN_HEADER by
+# clients that don't keep cookies; both are checked against the secret
+# alone. The user row is written in the same transaction as the user's
+# first message or feedback (insert_users), and KnownUsers remembers the
+# ids already written so later writes skip it. Ids purged by
+# /delete_user_data are revoked (RevokedUsers) and refused from then on.
+
+SECRET_KEY = os.getenv("EMOTAI_SECRET_KEY", "supersecret")
+TOKEN_HEADER = "X-EmotAI-User"
+# Seconds a user token stays valid (30 days); 0 never expires it, and then
+# revocations are kept forever
+TOKEN_MAX_AGE = int(os.getenv("EMOTAI_USER_TOKEN_MAX_AGE", str(30 * 24 * 3600)))
+# Seconds between reloads of other workers' revocations
+REVOCATION_REFRESH = float(os.getenv("EMOTAI_REVOCATION_REFRESH", "10"))
+KNOWN_USERS_SIZE = int(os.getenv("EMOTAI_KNOWN_USERS", "100000"))
+
+
+def new_user_id() -> str:
+    return str(uuid.uuid4())
+
+
+class UserTokens:
+    # {"u": user_id}, timestamped and signed with the secret
+    def __init__(self, secret: str = SECRET_KEY, max_age: int = TOKEN_MAX_AGE):
+        self.serializer = URLSafeTimedSerializer(secret, salt="emotai-user")
+        self.max_age = max_age or None
+
+    def issue(self, user_id: str) -> str:
+        return self.serializer.dumps({"u": user_id})
+
+    def verify(self, token: Optional[str]) -> Optional[str]:
+        # The user id, or None for a missing, forged or expired token
+        if not token:
+            return None
+        try:
+            payload = self.serializer.loads(token, max_age=self.max_age)
+        except BadSignature:
+            return None
+        user_id = payload.get("u") if isinstance(payload, dict) else None
+        return user_id if isinstance(user_id, str) else None
+
+
+class KnownUsers:
+    # Bounded set of user ids whose row is known to exist in this process.
+    # Forgetting one only costs a redundant INSERT OR IGNORE.
+    def __init__(self, max_size: int = KNOWN_USERS_SIZE):
+        self._cache = LRUCache(max_entries=max_size)
+
+    def missing(self, user_ids: Iterable[str]) -> List[str]:
+        return [user_id for user_id in dict.fromkeys(user_ids) if self._cache.get(user_id) is None]
+
+    def add(self, user_ids: Iterable[str]) -> None:
+        # Call after the transaction that wrote the rows has committed
+        for user_id in user_ids:
+            self._cache.put(user_id, True)
+
+    def discard(self, user_id: str) -> None:
+        self._cache.discard(user_id)
+
+    def snapshot(self) -> dict:
+        stats = self._cache.stats()
+        return {key: stats[key] for key in ("entries", "max_entries", "hits", "misses", "evictions")}
+
+
+class RevokedUsers:
+    # Purged user ids, refused in tokens and session cookies alike. revoke()
+    # writes a RevokedUser row in the caller's transaction; refresh() picks
+    # up other workers' revocations every `interval` seconds. A row is kept
+    # for max_age, after which every token issued before it has expired.
+    def __init__(self, max_age: int = TOKEN_MAX_AGE, interval: float = REVOCATION_REFRESH):
+        self.max_age = max_age
+        self.interval = interval
+        self._revoked = {}  # user id -> revoked_at
+        self._since = 0.0
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, user_id: str) -> bool:
+        return user_id in self._revoked
+
+    def due(self) -> bool:
+        return self._refreshed is None or time.monotonic() - self._refreshed >= self.interval
+
+    def _cutoff(self, now: float) -> float:
+        return now - self.max_age if self.max_age else 0.0
+
+    def refresh(self, session) -> None:
+        self._refreshed = time.monotonic()
+        cutoff = self._cutoff(time.time())
+        # A second of overlap for rows committed out of revoked_at order
+        rows = session.execute(
+            select(RevokedUser.id, RevokedUser.revoked_at)
+            .where(RevokedUser.revoked_at >= max(cutoff, self._since - 1.0))
+        ).all()
+        with self._lock:
+            self._revoked.update(rows)
+            self._since = max([self._since, *(revoked_at for _, revoked_at in rows)])
+            for user_id in [u for u, revoked_at in self._revoked.items() if revoked_at < cutoff]:
+                del self._revoked[user_id]
+
+    def revoke(self, session, user_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._revoked[user_id] = now
+        session.execute(delete(RevokedUser).where(RevokedUser.revoked_at < self._cutoff(now)))
+        session.execute(
+            _insert(session)(RevokedUser).on_conflict_do_update(
+                index_elements=["id"], set_={"revoked_at": now},
+            ),
+            [{"id": user_id, "revoked_at": now}],
+        )
+
+
+def _insert(session):
+    # The dialect's INSERT with ON CONFLICT support, as in rollups._upsert
+    dialect = session.get_bind().dialect.name
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+
+def insert_users(session, user_ids: List[str]) -> None:
+    # INSERT OR IGNORE of the user rows, in the caller's transaction
+    if user_ids:
+        session.execute(
+            _insert(session)(User).on_conflict_do_nothing(index_elements=["id"]),
+            [{"id": user_id} for user_id in user_ids],
+        )
@@ -1,12 +1,634 @@
-# Simple webhooks for integration; expand as needed
-from flask import Blueprint, request, jsonify
+# Webhook ingestion for chat integrations (Slack, Teams, ...). Events are
+# spooled to a local SQLite file and acknowledged straight away; a scorer
+# thread runs them through AIAgent in batches, and the results are POSTed
+# to the registered callback targets with retries.
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from flask import Blueprint, current_app, jsonify, request
+
+from db import PRAGMAS
+import metrics
+import runtime
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PATH = Path(os.getenv("EMOTAI_WEBHOOK_SPOOL", runtime.INSTANCE_DIR / "webhooks.db"))
+# Events waiting to be scored; /webhook answers 503 beyond this
+MAX_QUEUE = int(os.getenv("EMOTAI_WEBHOOK_MAX_QUEUE", "100000"))
+BATCH_SIZE = int(os.getenv("EMOTAI_WEBHOOK_BATCH_SIZE", "256"))
+# How long the scorer waits for a batch to fill once an event is queued
+BATCH_WAIT = float(os.getenv("EMOTAI_WEBHOOK_BATCH_WAIT_MS", "10")) / 1000
+# Comma-separated callback URLs registered at startup
+TARGETS = [url.strip() for url in os.getenv("EMOTAI_WEBHOOK_TARGETS", "").split(",") if url.strip()]
+# Requests in flight (and pooled connections) per target
+TARGET_CONCURRENCY = int(os.getenv("EMOTAI_WEBHOOK_TARGET_CONCURRENCY", "4"))
+DELIVERY_WORKERS = int(os.getenv("EMOTAI_WEBHOOK_WORKERS", "16"))
+# Attempts per delivery, with exponential backoff from RETRY_DELAY seconds
+DELIVERY_ATTEMPTS = int(os.getenv("EMOTAI_WEBHOOK_ATTEMPTS", "6"))
+RETRY_DELAY = float(os.getenv("EMOTAI_WEBHOOK_RETRY_DELAY", "0.5"))
+MAX_RETRY_DELAY = 60.0
+TIMEOUT = float(os.getenv("EMOTAI_WEBHOOK_TIMEOUT", "5.0"))
+# Seconds a worker's claim on a batch of events lasts before another
+# worker may take the events over
+LEASE = float(os.getenv("EMOTAI_WEBHOOK_LEASE", "60"))
+# Seconds between reloads of the targets other workers may have changed
+TARGET_REFRESH = 5.0
+# Slack's app signing secret: when set, every /webhook request must carry a
+# valid X-Slack-Signature. Without it, url_verification is only answered
+# when the payload's token matches EMOTAI_WEBHOOK_VERIFICATION_TOKEN.
+SIGNING_SECRET = os.getenv("EMOTAI_WEBHOOK_SIGNING_SECRET", "")
+VERIFICATION_TOKEN = os.getenv("EMOTAI_WEBHOOK_VERIFICATION_TOKEN", "")
+# Signed requests older than this (seconds) are refused as replays
+SIGNATURE_MAX_AGE = 300
+
+# Statuses worth retrying; any other non-2xx answer is final
+RETRY_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    claimed_until REAL
+);
+CREATE TABLE IF NOT EXISTS webhook_targets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    concurrency INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS webhook_deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target_id INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    due_at REAL NOT NULL,
+    dead INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_webhook_deliveries_due
+    ON webhook_deliveries (target_id, dead, due_at);
+"""
+
+integrations_bp = Blueprint("integrations", __name__, url_prefix="/integrations")
+
+
+def event_text(payload) -> Optional[str]:
+    # The message text of a Slack event callback ({"event": {"text"}}), a
+    # Teams/Slack-style message ({"text"}) or {"message"}
+    if not isinstance(payload, dict):
+        return None
+    event = payload.get("event")
+    if isinstance(event, dict) and isinstance(event.get("text"), str):
+        return event["text"]
+    for key in ("text", "message"):
+        if isinstance(payload.get(key), str):
+            return payload[key]
+    return None
+
+
+def valid_signature(body: bytes, timestamp, signature, secret: str, now: float = None) -> bool:
+    # Slack's v0 scheme: HMAC-SHA256 of "v0:<timestamp>:<body>"
+    try:
+        age = abs((now or time.time()) - int(timestamp))
+    except (TypeError, ValueError):
+        return False
+    if not secret or signature is None or age > SIGNATURE_MAX_AGE:
+        return False
+    digest = hmac.new(secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, f"v0={digest}")
+
+
+def _verified_challenge(data) -> bool:
+    # A signed request was already checked in webhook()
+    if SIGNING_SECRET:
+        return True
+    token = data.get("token")
+    return bool(VERIFICATION_TOKEN) and isinstance(token, str) and hmac.compare_digest(token, VERIFICATION_TOKEN)
+
+
+class Spool:
+    # Durable queue of received events and of the deliveries scored from
+    # them, shared by every worker process through one SQLite file. Work is
+    # claimed with a lease inside BEGIN IMMEDIATE, so two workers never
+    # take the same event or delivery, and the claims of a worker that dies
+    # are picked up again once the lease runs out. One connection per
+    # process, used under a lock.
+
+    def __init__(self, path=SPOOL_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(str(path), timeout=30.0, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(webhook_events)")}
+        if "claimed_until" not in columns:
+            self.conn.execute("ALTER TABLE webhook_events ADD COLUMN claimed_until REAL")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def pending(self) -> int:
+        # Events not scored yet, claimed ones included, across all workers
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM webhook_events").fetchone()[0]
+
+    def add_event(self, payload: str, max_queue: int) -> Optional[int]:
+        # The event's id, or None when max_queue events are waiting
+        with self.transaction() as conn:
+            # Counting stops at the bound, so the check stays cheap
+            queued = conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM webhook_events LIMIT ?)", (max_queue,)
+            ).fetchone()[0]
+            if queued >= max_queue:
+                return None
+            return conn.execute(
+                "INSERT INTO webhook_events (payload, received_at) VALUES (?, ?)", (payload, time.time())
+            ).lastrowid
+
+    def claim_events(self, limit: int, lease: float) -> list:
+        # Up to `limit` of the oldest unclaimed events, claimed for `lease`
+        # seconds; a plain read first, so idle polling takes no write lock
+        now = time.time()
+        unclaimed = "FROM webhook_events WHERE claimed_until IS NULL OR claimed_until < ?"
+        with self._lock:
+            if self.conn.execute(f"SELECT 1 {unclaimed} LIMIT 1", (now,)).fetchone() is None:
+                return []
+        with self.transaction() as conn:
+            rows = conn.execute(
+                f"SELECT id, payload, received_at {unclaimed} ORDER BY id LIMIT ?", (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE webhook_events SET claimed_until = ? WHERE id = ?", [(now + lease, row[0]) for row in rows]
+            )
+        return rows
+
+    def release_events(self, event_ids: List[int]) -> None:
+        with self.transaction() as conn:
+            conn.executemany("UPDATE webhook_events SET claimed_until = NULL WHERE id = ?", [(i,) for i in event_ids])
+
+    def scored(self, event_ids: List[int], deliveries: list) -> None:
+        # Swaps events for their deliveries in one transaction, so a crash
+        # can only score an event twice, never lose it
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM webhook_events WHERE id = ?", [(i,) for i in event_ids])
+            conn.executemany(
+                "INSERT INTO webhook_deliveries (target_id, body, received_at, due_at) VALUES (?, ?, ?, ?)",
+                deliveries,
+            )
+
+    def claim_deliveries(self, target_id: int, limit: int, lease: float) -> list:
+        # Due deliveries to one target, claimed by moving due_at past the
+        # lease; finish() sets it for real
+        now = time.time()
+        due = "FROM webhook_deliveries WHERE target_id = ? AND dead = 0 AND due_at <= ?"
+        with self._lock:
+            if self.conn.execute(f"SELECT 1 {due} LIMIT 1", (target_id, now)).fetchone() is None:
+                return []
+        with self.transaction() as conn:
+            rows = conn.execute(
+                f"SELECT id, body, received_at, attempts {due} ORDER BY due_at, id LIMIT ?",
+                (target_id, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE webhook_deliveries SET due_at = ? WHERE id = ?", [(now + lease, row[0]) for row in rows]
+            )
+        return rows
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self.conn.execute("SELECT MIN(due_at) FROM webhook_deliveries WHERE dead = 0").fetchone()[0]
+
+    def finish(self, delivered: List[int], retried: list, dead: list) -> None:
+        # retried: (due_at, error, id); dead: (error, id)
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM webhook_deliveries WHERE id = ?", [(i,) for i in delivered])
+            conn.executemany(
+                "UPDATE webhook_deliveries SET attempts = attempts + 1, due_at = ?, last_error = ? WHERE id = ?",
+                retried,
+            )
+            conn.executemany(
+                "UPDATE webhook_deliveries SET attempts = attempts + 1, dead = 1, last_error = ? WHERE id = ?",
+                dead,
+            )
+
+    def targets(self) -> list:
+        with self._lock:
+            return self.conn.execute("SELECT id, url, concurrency FROM webhook_targets ORDER BY id").fetchall()
+
+    def add_target(self, url: str, concurrency: int) -> int:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO webhook_targets (url, concurrency) VALUES (?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET concurrency = excluded.concurrency",
+                (url, concurrency),
+            )
+            return conn.execute("SELECT id FROM webhook_targets WHERE url = ?", (url,)).fetchone()[0]
+
+    def remove_target(self, target_id: int) -> bool:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM webhook_deliveries WHERE target_id = ?", (target_id,))
+            return conn.execute("DELETE FROM webhook_targets WHERE id = ?", (target_id,)).rowcount > 0
+
+    def counts(self) -> dict:
+        with self._lock:
+            queued = self.conn.execute("SELECT COUNT(*) FROM webhook_events").fetchone()[0]
+            pending, dead = self.conn.execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead), 0) FROM webhook_deliveries"
+            ).fetchone()
+        return {"queued_events": queued, "pending_deliveries": pending, "dead_deliveries": dead}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class TargetClient:
+    # Keep-alive HTTP/1.1 connections to one callback URL, like db.py's
+    # ConnectionPool: each POST reuses an idle connection when there is one.
+    # The dispatcher keeps at most `concurrency` requests in flight.
+
+    def __init__(self, target_id: int, url: str, concurrency: int, timeout: float = TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"not an http(s) URL: {url!r}")
+        self.id = target_id
+        self.url = url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host, self._port = parts.hostname, parts.port
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._idle = queue.LifoQueue()
+        self.in_flight = 0
+
+    def post(self, body: bytes) -> int:
+        for attempt in range(2):
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connection_class(self._host, self._port, timeout=self.timeout), False
+            try:
+                conn.request("POST", self._path, body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                if reused and attempt == 0:
+                    continue  # the server closed an idle keep-alive connection
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class WebhookPipeline:
+    # add() spools an event; the scorer thread turns queued events into
+    # one delivery per target in batches of up to batch_size, and the
+    # dispatcher thread sends due deliveries on a shared worker pool,
+    # never more than a target's concurrency at once per process. Failed
+    # deliveries are retried with backoff until `attempts`, then kept as
+    # dead. Nothing is opened at construction: start() (the app's warm_up,
+    # or the first use) opens the spool and starts the threads, and does so
+    # again in a forked child.
+
+    def __init__(self, agent, spool: Optional[Spool] = None, path=SPOOL_PATH, max_queue=MAX_QUEUE,
+                 batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT, workers=DELIVERY_WORKERS,
+                 attempts=DELIVERY_ATTEMPTS, retry_delay=RETRY_DELAY, timeout=TIMEOUT, lease=LEASE,
+                 targets=TARGETS):
+        self.agent = agent
+        self.spool = spool
+        self.path = spool.path if spool is not None else path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.workers = workers
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.lease = lease
+        # A delivery may take two timeouts (a stale keep-alive connection
+        # is retried once), so its claim outlasts that
+        self.delivery_lease = 2 * timeout + 10.0
+        self.initial_targets = targets
+        self.stats = Counter()
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._threads = []
+
+    def start(self) -> "WebhookPipeline":
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._open()
+        return self
+
+    def _open(self) -> None:
+        # After a fork the parent's connection and threads are not ours:
+        # everything is created afresh in this process
+        if self.spool is None or self._pid is not None:
+            self.spool = Spool(self.path)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="webhook-delivery")
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._targets_loaded = 0.0
+        self._results = queue.SimpleQueue()
+        self._events_ready = threading.Event()
+        self._dispatch_ready = threading.Event()
+        self._stop = threading.Event()
+        for url in self.initial_targets:
+            self.spool.add_target(url, TARGET_CONCURRENCY)
+        self._load_targets()
+        self._threads = [
+            threading.Thread(target=self._score_loop, name="webhook-scorer", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="webhook-dispatcher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._pid = os.getpid()
+
+    def add(self, payload: str) -> Optional[int]:
+        self.start()
+        event_id = self.spool.add_event(payload, self.max_queue)
+        if event_id is None:
+            self.stats["rejected"] += 1
+            metrics.WEBHOOK_EVENTS.labels("rejected").inc()
+            return None
+        self.stats["accepted"] += 1
+        metrics.WEBHOOK_EVENTS.labels("accepted").inc()
+        self._events_ready.set()
+        return event_id
+
+    def queue_depth(self) -> int:
+        return self.spool.pending() if self._pid == os.getpid() else 0
+
+    def _load_targets(self) -> None:
+        # Targets can be changed by any worker, so this also runs every
+        # TARGET_REFRESH seconds from the dispatcher
+        with self._clients_lock:
+            current = {}
+            for target_id, url, concurrency in self.spool.targets():
+                client = self._clients.get(target_id)
+                if client is None or client.url != url:
+                    client = TargetClient(target_id, url, concurrency, self.timeout)
+                client.concurrency = concurrency
+                current[target_id] = client
+            for target_id, client in self._clients.items():
+                if target_id not in current:
+                    client.close()
+            self._clients = current
+            self._targets_loaded = time.monotonic()
+
+    def add_target(self, url: str, concurrency: int = TARGET_CONCURRENCY) -> int:
+        TargetClient(0, url, concurrency)  # validates the URL
+        self.start()
+        target_id = self.spool.add_target(url, concurrency)
+        self._load_targets()
+        return target_id
+
+    def remove_target(self, target_id: int) -> bool:
+        self.start()
+        removed = self.spool.remove_target(target_id)
+        self._load_targets()
+        return removed
+
+    def targets(self) -> List[dict]:
+        self.start()
+        with self._clients_lock:
+            return [
+                {"id": c.id, "url": c.url, "concurrency": c.concurrency, "in_flight": c.in_flight}
+                for c in self._clients.values()
+            ]
+
+    def _score_loop(self) -> None:
+        while not self._stop.is_set():
+            self._events_ready.clear()
+            rows = self.spool.claim_events(self.batch_size, self.lease)
+            if not rows:
+                self._events_ready.wait(0.5)
+                continue
+            wait = rows[0][2] + self.batch_wait - time.time()
+            if len(rows) < self.batch_size and wait > 0:
+                # Let a burst fill the batch
+                time.sleep(wait)
+                rows += self.spool.claim_events(self.batch_size - len(rows), self.lease)
+            try:
+                self._score(rows)
+            except Exception:
+                logger.exception("webhooks: failed to score %d events", len(rows))
+                self.spool.release_events([row[0] for row in rows])
+                time.sleep(1.0)
+
+    def _score(self, rows) -> None:
+        payloads = [json.loads(payload) for _, payload, _ in rows]
+        suggestions = self.agent.suggest_emojis_batch([event_text(p) or "" for p in payloads], explain=False)
+        target_ids = [target_id for target_id, _, _ in self.spool.targets()]
+        now = time.time()
+        deliveries = []
+        for (event_id, _, received_at), payload, suggestion in zip(rows, payloads, suggestions):
+            body = json.dumps({
+                "event_id": event_id,
+                "emojis": suggestion.emojis,
+                "sentiment": suggestion.sentiment,
+                "intensity": suggestion.intensity,
+                "mixed": suggestion.mixed,
+                "polarity": suggestion.polarity,
+                "lexicon_version": suggestion.lexicon_version,
+                "received_at": received_at,
+                "scored_at": now,
+                "payload": payload,
+            }, ensure_ascii=False)
+            deliveries += [(target_id, body, received_at, now) for target_id in target_ids]
+        self.spool.scored([row[0] for row in rows], deliveries)
+        self.stats["scored"] += len(rows)
+        if not target_ids:
+            self.stats["undelivered"] += len(rows)
+        self._dispatch_ready.set()
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            self._dispatch_ready.clear()
+            self._apply_results()
+            if time.monotonic() - self._targets_loaded >= TARGET_REFRESH:
+                self._load_targets()
+            with self._clients_lock:
+                clients = list(self._clients.values())
+            for client in clients:
+                free = client.concurrency - client.in_flight
+                if free <= 0:
+                    continue
+                for delivery_id, body, received_at, attempts in self.spool.claim_deliveries(
+                    client.id, free, self.delivery_lease
+                ):
+                    client.in_flight += 1
+                    self._executor.submit(self._deliver, client, delivery_id, body, received_at, attempts)
+            next_due = self.spool.next_due()
+            timeout = 0.5 if next_due is None else min(0.5, max(0.001, next_due - time.time()))
+            self._dispatch_ready.wait(timeout)
+
+    def _deliver(self, client, delivery_id, body, received_at, attempts) -> None:
+        try:
+            status, error = client.post(body.encode("utf-8")), None
+        except Exception as exc:
+            status, error = None, f"{type(exc).__name__}: {exc}"
+        self._results.put((client, delivery_id, received_at, attempts, status, error))
+        self._dispatch_ready.set()
+
+    def _apply_results(self) -> None:
+        delivered, retried, dead = [], [], []
+        now = time.time()
+        while True:
+            try:
+                client, delivery_id, received_at, attempts, status, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            client.in_flight -= 1
+            if status is not None and 200 <= status < 300:
+                delivered.append(delivery_id)
+                metrics.WEBHOOK_DELIVERY_SECONDS.observe(now - received_at)
+                continue
+            error = error or f"HTTP {status}"
+            if (status is None or status in RETRY_STATUSES) and attempts + 1 < self.attempts:
+                delay = min(MAX_RETRY_DELAY, self.retry_delay * 2 ** attempts)
+                retried.append((now + delay, error, delivery_id))
+            else:
+                dead.append((error, delivery_id))
+        if delivered or retried or dead:
+            self.spool.finish(delivered, retried, dead)
+            for outcome, rows in (("delivered", delivered), ("retried", retried), ("dead", dead)):
+                self.stats[outcome] += len(rows)
+                metrics.WEBHOOK_DELIVERIES.labels(outcome).inc(len(rows))
+
+    def snapshot(self) -> dict:
+        # This process's counters, and the spool as all workers see it
+        self.start()
+        stats = {key: self.stats[key] for key in ("accepted", "rejected", "scored", "undelivered", "delivered", "retried", "dead")}
+        return {**stats, **self.spool.counts(), "max_queue": self.max_queue, "targets": self.targets()}
+
+    def shutdown(self) -> None:
+        # Undelivered work stays in the spool for the next start
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._events_ready.set()
+        self._dispatch_ready.set()
+        for thread in self._threads:
+            thread.join()
+        self._executor.shutdown(wait=True)
+        self._apply_results()
+        with self._clients_lock:
+            for client in self._clients.values():
+                client.close()
+        self.spool.close()
+        self._pid = None
+        self.spool = None
+
+
+def init_app(app, agent, pipeline: Optional[WebhookPipeline] = None) -> WebhookPipeline:
+    # Registers the routes only; the pipeline starts from the app's
+    # warm_up() or on first use
+    pipeline = pipeline or WebhookPipeline(agent)
+    app.extensions["webhooks"] = pipeline
+    app.register_blueprint(integrations_bp)
+    runtime.register_webhook_metrics(pipeline)
+    return pipeline
+
+
+def _pipeline() -> WebhookPipeline:
+    return current_app.extensions["webhooks"].start()
 
-integrations_bp = Blueprint("integrations", __name__)
 
 @integrations_bp.route("/webhook", methods=["POST"])
 def webhook():
-    data = request.json
-    # Example: log integration event
-    # You could add Slack, Teams, etc. logic here
-    print(f"Received integration webhook: {data}")
-    return jsonify({"status": "received"}), 200
\ No newline at end of file
+    # Acknowledged as soon as the event is spooled; the scored result goes
+    # to the registered targets
+    if SIGNING_SECRET and not valid_signature(
+        request.get_data(), request.headers.get("X-Slack-Request-Timestamp"),
+        request.headers.get("X-Slack-Signature"), SIGNING_SECRET,
+    ):
+        return jsonify({"error": "invalid signature"}), 401
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and data.get("type") == "url_verification":
+        if not _verified_challenge(data):
+            return jsonify({"error": "url_verification needs a signing secret or verification token"}), 403
+        return jsonify({"challenge": data.get("challenge")})
+    if event_text(data) is None:
+        metrics.WEBHOOK_EVENTS.labels("invalid").inc()
+        return jsonify({"error": "expected a JSON object with the message text"}), 400
+    event_id = _pipeline().add(request.get_data(as_text=True))
+    if event_id is None:
+        response = jsonify({"error": "webhook queue is full"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({"status": "queued", "event_id": event_id}), 202
+
+
+@integrations_bp.route("/webhook/targets", methods=["GET", "POST"])
+def webhook_targets():
+    # POST {"url": "https://...", "concurrency": 4} registers a callback
+    # target (or updates its concurrency)
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "admin token required"}), 403
+    pipeline = _pipeline()
+    if request.method == "GET":
+        return jsonify({"targets": pipeline.targets()})
+    data = request.get_json(silent=True) or {}
+    concurrency = data.get("concurrency", TARGET_CONCURRENCY)
+    if not isinstance(concurrency, int) or not 1 <= concurrency <= 64:
+        return jsonify({"error": "concurrency must be between 1 and 64"}), 400
+    try:
+        target_id = pipeline.add_target(str(data.get("url", "")), concurrency)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"id": target_id, "url": data["url"], "concurrency": concurrency}), 201
+
+
+@integrations_bp.route("/webhook/targets/<int:target_id>", methods=["DELETE"])
+def delete_webhook_target(target_id):
+    if not runtime.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "admin token required"}), 403
+    if not _pipeline().remove_target(target_id):
+        return jsonify({"error": "unknown target"}), 404
+    return jsonify({"deleted": target_id})
+
+
+@integrations_bp.route("/stats", methods=["GET"])
+def webhook_stats():
+    return jsonify(_pipeline().snapshot())
@@ -0,0 +1,117 @@
+import re
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b|[^\w\s]")
+
+
+class LexiconMatcher:
+    # Compiled form of the keyword tables used by SentimentAnalyzer.
+    # Built once, then every sentence is matched in a single pass over its
+    # tokens instead of one regex search per keyword.
+
+    def __init__(
+        self,
+        sentiment_map: Dict[str, List[str]],
+        strong_keywords: Iterable[str],
+        intensity_words: Dict[str, int],
+        sarcasm_phrases: Iterable[str] = ("yeah right", "as if", "sure..."),
+        window: int = 3,
+    ):
+        strong = set(strong_keywords)
+        self.window = window
+
+        # token -> ((sentiment, keyword rank, base intensity), ...)
+        keywords: Dict[str, list] = {}
+        for sent, words in sentiment_map.items():
+            for rank, keyword in enumerate(words):
+                base = 3 if keyword in strong else 1
+                keywords.setdefault(keyword, []).append((sent, rank, base))
+        self.keywords = {k: tuple(v) for k, v in keywords.items()}
+
+        # Single-token modifiers are a plain dict lookup; multi-word ones
+        # ("a little") are keyed by their first token and matched forward.
+        self.modifiers: Dict[str, int] = {}
+        phrases: Dict[str, list] = {}
+        for phrase, value in intensity_words.items():
+            parts = tuple(TOKEN_PATTERN.findall(phrase.lower()))
+            if len(parts) == 1:
+                self.modifiers[parts[0]] = value
+            elif parts:
+                phrases.setdefault(parts[0], []).append((parts[1:], value))
+        self.modifier_phrases = {k: tuple(v) for k, v in phrases.items()}
+
+        # Sarcasm cues are substring matches on the lowered sentence, so a
+        # single alternation keeps them to one scan.
+        self.sarcasm_re = re.compile(
+            "|".join(re.escape(p) for p in sarcasm_phrases)
+        )
+
+    # start/end limit both to a part of lower_msg (a document.Document
+    # sentence) without slicing it out
+    def tokenize(self, lower_msg: str, start: int = 0, end: int = sys.maxsize) -> List[str]:
+        return TOKEN_PATTERN.findall(lower_msg, start, end)
+
+    def is_sarcastic(self, lower_msg: str, start: int = 0, end: int = sys.maxsize) -> bool:
+        return self.sarcasm_re.search(lower_msg, start, end) is not None
+
+    def scan(self, words: List[str]) -> Tuple[dict, dict]:
+        """Return ``(keyword_hits, modifier_at)`` for a token list.
+
+        ``keyword_hits`` maps sentiment -> list of (rank, base, index) and
+        ``modifier_at`` maps token index -> intensity of the modifier that
+        ends there.
+        """
+        keywords = self.keywords
+        modifiers = self.modifiers
+        phrases = self.modifier_phrases
+        hits: dict = {}
+        modifier_at: dict = {}
+        n = len(words)
+        for idx, word in enumerate(words):
+            entries = keywords.get(word)
+            if entries is not None:
+                for sent, rank, base in entries:
+                    hit = (rank, base, idx)
+                    bucket = hits.get(sent)
+                    if bucket is None:
+                        hits[sent] = [hit]
+                    else:
+                        bucket.append(hit)
+            value = modifiers.get(word)
+            if value is not None:
+                modifier_at[idx] = value
+            candidates = phrases.get(word)
+            if candidates is not None:
+                for rest, value in candidates:
+                    end = idx + len(rest)
+                    if end < n and tuple(words[idx + 1:end + 1]) == rest:
+                        modifier_at[end] = value
+        return hits, modifier_at
+
+    def apply(self, words: List[str], sentiment_intensities: dict) -> dict:
+        hits, modifier_at = self.scan(words)
+        if not hits:
+            return sentiment_intensities
+
+        for sent, sent_hits in hits.items():
+            base = max(hit[1] for hit in sent_hits)
+            if base > sentiment_intensities.get(sent, 0):
+                sentiment_intensities[sent] = base
+
+        if not modifier_at:
+            return sentiment_intensities
+
+        # Modifiers are resolved in keyword order, then position order, with
+        # the last one in range winning -- the same order the per-keyword
+        # loops used, so results stay identical.
+        window = self.window
+        for sent, sent_hits in hits.items():
+            current = sentiment_intensities[sent]
+            sent_hits.sort()
+            for _rank, _base, idx in sent_hits:
+                for i in range(max(0, idx - window), idx):
+                    value = modifier_at.get(i)
+                    if value is not None:
+                        sentiment_intensities[sent] = max(current, value)
+        return sentiment_intensities
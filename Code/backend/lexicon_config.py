@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Optional, Tuple
+
+try:
+    from .lexicon import LexiconMatcher
+except ImportError:
+    from lexicon import LexiconMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_PATH = Path(__file__).parent / "data" / "lexicon.json"
+REQUIRED_KEYS = (
+    "version", "emoji_library", "sentiment_map", "mixed_patterns", "strong_keywords",
+    "intensity_words", "intensity_levels", "sentiment_priority",
+)
+
+
+class LexiconConfig:
+    # One version of the emoji/keyword configuration, compiled into the
+    # lookup structures SentimentAnalyzer uses. Never mutated once built:
+    # a reload builds a new LexiconConfig and swaps the reference, so
+    # requests already holding the old one finish on it.
+
+    def __init__(self, data: dict, source: Optional[Path] = None, digest: Optional[str] = None):
+        missing = [key for key in REQUIRED_KEYS if key not in data]
+        if missing:
+            raise ValueError(f"lexicon config is missing {', '.join(missing)}")
+        self.version = str(data["version"])
+        self.source = source
+        self.digest = digest or hashlib.sha256(
+            json.dumps(data, sort_keys=True).encode()
+        ).hexdigest()
+        self.loaded_at = time.time()
+        self.emoji_library = MappingProxyType({
+            name: MappingProxyType({key: tuple(options) for key, options in levels.items()})
+            for name, levels in data["emoji_library"].items()
+        })
+        self.sentiment_map = MappingProxyType(
+            {name: tuple(words) for name, words in data["sentiment_map"].items()}
+        )
+        self.mixed_patterns = tuple(
+            (frozenset(p["sentiments"]), p["type"]) for p in data["mixed_patterns"]
+        )
+        self.strong_keywords = frozenset(data["strong_keywords"])
+        self.intensity_words = MappingProxyType(dict(data["intensity_words"]))
+        self.intensity_levels = MappingProxyType(
+            {int(k): v for k, v in data["intensity_levels"].items()}
+        )
+        self.sentiment_priority = MappingProxyType(dict(data["sentiment_priority"]))
+        if "mild" not in self.emoji_library.get("neutral", {}):
+            raise ValueError("lexicon config needs neutral/mild emojis as the fallback")
+        self.lexicon = LexiconMatcher(
+            self.sentiment_map, self.strong_keywords, self.intensity_words,
+            sarcasm_phrases=data.get("sarcasm_phrases", ("yeah right", "as if", "sure...")),
+        )
+        self._compile_emoji_tables()
+
+    def _compile_emoji_tables(self) -> None:
+        # Flattens emoji_library into one tuple addressed by
+        # sentiment_id * 4 + intensity. Each slot holds (primary options,
+        # secondary options, primary explanation, secondary explanation,
+        # "not strong enough" explanation), so get_emojis does no dict
+        # walking or string formatting per call.
+        names = list(dict.fromkeys([
+            *self.sentiment_priority,
+            *self.sentiment_map,
+            *(name for pattern, _ in self.mixed_patterns for name in sorted(pattern)),
+            *(name for name in self.emoji_library if name != "mixed"),
+        ]))
+        self.sentiment_ids = MappingProxyType({name: i for i, name in enumerate(names)})
+        self.neutral_options = self.emoji_library["neutral"]["mild"]
+        self.emoji_table = tuple(
+            self.emoji_slot(name, intensity) for name in names for intensity in range(4)
+        )
+        # Mixed patterns as bitmasks over sentiment ids:
+        # (mask, mixed_type, emoji options, explanation)
+        mixed = self.emoji_library.get("mixed", {})
+        self.mixed_table = tuple(
+            (
+                sum(1 << self.sentiment_ids[name] for name in pattern),
+                mixed_type,
+                mixed.get(mixed_type, ()),
+                f"Mixed emotions detected: {mixed_type.replace('_', ' + ')}.",
+            )
+            for pattern, mixed_type in self.mixed_patterns
+        )
+        self._joined_explanations = {}
+
+    def emoji_slot(self, name: str, intensity: int) -> tuple:
+        level = self.intensity_levels.get(intensity, "mild")
+        options = self.emoji_library.get(name, {}).get(level, ())
+        return (
+            options or self.neutral_options,
+            options,
+            f"Primary sentiment: {name} ({level}).",
+            f" Secondary sentiment: {name} ({level}).",
+            f" Secondary sentiment ({name}) not strong enough for emoji.",
+        )
+
+    def slot(self, name: str, intensity: int) -> tuple:
+        sentiment_id = self.sentiment_ids.get(name)
+        if sentiment_id is None:
+            return self.emoji_slot(name, intensity)
+        return self.emoji_table[sentiment_id * 4 + (intensity if 0 < intensity < 4 else 0)]
+
+    def match_mixed(self, sentiments: List[Tuple[str, int]]) -> Optional[tuple]:
+        ids = self.sentiment_ids
+        mask = 0
+        for name, intensity in sentiments:
+            if intensity >= 1 and name in ids:
+                mask |= 1 << ids[name]
+        for entry in self.mixed_table:
+            if mask & entry[0] == entry[0]:
+                return entry
+        return None
+
+    def join_explanation(self, primary: str, secondary: str) -> str:
+        # Primary + secondary explanations come from a small fixed set, so
+        # each joined string is built once and shared
+        key = (primary, secondary)
+        joined = self._joined_explanations.get(key)
+        if joined is None:
+            joined = primary + secondary
+            if len(self._joined_explanations) < 4096:
+                self._joined_explanations[key] = joined
+        return joined
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "digest": self.digest,
+            "source": str(self.source) if self.source else None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def lexicon_path() -> Path:
+    return Path(os.getenv("EMOTAI_LEXICON_PATH", DEFAULT_LEXICON_PATH))
+
+
+def load_lexicon(path: Optional[Path] = None) -> LexiconConfig:
+    path = Path(path or lexicon_path())
+    raw = path.read_bytes()
+    try:
+        data = json.loads(raw)
+    except ValueError as exc:
+        raise ValueError(f"{path} is not valid JSON: {exc}") from None
+    try:
+        return LexiconConfig(data, source=path, digest=hashlib.sha256(raw).hexdigest())
+    except (AttributeError, KeyError, TypeError) as exc:
+        raise ValueError(f"{path} has an invalid lexicon config: {exc!r}") from None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_lexicon() -> LexiconConfig:
+    # Compiled once per process and shared by every analyzer built without
+    # an explicit config
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = load_lexicon()
+    return _default
+
+
+class LexiconWatcher:
+    # Polls the config file and hot-swaps it into the analyzer when its
+    # mtime or size changes. A file that fails to load is reported and the
+    # running version is kept.
+
+    def __init__(self, analyzer, interval: float = 2.0):
+        self.analyzer = analyzer
+        self.interval = interval
+        self._stop = threading.Event()
+        self._stamp = self._file_stamp()
+        self._thread = threading.Thread(target=self._run, name="lexicon-watcher", daemon=True)
+        self._thread.start()
+
+    def _file_stamp(self):
+        source = self.analyzer.config.source
+        try:
+            stat = os.stat(source)
+        except (OSError, TypeError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            try:
+                if self.analyzer.reload_config():
+                    logger.info("lexicon: loaded version %s", self.analyzer.config.version)
+            except (OSError, ValueError) as exc:
+                logger.warning("lexicon: keeping version %s: %s", self.analyzer.config.version, exc)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,255 @@
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# In-process metrics rendered in the Prometheus text format (/metrics).
+# Kept dependency-free and cheap enough for the per-sentence hot path: an
+# observation is a bisect and three additions under an uncontended lock.
+# EMOTAI_METRICS=0 turns every observation into a no-op.
+
+ENABLED = os.getenv("EMOTAI_METRICS", "1") == "1"
+
+# Seconds; the hot-path stages take from microseconds to milliseconds
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._function = None
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def set_function(self, fn):
+        # Read the value(s) at scrape time instead: fn returns a number, or
+        # a {label values tuple: number} dict for labelled metrics
+        self._function = fn
+        return self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if self._function is not None:
+            values = self._function()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for label_values, value in values.items():
+                if value is not None:
+                    labels = _format_labels(self.labelnames, label_values)
+                    lines.append(f"{self.name}{labels} {_format_value(value)}")
+            return lines
+        for label_values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(label_values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if ENABLED:
+            with self.lock:
+                self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, label_values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _Span:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(perf_counter() - self.start)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        if not ENABLED:
+            return
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        # with histogram.labels("stage").time(): ...
+        return _Span(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, label_values, child):
+        with child.lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            labels = _format_labels(self.labelnames, label_values, [f'le="{_format_value(float(bound))}"'])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "emotai_stage_seconds", "Time spent in each hot-path stage.", ("stage",),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "emotai_request_seconds", "HTTP request latency by route.", ("route", "method"),
+))
+REQUESTS = REGISTRY.register(Counter(
+    "emotai_requests_total", "HTTP requests by route and status.", ("route", "method", "status"),
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "emotai_requests_in_flight", "HTTP requests being served.",
+))
+SENTENCES = REGISTRY.register(Counter(
+    "emotai_sentences_total", "Sentences analyzed.",
+))
+DB_RETRIES = REGISTRY.register(Counter(
+    "emotai_db_retries_total", "Commits retried after the database was locked.",
+))
+WEBHOOK_EVENTS = REGISTRY.register(Counter(
+    "emotai_webhook_events_total", "Webhook events by outcome (accepted, rejected when full, invalid).", ("outcome",),
+))
+WEBHOOK_DELIVERIES = REGISTRY.register(Counter(
+    "emotai_webhook_deliveries_total", "Webhook result deliveries by outcome (delivered, retried, dead).", ("outcome",),
+))
+WEBHOOK_DELIVERY_SECONDS = REGISTRY.register(Histogram(
+    "emotai_webhook_delivery_seconds", "Time from receiving a webhook event to delivering its result.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+))
+USER_IDS = REGISTRY.register(Counter(
+    "emotai_user_ids_total", "Requests by where their user id came from (token, session or new).", ("source",),
+))
+
+MODEL_FALLBACKS = REGISTRY.register(Counter(
+    "emotai_model_fallbacks_total", "Requests served by the rules alone instead of the model.", ("reason",),
+))
+MODEL_BATCH_SIZE = REGISTRY.register(Histogram(
+    "emotai_model_batch_size", "Sentences per model micro-batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+))
+
+# The stages, so the hot path does not look them up per call
+SPLIT = STAGE_SECONDS.labels("split")
+ANALYSIS = STAGE_SECONDS.labels("analysis")
+KEYWORDS = STAGE_SECONDS.labels("keywords")
+POLARITY = STAGE_SECONDS.labels("polarity")
+EMOJI_SELECTION = STAGE_SECONDS.labels("emoji_selection")
+SERIALIZE = STAGE_SECONDS.labels("serialize")
+DB_COMMIT = STAGE_SECONDS.labels("db_commit")
+MODEL = STAGE_SECONDS.labels("model")  # a request's wait for its predictions
+MODEL_INFERENCE = STAGE_SECONDS.labels("model_inference")  # one micro-batch
@@ -0,0 +1,52 @@
+import json
+
+from models import db, Message, MessageSentence, compact_suggestion
+
+
+def backfill_structured_sentiment(agent, batch_size: int = 500) -> int:
+    # Fills Message/MessageSentence structured columns for rows stored as a
+    # JSON blob only, re-analyzing their sentences but keeping the emojis and
+    # explanations that were shown to the user. Commits once per batch.
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = (
+            Message.query
+            .filter(Message.id > last_id, Message.primary_sentiment.is_(None))
+            .order_by(Message.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return migrated
+        for msg in batch:
+            last_id = msg.id
+            stored = json.loads(msg.suggestion or "{}")
+            sentences = stored.get("sentences") or [
+                {"sentence": sent, "emojis": [], "explanation": ""}
+                for sent in agent.split_sentences(msg.text or "")
+            ]
+            if not sentences:
+                continue
+            analyses = agent.sentiment.analyze_batch([s["sentence"] for s in sentences])
+            rows = []
+            for i, (sentiments, polarity) in enumerate(analyses):
+                rows.append(MessageSentence(
+                    position=i,
+                    primary_sentiment=sentiments[0][0],
+                    intensity=sentiments[0][1],
+                    mixed_type=agent.sentiment.get_mixed_emotion(sentiments),
+                    polarity=polarity,
+                ))
+            strongest = max(rows, key=lambda r: r.intensity)
+            msg.sentences = rows
+            msg.primary_sentiment = strongest.primary_sentiment
+            msg.intensity = strongest.intensity
+            msg.mixed_type = next((r.mixed_type for r in rows if r.mixed_type), None)
+            msg.polarity = sum(r.polarity for r in rows) / len(rows)
+            msg.suggestion = compact_suggestion({
+                "emojis": stored.get("emojis", []),
+                "sentences": sentences,
+            })
+            migrated += 1
+        db.session.commit()
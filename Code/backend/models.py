@@ -0,0 +1,175 @@
+import json
+from datetime import datetime, timezone
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+
+db = SQLAlchemy()
+
+# --- SQLAlchemy Models ---
+class User(db.Model):
+    id = db.Column(db.String, primary_key=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class Message(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String, db.ForeignKey('user.id'))
+    text = db.Column(db.Text)
+    # JSON: {"emojis":[], "sentences":[{"sentence", "emojis", "explanation"}]}.
+    # Rows written before the structured columns also carry "message" and
+    # "explanation".
+    suggestion = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Message-level summary, see EmojiSuggestion
+    primary_sentiment = db.Column(db.String, index=True)
+    intensity = db.Column(db.Integer)
+    mixed_type = db.Column(db.String)
+    polarity = db.Column(db.Float)
+    # Version of the lexicon config (data/lexicon.json) that produced it
+    lexicon_version = db.Column(db.String)
+
+    sentences = db.relationship(
+        "MessageSentence",
+        order_by="MessageSentence.position",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        # /history pages through one user's messages newest first
+        db.Index("ix_message_user_created", "user_id", "created_at"),
+    )
+
+    @classmethod
+    def from_suggestion(cls, user_id, text, suggestion: dict) -> "Message":
+        sentences = suggestion.get("sentences") or []
+        return cls(
+            user_id=user_id,
+            text=text,
+            suggestion=compact_suggestion(suggestion),
+            primary_sentiment=suggestion.get("sentiment"),
+            intensity=suggestion.get("intensity"),
+            mixed_type=suggestion.get("mixed"),
+            polarity=suggestion.get("polarity"),
+            lexicon_version=suggestion.get("lexicon_version"),
+            sentences=[
+                MessageSentence(
+                    position=i,
+                    primary_sentiment=sent["sentiment"],
+                    intensity=sent["intensity"],
+                    mixed_type=sent["mixed"],
+                    polarity=sent["polarity"],
+                )
+                for i, sent in enumerate(sentences)
+            ],
+        )
+
+    def to_suggestion(self) -> dict:
+        # Rebuilds the EmojiSuggestion-shaped dict /suggest returned
+        item = json.loads(self.suggestion)
+        sentences = item.get("sentences") or []
+        for sent, row in zip(sentences, self.sentences):
+            sent.update(
+                sentiment=row.primary_sentiment,
+                intensity=row.intensity,
+                mixed=row.mixed_type,
+                polarity=row.polarity,
+            )
+        item["message"] = self.text
+        if "explanation" not in item:
+            item["explanation"] = None
+            if all(sent["explanation"] is not None for sent in sentences):
+                item["explanation"] = "\n".join(
+                    f'"{sent["sentence"]}": {sent["explanation"]}' for sent in sentences
+                )
+        item.update(
+            sentiment=self.primary_sentiment,
+            intensity=self.intensity,
+            mixed=self.mixed_type,
+            polarity=self.polarity,
+            lexicon_version=self.lexicon_version,
+        )
+        return item
+
+class MessageSentence(db.Model):
+    # Structured per-sentence results, so analytics can filter and group in
+    # SQL instead of decoding Message.suggestion
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id', ondelete="CASCADE"), index=True)
+    position = db.Column(db.Integer, nullable=False)
+    primary_sentiment = db.Column(db.String, index=True)
+    intensity = db.Column(db.Integer)
+    mixed_type = db.Column(db.String)
+    polarity = db.Column(db.Float)
+
+def compact_suggestion(suggestion: dict) -> str:
+    # Only what the structured columns cannot rebuild: the chosen emojis and
+    # per-sentence text/explanations (the message text lives in Message.text)
+    return json.dumps({
+        "emojis": suggestion.get("emojis", []),
+        "sentences": [
+            {"sentence": s["sentence"], "emojis": s["emojis"], "explanation": s["explanation"]}
+            for s in suggestion.get("sentences") or []
+        ],
+    }, ensure_ascii=False)
+
+RATINGS = (1, 2, 3)  # 1=bad, 2=ok, 3=good
+
+def valid_rating(rating) -> bool:
+    # JSON integers only: "3", 3.0 and true are rejected
+    return type(rating) is int and rating in RATINGS
+
+class Feedback(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    user_id = db.Column(db.String, db.ForeignKey('user.id'))
+    rating = db.Column(db.Integer)  # 1=bad, 2=ok, 3=good
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.Index("ix_feedback_message_user", "message_id", "user_id"),
+        # Purging a user deletes their feedback in batches (purge.py)
+        db.Index("ix_feedback_user", "user_id"),
+    )
+
+class RevokedUser(db.Model):
+    # User ids purged by /delete_user_data (identity.RevokedUsers)
+    id = db.Column(db.String, primary_key=True)
+    revoked_at = db.Column(db.Float, nullable=False, index=True)  # Unix time
+
+class IdBlock(db.Model):
+    # Hi-lo id allocator state: the next unreserved id per table, so ids can
+    # be handed out before the row is written (write-behind mode)
+    name = db.Column(db.String, primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+class RollupCount(db.Model):
+    # Pre-aggregated /analytics counters. kind is "emoji", "sentiment",
+    # "rating" or "messages"; bucket is "all" or an hour like "2025-01-31T14".
+    kind = db.Column(db.String, primary_key=True)
+    key = db.Column(db.String, primary_key=True)
+    bucket = db.Column(db.String, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def create_schema(bind=None):
+    # `bind` is a Connection to create the schema through (the ASGI app runs
+    # this via AsyncConnection.run_sync); defaults to Flask-SQLAlchemy's engine
+    if bind is None:
+        with db.engine.begin() as conn:
+            return create_schema(conn)
+    db.metadata.create_all(bind)
+    # create_all skips tables that already exist, so columns and indexes
+    # added later have to be created explicitly on older databases
+    inspector = inspect(bind)
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable and not column.primary_key:
+                column_type = column.type.compile(dialect=bind.dialect)
+                bind.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                )
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
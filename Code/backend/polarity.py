@@ -0,0 +1,141 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .lexicon import TOKEN_PATTERN
+except ImportError:
+    from lexicon import TOKEN_PATTERN
+
+LEXICON_PATH = Path(__file__).parent / "data" / "polarity_lexicon.tsv"
+NEGATIONS = frozenset(("no", "not", "never", "t"))  # "t" is the tail of "n't"
+
+
+def polarity_bucket(polarity: float) -> Optional[Tuple[str, int]]:
+    # Thresholds that turn a polarity score into a happy/sad intensity
+    if polarity > 0.6:
+        return ("happy", 3)
+    if polarity > 0.2:
+        return ("happy", 2)
+    if polarity < -0.6:
+        return ("sad", 3)
+    if polarity < -0.2:
+        return ("sad", 2)
+    return None
+
+
+class PolarityScorer:
+    name = "base"
+
+    def score(self, text: str, words: Optional[List[str]] = None) -> float:
+        raise NotImplementedError
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        return [self.score(text) for text in texts]
+
+
+class TextBlobScorer(PolarityScorer):
+    # Same scores as TextBlob(text).sentiment.polarity, but through the
+    # pattern sentiment function PatternAnalyzer wraps: no TextBlob object
+    # per sentence, and no namedtuple class built per call.
+    name = "textblob"
+
+    def __init__(self):
+        from textblob.en import sentiment
+
+        self._sentiment = sentiment
+
+    def score(self, text: str, words: Optional[List[str]] = None) -> float:
+        return self._sentiment(text)[0]
+
+
+class LexiconScorer(PolarityScorer):
+    # Built-in scorer over a precomputed word -> (polarity, intensity,
+    # is_modifier, ends_in_ly) table. It follows pattern's rules for
+    # modifiers ("very good"), negation ("not good") and "!", keeping the
+    # running assessment in local scalars so nothing is allocated per token.
+    name = "lexicon"
+
+    def __init__(self, path: Path = LEXICON_PATH):
+        self.lexicon = self.load(path)
+
+    @staticmethod
+    def load(path: Path) -> Dict[str, tuple]:
+        lexicon = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                word, polarity, intensity, modifier = line.rstrip("\n").split("\t")
+                lexicon[word] = (
+                    float(polarity), float(intensity), modifier == "1", word.endswith("ly")
+                )
+        return lexicon
+
+    def score(self, text: str, words: Optional[List[str]] = None) -> float:
+        if words is None:
+            words = TOKEN_PATTERN.findall(text.lower())
+        lexicon = self.lexicon
+        total = 0.0
+        count = 0
+        current = None  # polarity of the open assessment
+        intensity = 1.0
+        negated = False
+        modifier = False  # previous known word can modify the next one
+        modifier_ly = False
+        negation = False  # pending "not"/"no"/"never"
+        for w in words:
+            entry = lexicon.get(w)
+            if entry is not None:
+                p, i, is_modifier, is_ly = entry
+                if not modifier:
+                    if current is not None:
+                        total += current * -0.5 if negated else current
+                        count += 1
+                    current = p
+                    negated = False
+                else:
+                    current = max(-1.0, min(p * intensity, 1.0))
+                intensity = i
+                if negation:
+                    intensity = 1.0 / intensity
+                    negated = True
+                modifier = is_modifier
+                modifier_ly = is_ly
+                negation = w in NEGATIONS
+            else:
+                if w in NEGATIONS:
+                    negation = True
+                elif negation and len(w.strip("'")) > 1:
+                    negation = False
+                if negation and modifier and modifier_ly:
+                    negated = True
+                    negation = False
+                elif modifier and len(w) > 2:
+                    modifier = False
+                if w == "!" and current is not None:
+                    current = max(-1.0, min(current * 1.25, 1.0))
+        if current is not None:
+            total += current * -0.5 if negated else current
+            count += 1
+        return total / count if count else 0.0
+
+
+POLARITY_BACKENDS = {
+    TextBlobScorer.name: TextBlobScorer,
+    LexiconScorer.name: LexiconScorer,
+}
+
+
+def polarity_backend(name: Optional[str] = None) -> type:
+    name = name or os.getenv("EMOTAI_POLARITY_BACKEND", TextBlobScorer.name)
+    try:
+        return POLARITY_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown polarity backend {name!r}; choose from {sorted(POLARITY_BACKENDS)}"
+        ) from None
+
+
+def get_polarity_scorer(name: Optional[str] = None) -> PolarityScorer:
+    return polarity_backend(name)()
@@ -0,0 +1,155 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+# Analyzer owned by each worker process, built once by _init_worker
+_worker_analyzer = None
+
+
+def _init_worker(polarity: Optional[str], cache_size: int):
+    global _worker_analyzer
+    try:
+        from .cache import LRUCache
+        from .emotai import SentimentAnalyzer
+    except ImportError:
+        from cache import LRUCache
+        from emotai import SentimentAnalyzer
+
+    cache = LRUCache(max_entries=cache_size) if cache_size else None
+    _worker_analyzer = SentimentAnalyzer(cache=cache, polarity=polarity)
+    # Pay for lazy model/lexicon loading before the first real request
+    _worker_analyzer.warm_up()
+
+
+def _analyze(
+    sentences: List[str], lexicon: Optional[Tuple[str, str]] = None
+) -> List[Tuple[List[Tuple[str, int]], float]]:
+    # lexicon is the caller's (config file, digest); a worker still on an
+    # older version reloads it before analyzing
+    if lexicon is not None and _worker_analyzer.config.digest != lexicon[1]:
+        _worker_analyzer.reload_config(lexicon[0])
+        if _worker_analyzer.config.digest != lexicon[1]:
+            raise RuntimeError(f"lexicon {lexicon[0]} changed again while loading")
+    return _worker_analyzer.analyze_batch(sentences)
+
+
+def _ping() -> bool:
+    return _worker_analyzer is not None
+
+
+class AnalysisPool:
+    # Process pool for the CPU-bound sentence analysis step, so a single web
+    # worker is not capped at one core by the GIL. Callers pass a fallback
+    # that runs inline when the pool is saturated, slow or broken.
+
+    def __init__(
+        self,
+        size: int,
+        max_pending: Optional[int] = None,
+        timeout: float = 2.0,
+        polarity: Optional[str] = None,
+        cache_size: int = 0,
+        chunk_size: int = 64,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or size * 4
+        # Backpressure slots: chunks submitted and not yet finished
+        self._in_flight = 0
+        self._slots_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "saturated": 0, "timeouts": 0, "errors": 0}
+        self._executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(polarity, cache_size),
+        )
+
+    def start(self) -> "AnalysisPool":
+        # Spawn every worker up front instead of on the first requests
+        for future in [self._executor.submit(_ping) for _ in range(self.size)]:
+            future.result()
+        return self
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _acquire(self, n: int) -> bool:
+        # All n slots or none
+        with self._slots_lock:
+            if self._in_flight + n > self.max_pending:
+                return False
+            self._in_flight += n
+            return True
+
+    def _release(self, n: int = 1) -> None:
+        with self._slots_lock:
+            self._in_flight -= n
+
+    def analyze_batch(
+        self,
+        sentences: List[str],
+        fallback: Callable[[List[str]], list],
+        lexicon=None,
+    ) -> List[Tuple[List[Tuple[str, int]], float]]:
+        # lexicon: the LexiconConfig the caller is using, so workers analyze
+        # with the same version
+        if not sentences:
+            return []
+        chunks = [
+            sentences[i:i + self.chunk_size] for i in range(0, len(sentences), self.chunk_size)
+        ]
+        # Backpressure: a request only enters the pool if every chunk gets a
+        # slot; otherwise it is analyzed inline instead of queueing.
+        if not self._acquire(len(chunks)):
+            self._count("saturated")
+            return fallback(sentences)
+
+        lexicon_ref = (str(lexicon.source), lexicon.digest) if lexicon is not None and lexicon.source else None
+        futures = []
+        try:
+            for chunk in chunks:
+                future = self._executor.submit(_analyze, chunk, lexicon_ref)
+                future.add_done_callback(lambda _f: self._release())
+                futures.append(future)
+        except (BrokenProcessPool, RuntimeError):
+            self._release(len(chunks) - len(futures))
+            self._count("errors")
+            return fallback(sentences)
+        self._count("submitted", len(futures))
+
+        results = []
+        deadline = time.monotonic() + self.timeout
+        try:
+            for future in futures:
+                remaining = max(0.0, deadline - time.monotonic())
+                results.extend(future.result(timeout=remaining))
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            self._count("timeouts")
+            return fallback(sentences)
+        except Exception:
+            # Broken pool, or the worker failed (e.g. a lexicon reload)
+            self._count("errors")
+            return fallback(sentences)
+        self._count("completed", len(futures))
+        return results
+
+    def in_flight(self) -> int:
+        # Chunks holding a backpressure slot
+        with self._slots_lock:
+            return self._in_flight
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            return {"size": self.size, "max_pending": self.max_pending, "in_flight": self.in_flight(), **self.stats}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
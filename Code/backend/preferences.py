@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from db import (
+    add_user_preference_stats, delete_user_preferences, init_db, load_user_preference_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ratings are 1=bad, 2=ok, 3=good; each point above or below "ok" counts
+# as this many uses
+RATING_WEIGHT = 3
+NEUTRAL_RATING = 2
+
+
+class _Entry:
+    __slots__ = ("stats", "ranking", "loaded", "loaded_at", "accessed")
+
+    def __init__(self, now):
+        self.stats = {}  # emoji -> [usage, rating_sum, rating_count]
+        self.ranking = None  # top-K {emoji: score}, rebuilt after updates
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.accessed = now
+
+
+class PreferenceCache:
+    # Per-user emoji preferences kept in memory for get_emojis. The request
+    # path only touches this cache: /suggest and /feedback update counters
+    # in place, and a background thread loads users on first sight (from
+    # db.py's user_preferences table) and flushes the accumulated deltas
+    # back every flush_interval seconds. Users are evicted least recently
+    # used beyond max_users, or after ttl seconds without a lookup; a user
+    # loaded more than ttl seconds ago is served as is and reloaded behind
+    # the request, picking up other workers' flushed updates.
+
+    def __init__(self, max_users=10000, ttl=900.0, top_k=8, flush_interval=5.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.top_k = top_k
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()
+        # Deltas not yet written, kept apart from the entries so eviction
+        # never loses them. The store plus these is the truth at any time.
+        self._dirty = {}
+        self._to_load = set()
+        self._lock = threading.Lock()
+        # Serializes store I/O, so a load never sees a half-flushed state
+        self._io_lock = threading.Lock()
+        self._store_ready = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.metrics = {
+            "hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "evictions": 0,
+            "flushes": 0, "flushed_rows": 0, "flush_errors": 0, "last_flush_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="preferences", daemon=True)
+        self._thread.start()
+
+    def ranking(self, username):
+        # {emoji: score} of the user's top-K positively scored emojis, or
+        # None while the user is not loaded yet
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.metrics["misses"] += 1
+                self._insert(username, now)
+                return None
+            self._entries.move_to_end(username)
+            entry.accessed = now
+            if not entry.loaded:
+                self.metrics["misses"] += 1
+                self._schedule_load(username)
+                return None
+            self.metrics["hits"] += 1
+            if now - entry.loaded_at > self.ttl:
+                self._schedule_load(username)
+            if entry.ranking is None:
+                entry.ranking = self._rank(entry.stats)
+            return entry.ranking
+
+    def record_usage(self, username, emojis) -> None:
+        counts = {}
+        for emoji in emojis:
+            counts[emoji] = counts.get(emoji, 0) + 1
+        self._add(username, {emoji: (n, 0, 0) for emoji, n in counts.items()})
+
+    def record_rating(self, username, emojis, rating, previous=None) -> None:
+        # previous: the rating this feedback replaces, if any
+        if previous is None:
+            delta = (0, rating, 1)
+        else:
+            delta = (0, rating - previous, 0)
+        self._add(username, {emoji: delta for emoji in set(emojis)})
+
+    def forget(self, username) -> None:
+        # Drops the user from memory, pending deltas and the store
+        with self._io_lock:
+            with self._lock:
+                self._entries.pop(username, None)
+                self._dirty.pop(username, None)
+                self._to_load.discard(username)
+            self._prepare_store()
+            delete_user_preferences(username)
+
+    def flush(self) -> None:
+        # Writes pending deltas and completes scheduled loads now
+        self._flush()
+        self._load_pending()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._flush()
+        with self._lock:
+            lost = sum(len(emojis) for emojis in self._dirty.values())
+            if lost:
+                logger.error(
+                    "preferences: %d rows for %d users were not written before shutdown", lost, len(self._dirty)
+                )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics.update(
+                users=len(self._entries),
+                max_users=self.max_users,
+                dirty_users=len(self._dirty),
+                pending_loads=len(self._to_load),
+            )
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        return metrics
+
+    def _rank(self, stats) -> dict:
+        scores = {}
+        for emoji, (usage, rating_sum, rating_count) in stats.items():
+            score = usage + RATING_WEIGHT * (rating_sum - NEUTRAL_RATING * rating_count)
+            if score > 0:
+                scores[emoji] = score
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.top_k]
+        return dict(top)
+
+    def _insert(self, username, now) -> _Entry:
+        # Caller holds self._lock
+        entry = self._entries[username] = _Entry(now)
+        self._schedule_load(username)
+        while len(self._entries) > self.max_users:
+            evicted, _ = self._entries.popitem(last=False)
+            self._to_load.discard(evicted)
+            self.metrics["evictions"] += 1
+        return entry
+
+    def _schedule_load(self, username) -> None:
+        if username not in self._to_load:
+            self._to_load.add(username)
+            self._wake.set()
+
+    def _add(self, username, deltas) -> None:
+        if not username or not deltas:
+            return
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                entry = self._insert(username, time.monotonic())
+            dirty = self._dirty.setdefault(username, {})
+            for emoji, delta in deltas.items():
+                for counters in (entry.stats.setdefault(emoji, [0, 0, 0]), dirty.setdefault(emoji, [0, 0, 0])):
+                    counters[0] += delta[0]
+                    counters[1] += delta[1]
+                    counters[2] += delta[2]
+            entry.ranking = None
+
+    def _prepare_store(self) -> None:
+        # Caller holds self._io_lock
+        if not self._store_ready:
+            init_db()
+            self._store_ready = True
+
+    def _load_pending(self) -> None:
+        # One batch under the I/O lock, so flush() returns only after loads
+        # already taken by the background thread have landed
+        with self._io_lock:
+            with self._lock:
+                usernames = list(self._to_load)
+            for username in usernames:
+                try:
+                    self._prepare_store()
+                    stored = load_user_preference_stats(username)
+                except Exception:
+                    self.metrics["load_errors"] += 1
+                    logger.exception("preferences: failed to load %s", username)
+                    with self._lock:
+                        self._to_load.discard(username)
+                    continue
+                with self._lock:
+                    self._to_load.discard(username)
+                    entry = self._entries.get(username)
+                    if entry is None:
+                        continue  # evicted while loading
+                    stats = {emoji: list(counters) for emoji, counters in stored.items()}
+                    for emoji, delta in self._dirty.get(username, {}).items():
+                        counters = stats.setdefault(emoji, [0, 0, 0])
+                        for i in range(3):
+                            counters[i] += delta[i]
+                    entry.stats = stats
+                    entry.ranking = None
+                    entry.loaded = True
+                    entry.loaded_at = time.monotonic()
+                    self.metrics["loads"] += 1
+
+    def _flush(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return
+            rows = [
+                (username, emoji, *counters)
+                for username, emojis in dirty.items()
+                for emoji, counters in emojis.items()
+            ]
+            started = time.perf_counter()
+            try:
+                self._prepare_store()
+                add_user_preference_stats(rows)
+            except Exception:
+                # Put the deltas back for the next attempt
+                with self._lock:
+                    for username, emojis in dirty.items():
+                        pending = self._dirty.setdefault(username, {})
+                        for emoji, delta in emojis.items():
+                            counters = pending.setdefault(emoji, [0, 0, 0])
+                            for i in range(3):
+                                counters[i] += delta[i]
+                self.metrics["flush_errors"] += 1
+                logger.exception("preferences: failed to flush %d rows; keeping them for the next flush", len(rows))
+                return
+            self.metrics["flushes"] += 1
+            self.metrics["flushed_rows"] += len(rows)
+            self.metrics["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            idle = [username for username, entry in self._entries.items() if entry.accessed < cutoff]
+            for username in idle:
+                del self._entries[username]
+                self._to_load.discard(username)
+            self.metrics["evictions"] += len(idle)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_flush - time.monotonic()))
+            self._wake.clear()
+            self._load_pending()
+            if time.monotonic() >= next_flush:
+                self._flush()
+                self._expire()
+                next_flush = time.monotonic() + self.flush_interval
@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Wall-clock sampling profiler for a running server: a background thread
+# snapshots every other thread's Python stack at a fixed interval, so the
+# profiled code pays nothing beyond the GIL hand-offs. Off until started
+# through /admin/profiler.
+
+MAX_DEPTH = 64
+MAX_STACKS = 20000
+
+# Leaf functions of threads that are parked rather than working (the
+# server's accept loop, idle pools, background writers between batches)
+IDLE_FUNCTIONS = frozenset({"wait", "select", "poll", "accept", "_wait_for_tstate_lock"})
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stacks = Counter()
+        self.interval = 0.005
+        self.include_idle = False
+        self.samples = 0
+        self.dropped = 0
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = 0.005, include_idle: bool = False) -> bool:
+        # Clears the previous profile; False if one is already running
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.stacks = Counter()
+            self.interval = interval
+            self.include_idle = include_idle
+            self.samples = self.dropped = 0
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="emotai-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> bool:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return False
+        self._stop.set()
+        thread.join()
+        self.stopped_at = time.time()
+        return True
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                        continue
+                    names = []
+                    while frame is not None and len(names) < MAX_DEPTH:
+                        names.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    key = ";".join(reversed(names))
+                    if key in self.stacks or len(self.stacks) < MAX_STACKS:
+                        self.stacks[key] += 1
+                    else:
+                        self.dropped += 1
+                self.samples += 1
+            del frames
+
+    def folded(self) -> str:
+        # One "outer;...;inner count" line per stack, as flamegraph.pl and
+        # speedscope read it
+        with self._lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def snapshot(self, top: int = 20) -> dict:
+        with self._lock:
+            stacks = list(self.stacks.items())
+            samples, dropped = self.samples, self.dropped
+        own, total = Counter(), Counter()
+        for stack, count in stacks:
+            names = stack.split(";")
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        seen = sum(own.values())
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "include_idle": self.include_idle,
+            "samples": samples,
+            "stack_samples": seen,
+            "dropped": dropped,
+            "duration_s": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "top_self": [
+                {"function": name, "samples": n, "percent": round(100 * n / seen, 1)}
+                for name, n in own.most_common(top)
+            ],
+            "top_total": [
+                {"function": name, "samples": n, "percent": round(100 * n / seen, 1)}
+                for name, n in total.most_common(top)
+            ],
+        }
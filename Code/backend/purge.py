@@ -0,0 +1,222 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from sqlalchemy.exc import OperationalError
+
+import db as store
+import metrics
+import rollups
+from models import db, Feedback, Message, MessageSentence, User
+
+# Deletes everything stored about a user, from both the app database
+# (models.py) and the legacy store (db.py), in bounded batches. Each batch
+# is its own short transaction, with a pause after it, so the write lock is
+# never held for long and /suggest commits interleave with a large purge.
+# A batch takes its rows off the analytics rollups in the same transaction,
+# so the rollups stay exact at every point of the purge.
+
+BATCH_SIZE = int(os.getenv("EMOTAI_PURGE_BATCH_SIZE", "500"))
+PAUSE = float(os.getenv("EMOTAI_PURGE_PAUSE", "0.02"))
+RETRIES = int(os.getenv("EMOTAI_PURGE_RETRIES", "5"))
+# /delete_user_data answers 202 with a status URL and purges in the
+# background by default, instead of only when asked with {"background": true}
+BACKGROUND = os.getenv("EMOTAI_PURGE_BACKGROUND", "0") == "1"
+MAX_JOBS = 1000
+
+
+def purge_batch(user_id: str, batch_size: int = BATCH_SIZE, session=None) -> Counter:
+    # One bounded step in the caller's transaction: up to batch_size
+    # messages with their sentences and feedback, else up to batch_size of
+    # the user's remaining feedback, else the user row. Returns the rows
+    # deleted per table; empty once nothing is left.
+    session = session or db.session
+    messages = session.execute(
+        db.select(Message.id, Message.suggestion, Message.primary_sentiment, Message.created_at)
+        .where(Message.user_id == user_id)
+        .limit(batch_size)
+    ).all()
+    if messages:
+        ids = [row.id for row in messages]
+        feedback = session.execute(
+            db.select(Feedback.id, Feedback.rating, Feedback.created_at).where(Feedback.message_id.in_(ids))
+        ).all()
+        deleted = Counter({
+            "message_sentence": session.execute(
+                db.delete(MessageSentence).where(MessageSentence.message_id.in_(ids))
+            ).rowcount,
+            "feedback": _delete_feedback(feedback, session),
+            "message": session.execute(db.delete(Message).where(Message.id.in_(ids))).rowcount,
+        })
+        rollups.subtract(*rollups.tally(
+            [(row.suggestion, row.primary_sentiment, row.created_at) for row in messages],
+            [(row.rating, row.created_at) for row in feedback],
+        ), session)
+        return +deleted
+    feedback = session.execute(
+        db.select(Feedback.id, Feedback.rating, Feedback.created_at)
+        .where(Feedback.user_id == user_id)
+        .limit(batch_size)
+    ).all()
+    if feedback:
+        rollups.subtract(*rollups.tally(feedback=[(row.rating, row.created_at) for row in feedback]), session)
+        return Counter({"feedback": _delete_feedback(feedback, session)})
+    return +Counter({"user": session.execute(db.delete(User).where(User.id == user_id)).rowcount})
+
+
+def _delete_feedback(rows, session) -> int:
+    if not rows:
+        return 0
+    return session.execute(db.delete(Feedback).where(Feedback.id.in_([row.id for row in rows]))).rowcount
+
+
+def purge_store_batch(username: str, batch_size: int = BATCH_SIZE) -> Counter:
+    # The same for db.py's tables, each batch in a transaction of its own;
+    # counted as "store.<table>" apart from the app database's tables
+    for table in store.PURGE_TABLES:
+        n = store.delete_user_batch(table, username, batch_size)
+        if n:
+            return Counter({f"store.{table}": n})
+    return Counter()
+
+
+class PurgeJob:
+    def __init__(self, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.state = "queued"
+        self.deleted = Counter()
+        self.batches = 0
+        self.retries = 0
+        self.error = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def info(self) -> dict:
+        # What the status endpoint shows; the user id is left out
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "deleted": dict(self.deleted),
+            "batches": self.batches,
+            "retries": self.retries,
+            "error": self.error,
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+
+class Purger:
+    # Runs purges in the request (run) or one at a time on a background
+    # thread (submit), and remembers the last MAX_JOBS jobs for their status.
+    # The thread needs the Flask app for its application context; the ASGI
+    # app only uses the job registry and drives the batches itself.
+
+    def __init__(self, app=None, preferences=None, batch_size=BATCH_SIZE, pause=PAUSE, max_jobs=MAX_JOBS):
+        self.app = app
+        self.preferences = preferences
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._store_ready = False
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def create(self, user_id: str) -> PurgeJob:
+        job = PurgeJob(user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def prepare(self, user_id: str) -> None:
+        # Drops the user's cached and pending preference updates first, so
+        # a later flush cannot write rows back after the purge
+        if self.preferences is not None:
+            self.preferences.forget(user_id)
+        if not self._store_ready:
+            store.init_db()
+            self._store_ready = True
+
+    def run(self, job: PurgeJob) -> PurgeJob:
+        # Synchronous; needs an application context
+        job.state, job.started_at = "running", time.time()
+        try:
+            self.prepare(job.user_id)
+            self._drain(job, lambda: self._app_batch(job.user_id))
+            self._drain(job, lambda: purge_store_batch(job.user_id, self.batch_size))
+        except Exception as exc:
+            db.session.rollback()
+            job.state, job.error, job.finished_at = "failed", str(exc), time.time()
+            raise
+        job.state, job.finished_at = "done", time.time()
+        return job
+
+    def _app_batch(self, user_id: str) -> Counter:
+        deleted = purge_batch(user_id, self.batch_size)
+        db.session.commit()
+        return deleted
+
+    def _drain(self, job, step) -> None:
+        while True:
+            deleted = self._retry(job, step)
+            if not deleted:
+                return
+            job.deleted.update(deleted)
+            job.batches += 1
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _retry(self, job, step):
+        # SQLite reports a lock it cannot wait for (two deferred
+        # transactions upgrading to write) as "database is locked"
+        for attempt in range(RETRIES + 1):
+            try:
+                return step()
+            except OperationalError as exc:
+                db.session.rollback()
+                if attempt == RETRIES or "locked" not in str(exc.orig):
+                    raise
+            except sqlite3.OperationalError as exc:
+                if attempt == RETRIES or "locked" not in str(exc):
+                    raise
+            job.retries += 1
+            metrics.DB_RETRIES.inc()
+            time.sleep(max(self.pause, 0.01) * 2 ** attempt)
+
+    def submit(self, user_id: str) -> PurgeJob:
+        job = self.create(user_id)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="emotai-purge", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self.app.app_context():
+                try:
+                    self.run(job)
+                except Exception:
+                    self.app.logger.exception("purge: job %s failed", job.id)
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
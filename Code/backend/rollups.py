@@ -0,0 +1,199 @@
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Feedback, Message, RollupCount
+
+ALL_TIME = "all"
+SENTIMENT_BUCKETS = ("positive", "negative", "neutral", "other")
+SENTIMENT_GROUPS = {
+    "happy": "positive", "love": "positive", "excited": "positive",
+    "sad": "negative", "angry": "negative", "danger": "negative", "nervous": "negative",
+    "neutral": "neutral",
+}
+
+
+def hour_bucket(when: datetime) -> str:
+    return when.strftime("%Y-%m-%dT%H")
+
+
+def sentiment_bucket(suggestion: dict) -> str:
+    # Messages with a structured primary sentiment are grouped by it; rows
+    # stored before that fall back to matching their explanation text
+    if suggestion.get("sentiment"):
+        return SENTIMENT_GROUPS.get(suggestion["sentiment"], "other")
+    explanation = suggestion.get("explanation") or ""
+    if "positive" in explanation:
+        return "positive"
+    if "negative" in explanation:
+        return "negative"
+    if "neutral" in explanation:
+        return "neutral"
+    return "other"
+
+
+def message_counts(suggestion: dict) -> Counter:
+    counts = Counter(("emoji", emoji) for emoji in suggestion.get("emojis", []))
+    counts[("sentiment", sentiment_bucket(suggestion))] += 1
+    counts[("messages", "total")] += 1
+    return counts
+
+
+def rating_counts(new_rating, old_rating=None) -> Counter:
+    counts = Counter()
+    if old_rating is not None:
+        counts[("rating", str(old_rating))] -= 1
+    if new_rating is not None:
+        counts[("rating", str(new_rating))] += 1
+    return counts
+
+
+def _upsert(rows, session=None):
+    session = session or db.session
+    dialect = session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(RollupCount.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["kind", "key", "bucket"],
+        set_={"count": RollupCount.__table__.c.count + stmt.excluded.count},
+    )
+    session.execute(stmt, rows)
+
+
+def apply_counts(counts: Counter, when: datetime = None, hourly: bool = True, session=None) -> None:
+    # Adds the deltas to the all-time rows (and the hour of `when`) inside
+    # the caller's transaction, so rollups commit together with the rows
+    # they describe. `session` defaults to Flask-SQLAlchemy's; the ASGI app
+    # passes the sync side of its AsyncSession (AsyncSession.run_sync).
+    counts = {k: v for k, v in counts.items() if v}
+    if not counts:
+        return
+    buckets = [ALL_TIME]
+    if hourly:
+        buckets.append(hour_bucket(when or datetime.now(timezone.utc)))
+    _upsert([
+        {"kind": kind, "key": key, "bucket": bucket, "count": n}
+        for (kind, key), n in counts.items()
+        for bucket in buckets
+    ], session)
+
+
+def read_analytics(hours: int = None, session=None) -> dict:
+    session = session or db.session
+    query = session.query(RollupCount.kind, RollupCount.key, db.func.sum(RollupCount.count))
+    if hours:
+        since = hour_bucket(datetime.now(timezone.utc) - timedelta(hours=hours - 1))
+        query = query.filter(RollupCount.bucket != ALL_TIME, RollupCount.bucket >= since)
+    else:
+        query = query.filter(RollupCount.bucket == ALL_TIME)
+    rows = query.group_by(RollupCount.kind, RollupCount.key).all()
+
+    emoji_counter = {}
+    sentiment_counter = dict.fromkeys(SENTIMENT_BUCKETS, 0)
+    feedback_counter = {1: 0, 2: 0, 3: 0}
+    message_count = 0
+    for kind, key, count in rows:
+        if kind == "emoji" and count:
+            emoji_counter[key] = count
+        elif kind == "sentiment":
+            sentiment_counter[key] = count
+        elif kind == "rating":
+            feedback_counter[int(key) if key.lstrip("-").isdigit() else key] = count
+        elif kind == "messages":
+            message_count = count
+    return {
+        "emoji_usage": [
+            {"emoji": k, "count": v}
+            for k, v in sorted(emoji_counter.items(), key=lambda kv: -kv[1])
+        ],
+        "sentiment_stats": sentiment_counter,
+        "feedback_stats": feedback_counter,
+        "message_count": message_count,
+    }
+
+
+def tally(messages=(), feedback=()):
+    # (all-time counts, per-hour counts) of stored rows: messages as
+    # (suggestion, primary_sentiment, created_at), feedback as (rating,
+    # created_at)
+    totals, hourly = Counter(), {}
+    for suggestion, primary_sentiment, created_at in messages:
+        suggestion = json.loads(suggestion)
+        suggestion["sentiment"] = primary_sentiment
+        counts = message_counts(suggestion)
+        totals.update(counts)
+        hourly.setdefault(hour_bucket(created_at), Counter()).update(counts)
+    for rating, created_at in feedback:
+        counts = rating_counts(rating)
+        totals.update(counts)
+        hourly.setdefault(hour_bucket(created_at), Counter()).update(counts)
+    return totals, hourly
+
+
+def recount(user_id: str = None, batch_size: int = 1000, session=None):
+    # Full recount from the source tables, streamed in batches; returns
+    # (all-time counts, per-hour counts)
+    session = session or db.session
+    messages = session.query(Message.suggestion, Message.primary_sentiment, Message.created_at)
+    feedback = session.query(Feedback.rating, Feedback.created_at)
+    if user_id is not None:
+        messages = messages.filter(Message.user_id == user_id)
+        feedback = feedback.filter(Feedback.user_id == user_id)
+    return tally(messages.yield_per(batch_size), feedback.yield_per(batch_size))
+
+
+def backfill() -> int:
+    # Rebuilds every rollup row from the source tables
+    totals, hourly = recount()
+    RollupCount.query.delete()
+    rows = [
+        {"kind": kind, "key": key, "bucket": ALL_TIME, "count": n}
+        for (kind, key), n in totals.items()
+    ]
+    rows += [
+        {"kind": kind, "key": key, "bucket": bucket, "count": n}
+        for bucket, counts in hourly.items()
+        for (kind, key), n in counts.items()
+    ]
+    if rows:
+        db.session.execute(db.insert(RollupCount), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def check() -> list:
+    # Compares the all-time rollups against a full recount; returns
+    # (kind, key, rollup, recount) for every mismatch
+    expected, _ = recount()
+    stored = {
+        (r.kind, r.key): r.count
+        for r in RollupCount.query.filter_by(bucket=ALL_TIME)
+    }
+    mismatches = []
+    for kind_key in sorted(set(expected) | set(stored)):
+        if stored.get(kind_key, 0) != expected.get(kind_key, 0):
+            mismatches.append((*kind_key, stored.get(kind_key, 0), expected.get(kind_key, 0)))
+    return mismatches
+
+
+def remove_user(user_id: str, session=None) -> None:
+    # Subtracts a user's messages and feedback before they are deleted
+    totals, hourly = recount(user_id, session=session)
+    subtract(totals, hourly, session)
+
+
+def subtract(totals: Counter, hourly: dict, session=None) -> None:
+    # Takes a tally() of rows about to be deleted off the rollups
+    rows = [
+        {"kind": kind, "key": key, "bucket": ALL_TIME, "count": -n}
+        for (kind, key), n in totals.items() if n
+    ]
+    rows += [
+        {"kind": kind, "key": key, "bucket": bucket, "count": -n}
+        for bucket, counts in hourly.items()
+        for (kind, key), n in counts.items() if n
+    ]
+    if rows:
+        _upsert(rows, session)
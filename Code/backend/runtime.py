@@ -0,0 +1,148 @@
+import atexit
+import hmac
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+
+import classifier
+import metrics
+from cache import LRUCache
+from emotai import AIAgent
+from lexicon_config import LexiconWatcher
+from pool import AnalysisPool
+from preferences import PreferenceCache
+
+load_dotenv()
+
+INSTANCE_DIR = Path(__file__).parent / "instance"
+DATABASE_URI = os.getenv("EMOTAI_DATABASE_URI", "sqlite:///emotiai.db")
+
+# Sentence-level sentiment cache; disabled unless a size is configured
+SENTENCE_CACHE_SIZE = int(os.getenv("EMOTAI_SENTENCE_CACHE_SIZE", "0"))
+SENTENCE_CACHE_BYTES = int(os.getenv("EMOTAI_SENTENCE_CACHE_BYTES", "0"))
+
+# Optional process pool for sentence analysis; 0 keeps analysis inline
+WORKER_POOL_SIZE = int(os.getenv("EMOTAI_WORKER_POOL_SIZE", "0"))
+
+# Seconds between checks of the lexicon file for changes; 0 disables
+LEXICON_WATCH_INTERVAL = float(os.getenv("EMOTAI_LEXICON_WATCH_INTERVAL", "0"))
+
+# Opt-in per-user emoji ranking from usage and feedback
+# (EMOTAI_PREFERENCES=1): the random choice among a sentiment's emojis is
+# weighted towards the user's favourites. Off, everyone gets the same odds.
+PREFERENCES_ENABLED = os.getenv("EMOTAI_PREFERENCES", "0") == "1"
+
+# /admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("EMOTAI_ADMIN_TOKEN", "")
+
+
+def is_admin(token) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def build_agent() -> AIAgent:
+    # The analysis setup shared by the Flask (app.py) and ASGI (asgi.py)
+    # entry points. Nothing heavy is loaded here; see AIAgent.warm_up.
+    sentence_cache = (
+        LRUCache(max_entries=SENTENCE_CACHE_SIZE, max_bytes=SENTENCE_CACHE_BYTES)
+        if SENTENCE_CACHE_SIZE or SENTENCE_CACHE_BYTES
+        else None
+    )
+    analysis_pool = None
+    if WORKER_POOL_SIZE:
+        analysis_pool = AnalysisPool(
+            WORKER_POOL_SIZE,
+            max_pending=int(os.getenv("EMOTAI_WORKER_MAX_PENDING", "0")) or None,
+            timeout=float(os.getenv("EMOTAI_WORKER_TIMEOUT", "2.0")),
+            cache_size=SENTENCE_CACHE_SIZE,
+        )
+        atexit.register(analysis_pool.shutdown)
+    preferences = None
+    if PREFERENCES_ENABLED:
+        preferences = PreferenceCache(
+            max_users=int(os.getenv("EMOTAI_PREFERENCE_USERS", "10000")),
+            ttl=float(os.getenv("EMOTAI_PREFERENCE_TTL", "900")),
+            top_k=int(os.getenv("EMOTAI_PREFERENCE_TOP_K", "8")),
+            flush_interval=float(os.getenv("EMOTAI_PREFERENCE_FLUSH_INTERVAL", "5")),
+        )
+        atexit.register(preferences.shutdown)
+    model = None
+    if classifier.MODEL:
+        # Loaded by warm_up; needs torch and transformers installed
+        model = classifier.MicroBatcher()
+        atexit.register(model.shutdown)
+    seed = os.getenv("EMOTAI_EMOJI_SEED")
+    agent = AIAgent(
+        cache=sentence_cache,
+        pool=analysis_pool,
+        seed=int(seed) if seed is not None else None,
+        preferences=preferences,
+        model=model,
+    )
+    if LEXICON_WATCH_INTERVAL:
+        atexit.register(LexiconWatcher(agent.sentiment, LEXICON_WATCH_INTERVAL).stop)
+    register_metrics(agent)
+    return agent
+
+
+def register_metrics(agent: AIAgent) -> None:
+    # Scrape-time views of the agent's own counters on /metrics
+    cache, pool, preferences = agent.sentiment.cache, agent.pool, agent.preferences
+    if cache is not None:
+        metrics.REGISTRY.register(metrics.Counter(
+            "emotai_sentence_cache_lookups_total", "Sentence cache lookups by result.", ("result",),
+        ).set_function(lambda: {("hit",): cache.hits, ("miss",): cache.misses}))
+        metrics.REGISTRY.register(metrics.Gauge(
+            "emotai_sentence_cache_entries", "Sentences in the cache.",
+        ).set_function(lambda: cache.stats()["entries"]))
+    if pool is not None:
+        metrics.REGISTRY.register(metrics.Counter(
+            "emotai_pool_chunks_total", "Worker pool chunks by outcome.", ("outcome",),
+        ).set_function(lambda: {(key,): value for key, value in pool.stats.items()}))
+        metrics.REGISTRY.register(metrics.Gauge(
+            "emotai_pool_chunks_in_flight", "Chunks queued or running in the worker pool.",
+        ).set_function(pool.in_flight))
+    if preferences is not None:
+        metrics.REGISTRY.register(metrics.Counter(
+            "emotai_preference_lookups_total", "Preference cache lookups by result.", ("result",),
+        ).set_function(lambda: {("hit",): preferences.metrics["hits"], ("miss",): preferences.metrics["misses"]}))
+        metrics.REGISTRY.register(metrics.Gauge(
+            "emotai_preference_users", "Users with cached emoji rankings.",
+        ).set_function(lambda: preferences.snapshot()["users"]))
+    if agent.model is not None:
+        metrics.REGISTRY.register(metrics.Gauge(
+            "emotai_model_queue_depth", "Sentences waiting for a model micro-batch.",
+        ).set_function(lambda: agent.model.snapshot()["queue_depth"]))
+    metrics.REGISTRY.register(metrics.Gauge(
+        "emotai_lexicon_info", "The lexicon being served.", ("version", "digest"),
+    ).set_function(lambda: {(agent.sentiment.config.version, agent.sentiment.config.digest): 1}))
+
+
+def register_user_metrics(users) -> None:
+    # users: the app's identity.KnownUsers
+    metrics.REGISTRY.register(metrics.Gauge(
+        "emotai_known_users", "User ids known to have a user row.",
+    ).set_function(lambda: users.snapshot()["entries"]))
+
+
+def register_webhook_metrics(pipeline) -> None:
+    # pipeline: the app's integrations.WebhookPipeline
+    metrics.REGISTRY.register(metrics.Gauge(
+        "emotai_webhook_queue_depth", "Webhook events waiting to be scored.",
+    ).set_function(pipeline.queue_depth))
+
+
+def async_database_uri(uri: str = DATABASE_URI) -> str:
+    # The same database through an asyncio driver. Relative SQLite paths
+    # resolve against the instance folder, as Flask-SQLAlchemy does.
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        database = url.database
+        if database and database != ":memory:" and not os.path.isabs(database):
+            database = str(INSTANCE_DIR / database)
+        url = url.set(drivername="sqlite+aiosqlite", database=database)
+    elif url.get_backend_name() == "postgresql" and url.get_driver_name() in ("", "psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
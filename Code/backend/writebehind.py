@@ -0,0 +1,263 @@
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db, IdBlock, Message
+import identity
+import rollups
+
+FULL_POLICIES = ("block", "drop", "sync")
+
+
+class IdAllocator:
+    # Reserves ids in blocks from the IdBlock table; each block is claimed
+    # in its own short transaction, so several processes can allocate
+    # without handing out the same id.
+
+    def __init__(self, app, name="message", block_size=1000):
+        self.app = app
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _reserve(self):
+        table = IdBlock.__table__
+        with self.app.app_context(), db.engine.begin() as conn:
+            # Never hand out ids below rows written without the allocator
+            floor = db.select(func.coalesce(func.max(Message.id), 0) + 1).scalar_subquery()
+            start = db.case((table.c.next_id > floor, table.c.next_id), else_=floor)
+            updated = conn.execute(
+                table.update()
+                .where(table.c.name == self.name)
+                .values(next_id=start + self.block_size)
+            ).rowcount
+            if not updated:
+                first = conn.execute(db.select(floor)).scalar()
+                conn.execute(
+                    table.insert().values(name=self.name, next_id=first + self.block_size)
+                )
+            end = conn.execute(
+                db.select(table.c.next_id).where(table.c.name == self.name)
+            ).scalar()
+        return end - self.block_size, end
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve()
+            allocated = self._next
+            self._next += 1
+            return allocated
+
+
+@dataclass
+class MessageRecord:
+    id: int
+    user_id: str
+    text: str
+    suggestion: dict
+    created_at: datetime
+
+
+class WriteBehindWriter:
+    # Bounded in-process queue of Message rows written by one background
+    # thread in batched transactions. A batch is flushed when it reaches
+    # batch_size or flush_interval seconds after its first record. When the
+    # queue is full, `policy` decides: "block" waits up to block_timeout and
+    # then writes synchronously, "drop" discards the record, "sync" writes it
+    # in the request thread straight away. New users' rows go into the batch
+    # too; `users` (identity.KnownUsers) skips the ones already written.
+    # A failed batch is retried `retries` times with backoff (e.g. SQLite
+    # busy), then written row by row so one bad record loses only itself.
+    # Every submitted record gets a sequence number; flush() waits until all
+    # records up to the one current when it was called are finished.
+
+    def __init__(self, app, max_size=10000, batch_size=500, flush_interval=0.05,
+                 policy="block", block_timeout=1.0, users=None, retries=3, retry_delay=0.05):
+        if policy not in FULL_POLICIES:
+            raise ValueError(f"policy must be one of {FULL_POLICIES}")
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.users = users if users is not None else identity.KnownUsers()
+        self.ids = IdAllocator(app)
+        self._queue = queue.Queue(maxsize=max_size)
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._unfinished = set()
+        self._finished_upto = 0
+        self._stop = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "enqueued": 0, "written": 0, "dropped": 0, "sync_writes": 0,
+            "batches": 0, "errors": 0, "retries": 0, "lost": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: MessageRecord) -> bool:
+        # Returns False only when the record was dropped
+        with self._cond:
+            self._seq += 1
+            entry = (self._seq, record)
+            self._unfinished.add(self._seq)
+            self._pending.add(record.id)
+        try:
+            if self.policy == "block":
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+            self._count("enqueued")
+            return True
+        except queue.Full:
+            pass
+        if self.policy == "drop":
+            self._done([entry])
+            self._count("dropped")
+            return False
+        try:
+            self._write([record])
+        finally:
+            self._done([entry])
+        self._count("sync_writes")
+        return True
+
+    def is_pending(self, message_id) -> bool:
+        # message_id as it came in the request, possibly a string
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            return False
+        with self._cond:
+            return message_id in self._pending
+
+    def flush(self) -> None:
+        # Blocks until everything submitted before the call has been written
+        # (or given up on); records submitted meanwhile are not waited for
+        with self._cond:
+            target = self._seq
+            self._cond.wait_for(lambda: self._finished_upto >= target)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def snapshot(self) -> dict:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics["avg_flush_ms"] = (
+            metrics.pop("total_flush_ms") / metrics["batches"] if metrics["batches"] else 0.0
+        )
+        metrics.update(
+            queue_depth=self._queue.qsize(),
+            max_size=self._queue.maxsize,
+            policy=self.policy,
+        )
+        return metrics
+
+    def _count(self, name, n=1) -> None:
+        # Request threads and the writer thread both update the metrics
+        with self._metrics_lock:
+            self.metrics[name] += n
+
+    def _done(self, entries):
+        with self._cond:
+            for seq, record in entries:
+                self._unfinished.discard(seq)
+                self._pending.discard(record.id)
+            while self._finished_upto < self._seq and self._finished_upto + 1 not in self._unfinished:
+                self._finished_upto += 1
+            self._cond.notify_all()
+
+    def _write(self, records) -> None:
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                user_ids = [record.user_id for record in records]
+                identity.insert_users(db.session, self.users.missing(user_ids))
+                # Rollups go to the hour each message was received in, as
+                # purges and rating changes subtract from that hour
+                hours = {}
+                for record in records:
+                    msg = Message.from_suggestion(record.user_id, record.text, record.suggestion)
+                    msg.id = record.id
+                    msg.created_at = record.created_at
+                    db.session.add(msg)
+                    when, counts = hours.setdefault(
+                        rollups.hour_bucket(record.created_at), (record.created_at, Counter())
+                    )
+                    counts.update(rollups.message_counts(record.suggestion))
+                for when, counts in hours.values():
+                    rollups.apply_counts(counts, when=when)
+                db.session.commit()
+                self.users.add(user_ids)
+            except Exception:
+                db.session.rollback()
+                self._count("errors")
+                raise
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self.metrics["written"] += len(records)
+            self.metrics["batches"] += 1
+            self.metrics["last_flush_ms"] = elapsed
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed)
+            self.metrics["total_flush_ms"] += elapsed
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._persist([record for _, record in batch])
+            finally:
+                self._done(batch)
+
+    def _persist(self, batch) -> None:
+        # The ids were already handed out, so a failed write is retried
+        # before anything is given up on
+        for attempt in range(self.retries + 1):
+            try:
+                self._write(batch)
+                return
+            except Exception as exc:
+                error = exc
+            if attempt < self.retries:
+                self._count("retries")
+                time.sleep(self.retry_delay * 2 ** attempt)
+        if len(batch) == 1:
+            self._count("lost")
+            self.app.logger.error("write-behind: could not write message %s: %s", batch[0].id, error)
+            return
+        self.app.logger.warning(
+            "write-behind: batch of %d messages failed (%s); writing them one by one", len(batch), error
+        )
+        for record in batch:
+            try:
+                self._write([record])
+            except Exception:
+                self._count("lost")
+                self.app.logger.exception("write-behind: could not write message %s", record.id)
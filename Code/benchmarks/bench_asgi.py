@@ -0,0 +1,123 @@
+"""Load test: Flask (app.run) vs ASGI (uvicorn asgi:app) at N concurrent connections.
+
+    python Code/benchmarks/bench_asgi.py --concurrency 1000 --requests 20000
+
+Each mode gets a fresh database and its own server process; the client sends
+a mix of /suggest, /history and /analytics requests and reports requests/sec
+and latency percentiles.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import BACKEND_DIR, synthetic_messages, temp_database_uri
+
+SERVERS = {
+    "flask": [sys.executable, "-c", "from app import app; app.run(port={port}, threaded=True)"],
+    "asgi": [
+        sys.executable, "-m", "uvicorn", "asgi:app", "--port", "{port}",
+        "--log-level", "warning", "--backlog", "4096",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode):
+    port = free_port()
+    uri = temp_database_uri()
+    path = uri[len("sqlite:///"):]
+    env = dict(
+        os.environ, EMOTAI_DATABASE_URI=uri, EMOTAI_DB_PATH=path + ".store", EMOTAI_WEBHOOK_SPOOL=path + ".webhooks",
+    )
+    cmd = [part.format(port=port) for part in SERVERS[mode]]
+    proc = subprocess.Popen(
+        cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/analytics", timeout=1.0)
+            return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def load(base_url, total, concurrency, seed=0):
+    messages = synthetic_messages(1000, seed=seed)
+    rng = random.Random(seed)
+    plan = [rng.random() for _ in range(total)]
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        # One session for every connection, created before the load starts
+        await client.post("/suggest", json={"message": "hello"})
+        next_index = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for i in next_index:
+                start = time.perf_counter()
+                try:
+                    if plan[i] < 0.7:
+                        res = await client.post("/suggest", json={"message": messages[i % len(messages)]})
+                    elif plan[i] < 0.9:
+                        res = await client.get("/history?limit=20")
+                    else:
+                        res = await client.get("/analytics")
+                    if res.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="flask,asgi")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent connections")
+    for mode in args.modes.split(","):
+        proc, base_url = start_server(mode)
+        try:
+            elapsed, latencies, errors = asyncio.run(load(base_url, args.requests, args.concurrency))
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(
+            f"{mode:>6}: {len(latencies) / elapsed:8.0f} req/s  "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+            f"errors {errors}"
+        )
+
+
+if __name__ == "__main__":
+    main()
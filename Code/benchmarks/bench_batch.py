@@ -0,0 +1,41 @@
+"""Messages/sec for /suggest vs /suggest/batch at increasing batch sizes.
+
+Run with ``python Code/benchmarks/bench_batch.py``.
+"""
+import os
+import time
+
+from common import synthetic_messages, temp_database_uri
+
+os.environ.setdefault("EMOTAI_DATABASE_URI", temp_database_uri())
+
+from app import app, agent  # noqa: E402
+
+BATCH_SIZES = [1, 10, 100, 1000]
+
+
+def rate(n, fn):
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    client = app.test_client()
+    agent.suggest_emojis_batch(synthetic_messages(10))  # warm up TextBlob
+    print(f"{'batch':>6} {'agent loop':>12} {'agent batch':>12} {'/suggest':>10} {'/suggest/batch':>15}  (messages/sec)")
+    for size in BATCH_SIZES:
+        messages = synthetic_messages(size, seed=size)
+        loop = rate(size, lambda: [agent.suggest_emojis(m) for m in messages])
+        batch = rate(size, lambda: agent.suggest_emojis_batch(messages))
+        single_http = rate(
+            size, lambda: [client.post("/suggest", json={"message": m}) for m in messages]
+        )
+        batch_http = rate(
+            size, lambda: client.post("/suggest/batch", json={"messages": messages})
+        )
+        print(f"{size:>6} {loop:>12.0f} {batch:>12.0f} {single_http:>10.0f} {batch_http:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Throughput and peak RSS of the bulk scoring CLI (Code/backend/bulk.py).
+
+Run with ``python Code/benchmarks/bench_bulk.py [records] [--workers 0 1 4]``.
+
+Scores a generated JSONL corpus with each worker count and compares it
+with suggesting one message at a time, as the HTTP API does. Every sentence
+gets a unique suffix, so batch de-duplication does not flatter the numbers.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from common import SAMPLE_SENTENCES
+
+import bulk
+from emotai import AIAgent
+
+
+def write_corpus(path, n, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            sentences = [
+                f"{rng.choice(SAMPLE_SENTENCES)} ref {i}-{j}" for j in range(rng.randint(1, 3))
+            ]
+            f.write(json.dumps({"id": i, "message": " ".join(sentences)}) + "\n")
+
+
+def one_at_a_time(path, limit):
+    agent = AIAgent(seed=0)
+    agent.warm_up()
+    with open(path, encoding="utf-8") as f:
+        messages = [json.loads(line)["message"] for _, line in zip(range(limit), f)]
+    start = time.perf_counter()
+    sentences = sum(len(agent.suggest_emojis(message).sentences) for message in messages)
+    return sentences / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("records", type=int, nargs="?", default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, os.cpu_count()])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="emotai-bulk-")
+    corpus = os.path.join(tmp, "corpus.jsonl")
+    write_corpus(corpus, args.records)
+    print(f"{args.records} records, {os.path.getsize(corpus) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+    print(f"one message at a time:  {one_at_a_time(corpus, 2000):8.0f} sentences/s")
+
+    for workers in args.workers:
+        for output in ("out.jsonl", "out.db"):
+            totals = bulk.run(bulk.parse_args([
+                corpus, "-o", os.path.join(tmp, f"{workers}-{output}"),
+                "--workers", str(workers), "--chunk-size", str(args.chunk_size), "--quiet",
+            ]))
+            worker_rss = (
+                f", worker {totals['peak_worker_rss_mb']:.0f} MB"
+                if totals["peak_worker_rss_mb"] is not None else ""
+            )
+            print(
+                f"bulk, {workers} workers -> {output[4:]:<6} {totals['sentences_per_s']:8.0f} sentences/s  "
+                f"{totals['records_per_s']:7.0f} records/s  peak RSS {totals['peak_rss_mb']:.0f} MB{worker_rss}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Concurrent store_suggestion throughput: old per-call connections vs the pool.
+
+Each writer thread stores suggestions as fast as it can. "before" reproduces
+the previous access pattern (a new rollback-journal connection per call and
+one commit for the suggestion plus one for the preferences); "after" uses
+db.py's pooled WAL connections. Both runs use the same schema, including the
+unique (username, emoji) index the upsert needs.
+
+Run with ``python Code/benchmarks/bench_db.py [threads] [seconds]``.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import common  # noqa: F401  (puts backend on sys.path)
+
+import db
+from emotai import EmojiSuggestion
+
+SUGGESTION = EmojiSuggestion(
+    emojis=["😊", "🎉", "😊"], message="bench", explanation="Primary sentiment: happy (mild)."
+)
+
+
+def legacy_store_suggestion(path, username, message, suggestion):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        conn.execute(
+            "INSERT INTO suggestions (username, message, emojis, explanation) VALUES (?, ?, ?, ?)",
+            (username, message, ",".join(suggestion.emojis), suggestion.explanation or ""),
+        )
+        conn.commit()
+        for emoji in suggestion.emojis:
+            conn.execute("""
+                INSERT INTO user_preferences (username, emoji, usage_count, last_used)
+                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(username, emoji) DO UPDATE SET
+                  usage_count = usage_count + 1,
+                  last_used = CURRENT_TIMESTAMP
+            """, (username, emoji))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def hammer(store, threads, seconds):
+    inserted = [0] * threads
+    errors = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def writer(slot):
+        username = f"user-{slot % 4}"
+        while time.perf_counter() < stop:
+            try:
+                store(username, "bench message", SUGGESTION)
+                inserted[slot] += 1
+            except sqlite3.OperationalError:
+                errors[slot] += 1
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(inserted) / seconds, sum(errors)
+
+
+def fresh_database():
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="emotai-store-")
+    os.close(fd)
+    db.configure(path)
+    db.init_db()
+    return path
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    before_path = fresh_database()
+    with db.get_db() as conn:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    db.configure(before_path)
+    before = hammer(
+        lambda *args: legacy_store_suggestion(before_path, *args), threads, seconds
+    )
+
+    fresh_database()
+    after = hammer(db.store_suggestion, threads, seconds)
+
+    print(f"{threads} writer threads, {seconds:.0f}s each")
+    print(f"{'':>7} {'inserts/sec':>12} {'lock errors':>12}")
+    for name, (rate, errors) in (("before", before), ("after", after)):
+        print(f"{name:>7} {rate:>12.0f} {errors:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Per-sentence string scans vs one Document per message (document.py).
+
+Run with ``python Code/benchmarks/bench_document.py [--sentences 1 10 100 1000 10000]
+[--polarity lexicon]``.
+
+For messages of each size, built by common.synthetic_messages, times two
+pipelines without the sentence cache:
+
+- strings: what AIAgent did before document.py. SENTENCE_SPLIT over the
+  stripped message, each piece stripped, then per sentence .lower(), a
+  TOKEN_PATTERN.findall, the sarcasm search and "?" in sentence
+- document: one Document(message); the same stages read each sentence out
+  of its lowered text with pos/endpos
+
+"front" is only those scans, "full" adds the keyword and polarity stages
+(SentimentAnalyzer._classify). Reports us/message and the tracemalloc
+peak per message (bytes allocated on top of the message and the result).
+"""
+import argparse
+import time
+import tracemalloc
+
+from common import synthetic_messages
+
+from document import Document
+from emotai import SENTENCE_SPLIT, SentimentAnalyzer
+
+
+def split(message):
+    text = message.strip()
+    start = 0
+    for match in SENTENCE_SPLIT.finditer(text):
+        piece = text[start:match.start()].strip()
+        if piece:
+            yield piece
+        start = match.end()
+    piece = text[start:].strip()
+    if piece:
+        yield piece
+
+
+def strings_front(analyzer, message):
+    lexicon = analyzer.lexicon
+    out = []
+    for sent in split(message):
+        lower = sent.lower()
+        out.append((sent, lexicon.tokenize(lower), lexicon.is_sarcastic(lower), "?" in sent))
+    return out
+
+
+def document_front(analyzer, message):
+    lexicon = analyzer.lexicon
+    doc = Document(message)
+    out = []
+    for i, sent in enumerate(doc.texts()):
+        lower, start, end = doc.lowered(i)
+        out.append((
+            sent, lexicon.tokenize(lower, start, end), lexicon.is_sarcastic(lower, start, end),
+            lower.find("?", start, end) != -1,
+        ))
+    return out
+
+
+def strings_full(analyzer, message):
+    return [(sent, analyzer._classify(sent)) for sent in split(message)]
+
+
+def document_full(analyzer, message):
+    doc = Document(message)
+    return [(sent, analyzer._classify(sent, doc=doc, index=i)) for i, sent in enumerate(doc.texts())]
+
+
+def per_message(fn, analyzer, messages, min_time=0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        for message in messages:
+            fn(analyzer, message)
+        runs += len(messages)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def peak(fn, analyzer, messages):
+    worst = 0
+    for message in messages:
+        tracemalloc.start()
+        fn(analyzer, message)
+        worst = max(worst, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--polarity", default=None, help="polarity backend (default: EMOTAI_POLARITY_BACKEND)")
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    analyzer = SentimentAnalyzer(polarity=args.polarity, seed=0)
+    analyzer.warm_up()
+    print(f"polarity backend {analyzer.scorer.name}")
+    for n in args.sentences:
+        messages = synthetic_messages(max(1, 200 // n), seed=22, sentences=(n, n))
+        if any(strings_full(analyzer, m) != document_full(analyzer, m) or strings_front(analyzer, m) != document_front(analyzer, m) for m in messages):
+            raise SystemExit(f"{n} sentences: results differ")
+        for stage, old, new in (("front", strings_front, document_front), ("full", strings_full, document_full)):
+            t_old = per_message(old, analyzer, messages, args.min_time)
+            t_new = per_message(new, analyzer, messages, args.min_time)
+            m_old = peak(old, analyzer, messages[:5])
+            m_new = peak(new, analyzer, messages[:5])
+            print(
+                f"{n:6d} sentences {stage:<5}  strings {t_old * 1e6:10.1f} us {m_old / 1024:9.1f} KiB  "
+                f"document {t_new * 1e6:10.1f} us {m_new / 1024:9.1f} KiB  "
+                f"(time {t_new / t_old - 1:+6.1%}, peak {m_new / m_old - 1:+6.1%})",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
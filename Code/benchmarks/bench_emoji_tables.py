@@ -0,0 +1,123 @@
+"""Per-call time and allocations of get_emojis: nested dict walk vs compiled tables.
+
+Run with ``python Code/benchmarks/bench_emoji_tables.py``.
+"""
+import itertools
+import random
+import tracemalloc
+
+from common import SAMPLE_SENTENCES, timed
+
+from emotai import SentimentAnalyzer
+
+
+def legacy_get_mixed_emotion(analyzer, sentiments):
+    # get_mixed_emotion before the bitmask table
+    sentiment_set = {s[0] for s in sentiments}
+    for pattern, mixed_type in analyzer.mixed_patterns:
+        if pattern.issubset(sentiment_set):
+            intensities = {s[0]: s[1] for s in sentiments}
+            if all(intensities.get(sent, 0) >= 1 for sent in pattern):
+                return mixed_type
+    return None
+
+
+def legacy_get_emojis(analyzer, sentiments, choice=random.choice):
+    # get_emojis before the compiled tables
+    library = analyzer.emoji_library
+    if not sentiments:
+        return [choice(library["neutral"]["mild"])], "No sentiment detected, defaulting to neutral."
+    mixed_type = legacy_get_mixed_emotion(analyzer, sentiments)
+    if mixed_type:
+        mixed_emojis = library["mixed"].get(mixed_type, [])
+        if mixed_emojis:
+            return [choice(mixed_emojis)], f"Mixed emotions detected: {mixed_type.replace('_', ' + ')}."
+    primary_sentiment, primary_intensity = sentiments[0]
+    intensity_level = analyzer.intensity_levels.get(primary_intensity, "mild")
+    emoji_options = library.get(primary_sentiment, {}).get(intensity_level, library["neutral"]["mild"])
+    emojis = [choice(emoji_options)]
+    explanation = f"Primary sentiment: {primary_sentiment} ({intensity_level})."
+    if len(sentiments) > 1 and sentiments[1][1] >= 2:
+        secondary_sentiment, secondary_intensity = sentiments[1]
+        sec_level = analyzer.intensity_levels.get(secondary_intensity, "mild")
+        secondary_options = library.get(secondary_sentiment, {}).get(sec_level, [])
+        if secondary_options:
+            emojis.append(choice(secondary_options))
+            explanation += f" Secondary sentiment: {secondary_sentiment} ({sec_level})."
+    elif len(sentiments) > 1:
+        explanation += f" Secondary sentiment ({sentiments[1][0]}) not strong enough for emoji."
+    return emojis, explanation
+
+
+class FirstChoice:
+    # Stands in for the RNG so both versions pick the first option
+    @staticmethod
+    def random():
+        return 0.0
+
+
+def make_corpus(analyzer):
+    corpus = [analyzer.detect_sentiment(s) for s in SAMPLE_SENTENCES]
+    names = list(analyzer.sentiment_priority)
+    for (a, b), (i, j) in itertools.product(
+        itertools.permutations(names, 2), itertools.product(range(1, 4), repeat=2)
+    ):
+        corpus.append([(a, i), (b, j)])
+    corpus += [[(name, i)] for name in names for i in range(1, 4)] + [[]]
+    return corpus
+
+
+def allocations(fn, corpus):
+    # (peak transient bytes of one pass, bytes kept alive by the results) per call
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for sentiments in corpus:
+        fn(sentiments)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    results = [fn(sentiments) for sentiments in corpus]
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del results
+    return peak, retained / len(corpus)
+
+
+def main():
+    analyzer = SentimentAnalyzer(seed=0)
+    corpus = make_corpus(analyzer)
+
+    first = lambda options: options[0]  # noqa: E731
+    analyzer.rng = FirstChoice()
+    mismatches = sum(
+        1 for sentiments in corpus
+        if legacy_get_emojis(analyzer, sentiments, first) != analyzer.get_emojis(sentiments)
+        or legacy_get_mixed_emotion(analyzer, sentiments) != analyzer.get_mixed_emotion(sentiments)
+    )
+    analyzer.rng = random.Random(0)
+
+    variants = [
+        ("legacy", lambda s: legacy_get_emojis(analyzer, s)),
+        ("compiled", analyzer.get_emojis),
+        ("compiled, explain=False", lambda s: analyzer.get_emojis(s, explain=False)),
+    ]
+    print(f"sentiment lists:  {len(corpus)}")
+    print(f"mismatches:       {mismatches}")
+    for name, fn in variants:
+        t = timed(lambda: [fn(s) for s in corpus], number=20)
+        peak, retained = allocations(fn, corpus)
+        print(
+            f"{name:<24} {t / len(corpus) * 1e6:6.2f} us/call  "
+            f"peak {peak:6d} B  retained {retained:6.1f} B/call"
+        )
+    for name, fn in [
+        ("legacy mixed", lambda s: legacy_get_mixed_emotion(analyzer, s)),
+        ("bitmask mixed", analyzer.get_mixed_emotion),
+    ]:
+        t = timed(lambda: [fn(s) for s in corpus], number=20)
+        print(f"{name:<24} {t / len(corpus) * 1e6:6.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""/history latency for a user with a large message history.
+
+Seeds N messages (default 100k) for one user, with feedback on every tenth,
+then reports p50/p99 latency for the first page and for walking deeper
+pages via the cursor. Run with ``python Code/benchmarks/bench_history.py [N]``.
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import synthetic_messages, temp_database_uri
+
+os.environ.setdefault("EMOTAI_DATABASE_URI", temp_database_uri())
+
+from app import app, agent  # noqa: E402
+from models import db, Feedback, Message, User  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def seed(n):
+    texts = synthetic_messages(200, seed=11)
+    suggestions = [json.dumps(agent.suggest_emojis(t).dict()) for t in texts]
+    start = datetime.now(timezone.utc) - timedelta(seconds=n)
+    with app.app_context():
+        db.session.add(User(id=USER_ID))
+        rows = [
+            {
+                "user_id": USER_ID,
+                "text": texts[i % len(texts)],
+                "suggestion": suggestions[i % len(suggestions)],
+                "created_at": start + timedelta(seconds=i),
+            }
+            for i in range(n)
+        ]
+        db.session.execute(db.insert(Message), rows)
+        db.session.execute(
+            db.insert(Feedback),
+            [{"message_id": i, "user_id": USER_ID, "rating": 1 + i % 3} for i in range(1, n + 1, 10)],
+        )
+        db.session.commit()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    t = time.perf_counter()
+    seed(n)
+    print(f"seeded {n} messages in {time.perf_counter() - t:.1f}s")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = USER_ID
+
+    first_page = []
+    for _ in range(200):
+        t = time.perf_counter()
+        client.get("/history")
+        first_page.append(time.perf_counter() - t)
+
+    deep_pages = []
+    cursor = None
+    for _ in range(200):
+        url = f"/history?limit=50&cursor={cursor}" if cursor else "/history?limit=50"
+        t = time.perf_counter()
+        cursor = client.get(url).get_json()["next_cursor"]
+        deep_pages.append(time.perf_counter() - t)
+
+    for name, samples in (("first page", first_page), ("cursor walk", deep_pages)):
+        p50, p99 = percentiles(samples)
+        print(f"{name:>12}: p50 {p50 * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
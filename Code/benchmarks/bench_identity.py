@@ -0,0 +1,96 @@
+"""First-request cost of new sessions: stateless ids vs a user row per session.
+
+Run with ``python Code/benchmarks/bench_identity.py [--sessions 1000]``.
+
+Each session is a fresh Flask test client (no cookie) making one request,
+like anonymous burst traffic. For GET /history (read-only) and POST
+/suggest it reports first-request p50/p99 and the database write
+transactions (engine commits) per 1k sessions, for:
+
+- row per session: the get_user_id before identity.py, i.e. a user lookup
+  and its own INSERT transaction the first time a session is seen
+- stateless: the current get_user_id; the user row goes into the first
+  message's transaction, and reads write nothing
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from common import synthetic_messages, temp_database_uri
+
+os.environ["EMOTAI_DATABASE_URI"] = temp_database_uri()
+_work_dir = tempfile.mkdtemp(prefix="emotai-identity-")
+os.environ.setdefault("EMOTAI_DB_PATH", os.path.join(_work_dir, "store.db"))
+os.environ.setdefault("EMOTAI_WEBHOOK_SPOOL", os.path.join(_work_dir, "webhooks.db"))
+
+from flask import session  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import app as app_module  # noqa: E402
+from app import app, warm_up  # noqa: E402
+from models import db, User  # noqa: E402
+
+
+def row_per_session_user_id():
+    # get_user_id as it was before identity.py
+    if "user_id" not in session:
+        user_id = str(uuid.uuid4())
+        session["user_id"] = user_id
+        if not db.session.get(User, user_id):
+            db.session.add(User(id=user_id))
+            db.session.commit()
+    return session["user_id"]
+
+
+def run(label, request, sessions, commits):
+    latencies = []
+    before = commits[0]
+    for i in range(sessions):
+        client = app.test_client()
+        start = time.perf_counter()
+        status = request(client, i).status_code
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError(f"{label}: HTTP {status}")
+    latencies.sort()
+    print(
+        f"{label:<30} p50 {latencies[len(latencies) // 2] * 1e3:6.2f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:6.2f} ms  "
+        f"{(commits[0] - before) * 1000 / sessions:6.0f} write transactions / 1k sessions",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    warm_up()
+    messages = synthetic_messages(args.sessions, seed=23)
+    commits = [0]
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "commit")
+    def count_commit(conn):
+        commits[0] += 1
+
+    requests = {
+        "GET /history": lambda client, i: client.get("/history"),
+        "POST /suggest": lambda client, i: client.post("/suggest", json={"message": messages[i]}),
+    }
+    current = app_module.get_user_id
+    print(f"{args.sessions} new sessions per case", file=sys.stderr)
+    for name, request in requests.items():
+        app_module.get_user_id = row_per_session_user_id
+        run(f"{name} row per session", request, args.sessions, commits)
+        app_module.get_user_id = current
+        run(f"{name} stateless", request, args.sessions, commits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare the compiled LexiconMatcher with the original per-keyword loops.
+
+Run with ``python Code/benchmarks/bench_lexicon.py``.
+"""
+import re
+
+from common import SAMPLE_SENTENCES, timed
+
+from emotai import SentimentAnalyzer
+
+
+def legacy_keyword_stage(analyzer, lower_msg, sentiment_intensities):
+    # The matching loops detect_sentiment used before LexiconMatcher.
+    words = re.findall(r"\b\w+\b|[^\w\s]", lower_msg)
+    for sent, keywords in analyzer.sentiment_map.items():
+        for keyword in keywords:
+            if re.search(r"\b" + re.escape(keyword) + r"\b", lower_msg):
+                base_intensity = 3 if keyword in analyzer.strong_keywords else 1
+                if sent not in sentiment_intensities or base_intensity > sentiment_intensities[sent]:
+                    sentiment_intensities[sent] = base_intensity
+    for sent, current_intensity in list(sentiment_intensities.items()):
+        for keyword in analyzer.sentiment_map.get(sent, []):
+            keyword_indices = [i for i, word in enumerate(words) if word == keyword]
+            for idx in keyword_indices:
+                for i in range(max(0, idx - 3), idx):
+                    if words[i] in analyzer.intensity_words:
+                        sentiment_intensities[sent] = max(
+                            current_intensity, analyzer.intensity_words[words[i]]
+                        )
+    return sentiment_intensities
+
+
+def compiled_keyword_stage(analyzer, lower_msg, sentiment_intensities):
+    words = analyzer.lexicon.tokenize(lower_msg)
+    return analyzer.lexicon.apply(words, sentiment_intensities)
+
+
+def run_stage(stage, analyzer, corpus):
+    return [stage(analyzer, s, {}) for s in corpus]
+
+
+def main():
+    analyzer = SentimentAnalyzer()
+    corpus = [s.lower() for s in SAMPLE_SENTENCES]
+
+    legacy = run_stage(legacy_keyword_stage, analyzer, corpus)
+    compiled = run_stage(compiled_keyword_stage, analyzer, corpus)
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+
+    t_legacy = timed(run_stage, legacy_keyword_stage, analyzer, corpus)
+    t_compiled = timed(run_stage, compiled_keyword_stage, analyzer, corpus)
+    per = 1e6 / len(corpus)
+    print(f"sentences:          {len(corpus)}")
+    print(f"mismatches:         {mismatches}")
+    print(f"legacy keywords:    {t_legacy * per:8.2f} us/sentence")
+    print(f"compiled keywords:  {t_compiled * per:8.2f} us/sentence")
+    print(f"speedup:            {t_legacy / t_compiled:8.2f}x")
+
+    t_detect = timed(lambda: [analyzer.detect_sentiment(s) for s in SAMPLE_SENTENCES], number=20)
+    print(f"detect_sentiment:   {t_detect * per:8.2f} us/sentence (incl. polarity)")
+
+
+if __name__ == "__main__":
+    main()
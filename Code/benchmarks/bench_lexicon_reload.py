@@ -0,0 +1,96 @@
+"""Cost of compiling the lexicon config and of hot-swapping it under load.
+
+Run with ``python Code/benchmarks/bench_lexicon_reload.py``.
+"""
+import json
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from common import synthetic_messages
+
+from emotai import AIAgent
+from lexicon_config import DEFAULT_LEXICON_PATH, LexiconConfig, load_lexicon
+
+
+def best_of(fn, runs=50):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def suggest_latencies(agent, messages, seconds, reloader=None):
+    # Four request threads for `seconds`; returns per-call latencies, the
+    # lexicon versions seen and the number of failed calls
+    latencies, versions, errors = [], set(), [0]
+    stop = threading.Event()
+
+    def worker():
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                versions.add(agent.suggest_emojis(messages[i % len(messages)]).lexicon_version)
+            except Exception:
+                errors[0] += 1
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    reloads = reloader(stop) if reloader else stop.wait(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return latencies, versions, errors[0], reloads
+
+
+def main():
+    data = json.loads(DEFAULT_LEXICON_PATH.read_text(encoding="utf-8"))
+    parse_min, parse_median = best_of(lambda: load_lexicon(DEFAULT_LEXICON_PATH))
+    compile_min, compile_median = best_of(lambda: LexiconConfig(data))
+    print(f"load + compile:   {parse_min * 1000:6.2f} ms best, {parse_median * 1000:6.2f} ms median")
+    print(f"compile only:     {compile_min * 1000:6.2f} ms best, {compile_median * 1000:6.2f} ms median")
+
+    # Two versions of the file, swapped back and forth under load
+    path = Path(tempfile.mkdtemp()) / "lexicon.json"
+    variants = []
+    for version in ("1", "2"):
+        data["version"] = version
+        variants.append(json.dumps(data, ensure_ascii=False))
+    path.write_text(variants[0], encoding="utf-8")
+    agent = AIAgent(seed=0)
+    agent.sentiment.config = load_lexicon(path)
+    messages = synthetic_messages(500, seed=1)
+    agent.suggest_emojis("warm up")
+
+    def reloader(stop, seconds=3.0, every=0.01):
+        reloads = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            path.write_text(variants[(reloads + 1) % 2], encoding="utf-8")
+            agent.sentiment.reload_config()
+            reloads += 1
+            time.sleep(every)
+        return reloads
+
+    for name, fn in [("steady", None), ("reloading", reloader)]:
+        latencies, versions, errors, reloads = suggest_latencies(agent, messages, 3.0, fn)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        extra = f", {reloads} reloads" if fn else ""
+        print(
+            f"{name:<10} {len(latencies):6d} suggestions  p50 {p50:.3f} ms  p99 {p99:.3f} ms  "
+            f"errors {errors}  versions {sorted(versions)}{extra}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Overhead of the stage timers, /metrics counters and the sampling profiler.
+
+Run with ``python Code/benchmarks/bench_metrics.py [requests]``.
+
+The same suggestions are served with metrics off (metrics.ENABLED = False,
+what EMOTAI_METRICS=0 does), metrics on, and metrics on with the profiler
+sampling every 5 ms. Modes alternate in small blocks, so machine noise
+lands on all of them. Measured twice: on AIAgent.suggest_emojis alone (the
+worst case, since every timer is on that path) and through Flask's /suggest
+with its database commit. Also times one scrape of /metrics.
+"""
+import os
+import sys
+import time
+
+from common import synthetic_messages, temp_database_uri
+
+os.environ.setdefault("EMOTAI_DATABASE_URI", temp_database_uri())
+os.environ.setdefault("EMOTAI_DB_PATH", temp_database_uri()[len("sqlite:///"):])
+os.environ.setdefault("EMOTAI_WEBHOOK_SPOOL", temp_database_uri()[len("sqlite:///"):])
+os.environ.setdefault("EMOTAI_PREFERENCES", "0")
+
+import metrics  # noqa: E402
+from app import app, agent, warm_up  # noqa: E402
+from profiler import SamplingProfiler  # noqa: E402
+
+MODES = ("off", "on", "on + profiler")
+BLOCK = 50
+
+
+def run(serve, messages):
+    samples = {mode: [] for mode in MODES}
+    profiler = SamplingProfiler()
+    for start in range(0, len(messages), BLOCK):
+        block = messages[start:start + BLOCK]
+        for mode in MODES:
+            metrics.ENABLED = mode != "off"
+            if mode == "on + profiler":
+                profiler.start(0.005)
+            for message in block:
+                begin = time.perf_counter()
+                serve(message)
+                samples[mode].append(time.perf_counter() - begin)
+            profiler.stop()
+    metrics.ENABLED = True
+    return {mode: sorted(values) for mode, values in samples.items()}
+
+
+def report(label, samples):
+    print(label)
+    base = sum(samples["off"]) / len(samples["off"])
+    for mode, values in samples.items():
+        mean = sum(values) / len(values)
+        p50, p99 = values[len(values) // 2], values[int(len(values) * 0.99)]
+        print(f"  metrics {mode:<14} mean {mean * 1e6:8.1f} us  p50 {p50 * 1e6:8.1f} us  "
+              f"p99 {p99 * 1e6:8.1f} us  ({(mean - base) / base:+.1%})")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    messages = synthetic_messages(n, seed=19)
+    warm_up()
+    run(agent.suggest_emojis, messages[:300])
+    report(f"AIAgent.suggest_emojis, {n} messages", run(agent.suggest_emojis, messages))
+
+    client = app.test_client()
+    serve = lambda message: client.post("/suggest", json={"message": message})  # noqa: E731
+    run(serve, messages[:300])
+    report(f"POST /suggest, {n // 2} requests", run(serve, messages[:n // 2]))
+
+    start = time.perf_counter()
+    body = client.get("/metrics").data
+    print(f"GET /metrics: {(time.perf_counter() - start) * 1e3:.2f} ms, {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main()
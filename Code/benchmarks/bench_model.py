@@ -0,0 +1,114 @@
+"""Throughput and latency of the model micro-batcher (classifier.py) by batch size.
+
+Run with ``python Code/benchmarks/bench_model.py --model <hf-model> [--threads 4]``
+for a real CPU model (needs torch and transformers), or without --model to
+drive the batcher with a stand-in classifier whose batch costs
+--fixed-ms + --per-item-ms per sentence (sleeping, so the GIL is free like
+it is during a torch forward pass).
+
+For each --max-batch, --clients threads send requests of 1-3 sentences
+back to back for --seconds through MicroBatcher.classify, as concurrent
+/suggest requests do. Reports sentences/s, request p50/p99, the mean batch
+the engine formed, and how many requests fell back to the rules (those
+run the rule analysis instead, as /suggest does).
+"""
+import argparse
+import threading
+import time
+
+from common import synthetic_messages
+
+from classifier import MicroBatcher, TransformerClassifier
+from emotai import AIAgent
+
+
+class StandInClassifier:
+    def __init__(self, fixed_ms, per_item_ms):
+        self.fixed = fixed_ms / 1000
+        self.per_item = per_item_ms / 1000
+
+    def predict(self, texts):
+        time.sleep(self.fixed + self.per_item * len(texts))
+        return [[("joy", 0.7), ("sadness", 0.2)] for _ in texts]
+
+
+def run(classifier, max_batch, args, requests, rules):
+    batcher = MicroBatcher(
+        classifier, max_batch=max_batch, max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue, timeout=args.timeout,
+    )
+    batcher.classify(["warm up"])
+    latencies, fallbacks, sentences = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            request = requests[i % len(requests)]
+            start = time.perf_counter()
+            result = batcher.classify(request)
+            if result is None:
+                for sentence in request:  # what /suggest serves instead
+                    rules.analyze(sentence)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if result is None:
+                    fallbacks[0] += 1
+                else:
+                    sentences[0] += len(request)
+            i += args.clients
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stats = batcher.snapshot()
+    batcher.shutdown()
+    latencies.sort()
+    print(
+        f"max_batch {max_batch:3d}  {sentences[0] / elapsed:8.0f} sentences/s  "
+        f"p50 {latencies[len(latencies) // 2] * 1e3:7.1f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:7.1f} ms  "
+        f"mean batch {stats['mean_batch']:5.1f}  fallbacks {fallbacks[0] / len(latencies):6.1%}",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads")
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--fixed-ms", type=float, default=8.0)
+    parser.add_argument("--per-item-ms", type=float, default=1.5)
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.model:
+        classifier = TransformerClassifier(args.model, threads=args.threads, quantize=not args.no_quantize)
+        print(f"model {args.model} ({'fp32' if args.no_quantize else 'int8 dynamic'}), labels {classifier.labels}")
+    else:
+        classifier = StandInClassifier(args.fixed_ms, args.per_item_ms)
+        print(f"stand-in classifier: {args.fixed_ms:g} ms + {args.per_item_ms:g} ms/sentence per batch")
+
+    agent = AIAgent()
+    agent.warm_up()
+    requests = [agent.split_sentences(message) for message in synthetic_messages(2000, seed=21)]
+    print(f"{args.clients} concurrent clients, {sum(map(len, requests)) / len(requests):.1f} sentences/request, "
+          f"max wait {args.max_wait_ms:g} ms, timeout {args.timeout:g} s")
+    for max_batch in args.max_batch:
+        run(classifier, max_batch, args, requests, agent.sentiment)
+
+
+if __name__ == "__main__":
+    main()
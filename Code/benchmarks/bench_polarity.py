@@ -0,0 +1,43 @@
+"""Startup and per-sentence cost of the polarity backends.
+
+Run with ``python Code/benchmarks/bench_polarity.py``.
+"""
+import subprocess
+import sys
+
+from common import BACKEND_DIR, SAMPLE_SENTENCES, timed
+
+from polarity import POLARITY_BACKENDS, polarity_bucket
+
+
+def startup_seconds(name):
+    # Fresh interpreter so import and lexicon loading are not already cached
+    code = (
+        "import time; t = time.perf_counter(); "
+        "from polarity import get_polarity_scorer; "
+        f"get_polarity_scorer({name!r}).score('warm up'); "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip())
+
+
+def main():
+    scorers = {name: cls() for name, cls in POLARITY_BACKENDS.items()}
+    reference = [scorers["textblob"].score(s) for s in SAMPLE_SENTENCES]
+    per = 1e6 / len(SAMPLE_SENTENCES)
+    print(f"{'backend':>10} {'startup':>10} {'us/sentence':>12} {'bucket agreement':>17}")
+    for name, scorer in scorers.items():
+        scores = [scorer.score(s) for s in SAMPLE_SENTENCES]
+        agree = sum(polarity_bucket(a) == polarity_bucket(b) for a, b in zip(scores, reference))
+        per_sentence = timed(lambda: [scorer.score(s) for s in SAMPLE_SENTENCES]) * per
+        print(
+            f"{name:>10} {startup_seconds(name):>9.3f}s {per_sentence:>12.2f} "
+            f"{agree / len(SAMPLE_SENTENCES):>16.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
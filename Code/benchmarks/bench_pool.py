@@ -0,0 +1,61 @@
+"""Throughput of AIAgent.suggest_emojis with and without the analysis pool.
+
+Sweeps pool sizes from inline (0) up to the core count, with enough client
+threads to keep every worker busy. Run with
+``python Code/benchmarks/bench_pool.py [seconds-per-size]``.
+"""
+import os
+import sys
+import threading
+import time
+
+from common import synthetic_messages
+
+from emotai import AIAgent
+from pool import AnalysisPool
+
+
+def throughput(agent, messages, clients, seconds):
+    done = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(slot):
+        i = slot
+        while time.perf_counter() < stop:
+            agent.suggest_emojis(messages[i % len(messages)])
+            done[slot] += 1
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(done) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    cores = os.cpu_count() or 1
+    sizes = [0] + sorted({2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores} | {cores})
+    messages = synthetic_messages(500, seed=5, sentences=(1, 8))
+    baseline = None
+    print(f"cores: {cores}")
+    print(f"{'pool':>5} {'clients':>8} {'msgs/sec':>10} {'scaling':>8} {'fallbacks':>10}")
+    for size in sizes:
+        pool = AnalysisPool(size, timeout=5.0).start() if size else None
+        agent = AIAgent(pool=pool)
+        agent.suggest_emojis("warm up")
+        clients = max(2, size * 2)
+        rate = throughput(agent, messages, clients, seconds)
+        baseline = baseline or rate
+        fallbacks = "-"
+        if pool is not None:
+            stats = pool.snapshot()
+            fallbacks = stats["saturated"] + stats["timeouts"] + stats["errors"]
+            pool.shutdown()
+        print(f"{size:>5} {clients:>8} {rate:>10.0f} {rate / baseline:>7.2f}x {fallbacks:>10}")
+
+
+if __name__ == "__main__":
+    main()
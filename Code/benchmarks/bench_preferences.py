@@ -0,0 +1,85 @@
+"""Per-request cost of preference-aware ranking and the preference cache hit rate.
+
+Run with ``python Code/benchmarks/bench_preferences.py [requests] [users]``.
+
+Requests come from users drawn with a skewed (Pareto) distribution, the
+way a few active users dominate traffic. Each personalized request does
+what /suggest does: rank from the PreferenceCache, then record the chosen
+emojis. The cache is also run with room for only a tenth of the users to
+show the effect of LRU eviction on the hit rate. The cache operations are
+timed on their own as well, since the end-to-end difference is close to
+the noise of a suggestion.
+"""
+import os
+import random
+import sys
+import time
+
+from common import synthetic_messages, temp_database_uri, timed
+
+os.environ.setdefault("EMOTAI_DB_PATH", temp_database_uri()[len("sqlite:///"):])
+
+from emotai import AIAgent  # noqa: E402
+from preferences import PreferenceCache  # noqa: E402
+
+
+def make_users(n_requests, n_users, seed=0):
+    rng = random.Random(seed)
+    return [f"user-{min(int(rng.paretovariate(0.5)) - 1, n_users - 1)}" for _ in range(n_requests)]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (
+        sum(samples) / len(samples) * 1e6,
+        samples[len(samples) // 2] * 1e6,
+        samples[int(len(samples) * 0.99)] * 1e6,
+    )
+
+
+def run(plain, personalized, messages, users):
+    # Alternates the two agents request by request, so machine noise and
+    # the background flushes land on both
+    samples = {False: [], True: []}
+    for message, user in zip(messages, users):
+        for agent in (plain, personalized):
+            start = time.perf_counter()
+            suggestion = agent.suggest_emojis(message, username=user)
+            if agent.preferences is not None:
+                agent.preferences.record_usage(user, suggestion.emojis)
+            samples[agent.preferences is not None].append(time.perf_counter() - start)
+    return percentiles(samples[False]), percentiles(samples[True])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    messages = synthetic_messages(n, seed=4)
+    users = make_users(n, n_users)
+    print(f"{n} requests from {len(set(users))} distinct users (of {n_users})")
+
+    for label, max_users in [("all users fit", n_users), ("10% capacity", n_users // 10)]:
+        cache = PreferenceCache(max_users=max_users, flush_interval=0.5)
+        plain, personalized = AIAgent(seed=0), AIAgent(seed=0, preferences=cache)
+        plain.warm_up()
+        run(plain, personalized, messages[:1000], users[:1000])
+        (mean, p50, p99), (p_mean, p_p50, p_p99) = run(plain, personalized, messages, users)
+        cache.shutdown()
+        stats = cache.snapshot()
+        print(f"{label}: hit rate {stats['hit_rate']:.1%}, evictions {stats['evictions']}, "
+              f"{stats['flushes']} flushes (last {stats['last_flush_ms']:.1f} ms)")
+        print(f"  non-personalized  mean {mean:7.1f} us  p50 {p50:7.1f} us  p99 {p99:7.1f} us")
+        print(f"  personalized      mean {p_mean:7.1f} us  p50 {p_p50:7.1f} us  p99 {p_p99:7.1f} us  "
+              f"({p_mean - mean:+.1f} us/request)")
+
+    cache = PreferenceCache(flush_interval=60)
+    cache.record_usage("user-0", ["😀", "🙂", "😀"])
+    cache.flush()
+    print(f"ranking lookup (hit):    {timed(cache.ranking, 'user-0', number=10000) * 1e6:.2f} us")
+    print(f"record_usage + lookup:   "
+          f"{timed(lambda: (cache.record_usage('user-0', ['😀']), cache.ranking('user-0')), number=10000) * 1e6:.2f} us")
+    cache.shutdown()
+
+
+if __name__ == "__main__":
+    main()
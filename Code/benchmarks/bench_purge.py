@@ -0,0 +1,205 @@
+"""/suggest latency while a heavy user's data is purged.
+
+Run with ``python Code/benchmarks/bench_purge.py [rows] [--batch-sizes 500 2000]``.
+
+Seeds one user with <rows> messages (each with a sentence row, every tenth
+with feedback) and a tenth as many rows in each legacy store table, next
+to a few thousand messages of other users. Then, on a fresh copy of that
+database per mode, POST /suggest is timed from another user's session
+while the heavy user is deleted on a background thread:
+
+- single transaction: what /delete_user_data did before purge.py, i.e.
+  rollups.remove_user and three unbounded DELETEs in one commit
+- chunked: purge.Purger with each --batch-sizes / --pauses combination
+
+An idle run (no purge) gives the baseline. Failed /suggest requests are
+counted; the single transaction can outlast SQLite's busy timeout.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import synthetic_messages
+
+WORK_DIR = tempfile.mkdtemp(prefix="emotai-purge-")
+WORK_DB = os.path.join(WORK_DIR, "work.db")
+os.environ["EMOTAI_DATABASE_URI"] = f"sqlite:///{WORK_DB}"
+os.environ["EMOTAI_DB_PATH"] = WORK_DB + ".store"
+os.environ["EMOTAI_WEBHOOK_SPOOL"] = WORK_DB + ".webhooks"
+os.environ.setdefault("EMOTAI_PREFERENCES", "0")
+
+import db as store  # noqa: E402
+import purge  # noqa: E402
+import rollups  # noqa: E402
+from app import app, agent, ensure_schema, warm_up  # noqa: E402
+from models import db, Feedback, Message, MessageSentence, User, compact_suggestion  # noqa: E402
+
+HEAVY_USER = "purge-heavy-user"
+SEED_BATCH = 20000
+
+
+def seed(rows):
+    texts = synthetic_messages(200, seed=20)
+    suggestions = [agent.suggest_emojis(text).dict() for text in texts]
+    others = [f"purge-user-{i}" for i in range(50)]
+    now = datetime.now(timezone.utc)
+    ensure_schema()
+    store.init_db()
+    with app.app_context():
+        db.session.execute(db.insert(User), [{"id": user} for user in [HEAVY_USER] + others])
+        total = rows + 5000
+        for start in range(0, total, SEED_BATCH):
+            messages, sentences, feedback = [], [], []
+            for i in range(start, min(total, start + SEED_BATCH)):
+                suggestion = suggestions[i % len(suggestions)]
+                user = HEAVY_USER if i < rows else others[i % len(others)]
+                messages.append({
+                    "id": i + 1,
+                    "user_id": user,
+                    "text": texts[i % len(texts)],
+                    "suggestion": compact_suggestion(suggestion),
+                    "primary_sentiment": suggestion["sentiment"],
+                    "intensity": suggestion["intensity"],
+                    "created_at": now - timedelta(seconds=total - i),
+                })
+                sent = suggestion["sentences"][0]
+                sentences.append({
+                    "message_id": i + 1, "position": 0,
+                    "primary_sentiment": sent["sentiment"], "intensity": sent["intensity"],
+                })
+                if i % 10 == 0:
+                    feedback.append({"message_id": i + 1, "user_id": user, "rating": 1 + i % 3})
+            db.session.execute(db.insert(Message), messages)
+            db.session.execute(db.insert(MessageSentence), sentences)
+            db.session.execute(db.insert(Feedback), feedback)
+            db.session.commit()
+        rollups.backfill()
+    with store.transaction() as conn:
+        for i in range(rows // 10):
+            conn.execute(store.INSERT_SUGGESTION, (HEAVY_USER, texts[i % len(texts)], "😀,🎉", ""))
+            conn.execute(
+                "INSERT INTO emoji_analytics (username, emoji, sentiment) VALUES (?, ?, ?)",
+                (HEAVY_USER, "😀", "happy"),
+            )
+            conn.execute(
+                "INSERT INTO feedback (username, message, feedback, rating) VALUES (?, ?, ?, ?)",
+                (HEAVY_USER, "hi", "", 3),
+            )
+    store.configure()
+
+
+def restore(seeded):
+    with app.app_context():
+        db.engine.dispose()
+    store.configure()
+    for suffix in ("", ".store"):
+        for extra in ("-wal", "-shm", "-journal"):
+            if os.path.exists(WORK_DB + suffix + extra):
+                os.remove(WORK_DB + suffix + extra)
+        shutil.copy(seeded + suffix, WORK_DB + suffix)
+
+
+def single_transaction(user_id):
+    # The pre-purge.py /delete_user_data
+    with app.app_context():
+        rollups.remove_user(user_id)
+        Feedback.query.filter_by(user_id=user_id).delete()
+        MessageSentence.query.filter(
+            MessageSentence.message_id.in_(db.select(Message.id).where(Message.user_id == user_id))
+        ).delete(synchronize_session=False)
+        Message.query.filter_by(user_id=user_id).delete()
+        User.query.filter_by(id=user_id).delete()
+        db.session.commit()
+        for table in store.PURGE_TABLES:
+            with store.transaction() as conn:
+                conn.execute(f"DELETE FROM {table} WHERE username=?", (user_id,))
+
+
+def chunked(batch_size, pause):
+    def run(user_id):
+        purger = purge.Purger(app, batch_size=batch_size, pause=pause)
+        with app.app_context():
+            job = purger.run(purger.create(user_id))
+        return job
+    return run
+
+
+def measure(label, purge_fn, messages, idle_requests):
+    client = app.test_client()
+    client.post("/suggest", json={"message": "warm up"})
+    latencies, errors = [], 0
+    done = threading.Event()
+    result = {}
+
+    def target():
+        started = time.perf_counter()
+        try:
+            result["job"] = purge_fn(HEAVY_USER)
+        except Exception as exc:
+            result["error"] = exc
+        result["seconds"] = time.perf_counter() - started
+        done.set()
+
+    if purge_fn is not None:
+        threading.Thread(target=target, daemon=True).start()
+    i = 0
+    while (not done.is_set()) if purge_fn is not None else i < idle_requests:
+        start = time.perf_counter()
+        try:
+            status = client.post("/suggest", json={"message": messages[i % len(messages)]}).status_code
+        except Exception:
+            status = 500
+        latencies.append(time.perf_counter() - start)
+        errors += status != 200
+        i += 1
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    line = (f"{label:<32} {len(latencies):6d} requests  p50 {p50 * 1e3:7.1f} ms  "
+            f"p99 {p99 * 1e3:8.1f} ms  max {latencies[-1] * 1e3:8.1f} ms  errors {errors}")
+    if "seconds" in result:
+        line += f"  purge {result['seconds']:.1f}s"
+    if "job" in result and result["job"] is not None:
+        line += f" ({result['job'].batches} batches, {result['job'].retries} retries)"
+    if "error" in result:
+        line += f"  purge failed: {result['error']}"
+    print(line, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int, nargs="?", default=1000000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--pauses", type=float, nargs="+", default=[0.02])
+    parser.add_argument("--idle-requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.rows)
+    seeded = os.path.join(WORK_DIR, "seeded.db")
+    with app.app_context():
+        db.engine.dispose()
+    for suffix in ("", ".store"):
+        shutil.copy(WORK_DB + suffix, seeded + suffix)
+    print(f"seeded {args.rows} messages for one user in {time.perf_counter() - started:.0f}s", file=sys.stderr)
+
+    warm_up()
+    messages = synthetic_messages(2000, seed=21)
+    restore(seeded)
+    measure("idle", None, messages, args.idle_requests)
+    restore(seeded)
+    measure("single transaction", single_transaction, messages, 0)
+    for batch_size in args.batch_sizes:
+        for pause in args.pauses:
+            restore(seeded)
+            measure(f"chunked {batch_size}/batch, {pause * 1e3:g} ms pause",
+                    chunked(batch_size, pause), messages, 0)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Cold start vs warm requests for the Flask app.
+
+    python Code/benchmarks/bench_startup.py [--record startup.jsonl]
+
+Every measurement runs in a fresh interpreter on a fresh database:
+
+- importtime: `python -X importtime -c "import app"`, total and the slowest
+  modules by cumulative time
+- lazy: import, then the first /suggest pays for any lazy loading
+- warm: import, warm_up() (the post-fork hook), then the first /suggest
+
+Warm-request latency is the mean of the requests after the first. With
+--record, the results are appended as one JSON line (with the git revision)
+so startup can be tracked over time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from common import BACKEND_DIR, git_revision, temp_database_uri
+
+
+def fresh_env():
+    uri = temp_database_uri()
+    path = uri[len("sqlite:///"):]
+    return dict(
+        os.environ, EMOTAI_DATABASE_URI=uri, EMOTAI_DB_PATH=path + ".store", EMOTAI_WEBHOOK_SPOOL=path + ".webhooks",
+    )
+
+
+def importtime(top=10):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, env=fresh_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.append((int(cumulative), name.strip()))
+    app_us = next(us for us, name in modules if name == "app")
+    slowest = sorted((m for m in modules if m[1] != "app"), reverse=True)[:top]
+    return {"import_app_ms": app_us / 1000, "slowest": [(n, us / 1000) for us, n in slowest]}
+
+
+def child(mode, warm_requests):
+    start = time.perf_counter()
+    import app as app_module
+
+    imported = time.perf_counter()
+    if mode == "warm":
+        app_module.warm_up()
+    ready = time.perf_counter()
+    client = app_module.app.test_client()
+    client.post("/suggest", json={"message": "I am so happy today!"})
+    first = time.perf_counter()
+    for i in range(warm_requests):
+        client.post("/suggest", json={"message": f"Hello there number {i}, how are you?"})
+    done = time.perf_counter()
+    print(json.dumps({
+        "import_s": imported - start,
+        "warm_up_s": ready - imported,
+        "first_request_s": first - ready,
+        "warm_request_ms": (done - first) / warm_requests * 1000,
+    }))
+
+
+def run_child(mode, warm_requests):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--warm-requests", str(warm_requests)],
+        env=fresh_env(), capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Process start until the first response is back, interpreter included
+    result["time_to_first_response_s"] = (
+        time.perf_counter() - start
+        - result["warm_request_ms"] * warm_requests / 1000
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", choices=("lazy", "warm"))
+    parser.add_argument("--warm-requests", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--record", help="append the results to this JSON lines file")
+    args = parser.parse_args()
+    if args.child:
+        sys.path.insert(0, str(BACKEND_DIR))
+        os.chdir(BACKEND_DIR)
+        return child(args.child, args.warm_requests)
+
+    report = {"importtime": importtime()}
+    print(f"import app: {report['importtime']['import_app_ms']:.0f} ms; slowest modules (cumulative):")
+    for name, ms in report["importtime"]["slowest"]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    for mode in ("lazy", "warm"):
+        runs = [run_child(mode, args.warm_requests) for _ in range(args.runs)]
+        best = {key: min(run[key] for run in runs) for key in runs[0]}
+        report[mode] = best
+        print(
+            f"{mode:>5}: cold start {best['time_to_first_response_s'] * 1000:7.0f} ms "
+            f"(import {best['import_s'] * 1000:.0f} ms, warm-up {best['warm_up_s'] * 1000:.0f} ms, "
+            f"first request {best['first_request_s'] * 1000:.0f} ms)  "
+            f"warm request {best['warm_request_ms']:.2f} ms"
+        )
+
+    if args.record:
+        report["revision"] = git_revision()
+        report["recorded_at"] = datetime.now(timezone.utc).isoformat()
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Time-to-first-emoji for /suggest vs /suggest/stream on long messages.
+
+Run with ``python Code/benchmarks/bench_stream.py``.
+"""
+import os
+import time
+
+from common import SAMPLE_SENTENCES, temp_database_uri
+
+os.environ.setdefault("EMOTAI_DATABASE_URI", temp_database_uri())
+
+from app import app, agent  # noqa: E402
+
+SIZES = [10, 100, 1000]
+
+
+def long_message(n):
+    # Every sample ends in punctuation, so each one is its own sentence
+    return " ".join(SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)] for i in range(n))
+
+
+def main():
+    client = app.test_client()
+    agent.suggest_emojis("warm up")
+    print(f"{'sentences':>9} {'/suggest total':>15} {'stream first':>13} {'stream total':>13}")
+    for n in SIZES:
+        message = long_message(n)
+
+        t = time.perf_counter()
+        client.post("/suggest", json={"message": message})
+        full = time.perf_counter() - t
+
+        t = time.perf_counter()
+        res = client.post("/suggest/stream", json={"message": message}, buffered=False)
+        chunks = iter(res.response)
+        next(chunks)
+        first = time.perf_counter() - t
+        for _ in chunks:
+            pass
+        res.close()
+        total = time.perf_counter() - t
+
+        print(f"{n:>9} {full * 1000:>12.1f} ms {first * 1000:>10.1f} ms {total * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
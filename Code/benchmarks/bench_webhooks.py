@@ -0,0 +1,155 @@
+"""End-to-end webhook throughput: /webhook -> spool -> AIAgent -> callback targets.
+
+Run with ``python Code/benchmarks/bench_webhooks.py [--events 5000]
+[--batch-size 1 256] [--targets 1] [--concurrency 4] [--delay-ms 0]
+[--fail-rate 0]``, or ``--serve PORT`` to run only the stub receiver (for
+EMOTAI_WEBHOOK_TARGETS of a real deployment; it prints events/sec).
+
+Each case builds an integrations.WebhookPipeline on a fresh spool with
+local stub receivers as its targets. The receivers keep connections
+alive, answer after --delay-ms and fail --fail-rate of the requests with
+a 503 (retried after 10 ms). Events are posted through a Flask test client
+as fast as it goes, with Slack-style payloads from common.synthetic_messages.
+Reports ingestion (acks/sec), end-to-end events/sec (first POST to last
+delivery on every target) and the delivery latency p50/p99 (event
+received to its result arriving at the receiver).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import synthetic_messages
+
+from flask import Flask
+
+import integrations
+from emotai import AIAgent
+
+
+class StubReceiver:
+    def __init__(self, port=0, delay=0.0, fail_rate=0.0, seed=0):
+        self.fail_rate = fail_rate
+        self.latencies = []
+        self.failures = 0
+        self.last = None
+        self._lock = threading.Lock()
+        self._rand = random.Random(seed)
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if delay:
+                    time.sleep(delay)
+                status = receiver.receive(body)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def receive(self, body):
+        now = time.time()
+        with self._lock:
+            if self._rand.random() < self.fail_rate:
+                self.failures += 1
+                return 503
+            self.latencies.append(now - json.loads(body)["received_at"])
+            self.last = now
+        return 200
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(agent, payloads, batch_size, targets, concurrency, delay, fail_rate):
+    receivers = [StubReceiver(delay=delay, fail_rate=fail_rate, seed=i) for i in range(targets)]
+    spool = integrations.Spool(os.path.join(tempfile.mkdtemp(prefix="emotai-webhooks-"), "spool.db"))
+    pipeline = integrations.WebhookPipeline(
+        agent, spool, max_queue=len(payloads) + 1, batch_size=batch_size, retry_delay=0.01,
+    )
+    for receiver in receivers:
+        pipeline.add_target(receiver.url, concurrency)
+    app = Flask(__name__)
+    app.extensions["webhooks"] = pipeline
+    app.register_blueprint(integrations.integrations_bp)
+    client = app.test_client()
+    pipeline.start()
+
+    start = time.time()
+    for payload in payloads:
+        if client.post("/integrations/webhook", json=payload).status_code != 202:
+            raise RuntimeError("event rejected")
+    ingested = time.time() - start
+    while any(len(r.latencies) < len(payloads) for r in receivers):
+        time.sleep(0.01)
+    elapsed = max(r.last for r in receivers) - start
+    stats = pipeline.snapshot()
+    pipeline.shutdown()
+    latencies = sorted(l for r in receivers for l in r.latencies)
+    for receiver in receivers:
+        receiver.close()
+    print(
+        f"batch {batch_size:4d}  ingest {len(payloads) / ingested:8.0f} acks/s  "
+        f"end-to-end {len(payloads) / elapsed:8.0f} events/s  "
+        f"latency p50 {latencies[len(latencies) // 2] * 1e3:8.1f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:8.1f} ms  "
+        f"retries {stats.get('retried', 0)}",
+        flush=True,
+    )
+
+
+def serve(port):
+    receiver = StubReceiver(port=port)
+    print(f"receiving on {receiver.url}", flush=True)
+    seen = 0
+    while True:
+        time.sleep(1)
+        count = len(receiver.latencies)
+        print(f"{count - seen} events/s, {count} total", flush=True)
+        seen = count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--targets", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4, help="per target")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="receiver response time")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run a stub receiver")
+    args = parser.parse_args()
+    if args.serve is not None:
+        return serve(args.serve)
+
+    agent = AIAgent()
+    agent.warm_up()
+    payloads = [
+        {"type": "event_callback", "event": {"type": "message", "channel": "C1", "user": f"U{i % 50}", "text": text}}
+        for i, text in enumerate(synthetic_messages(args.events, seed=24))
+    ]
+    print(
+        f"{args.events} events, {args.targets} target(s) x {args.concurrency} connections, "
+        f"receiver {args.delay_ms} ms, fail rate {args.fail_rate}"
+    )
+    for batch_size in args.batch_size:
+        run(agent, payloads, batch_size, args.targets, args.concurrency, args.delay_ms / 1000, args.fail_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""/suggest latency with synchronous commits vs write-behind persistence.
+
+Run with ``python Code/benchmarks/bench_write_behind.py [requests]``.
+"""
+import os
+import statistics
+import sys
+import time
+
+from common import synthetic_messages, temp_database_uri
+
+os.environ.setdefault("EMOTAI_DATABASE_URI", temp_database_uri())
+
+import app as app_module  # noqa: E402
+from writebehind import WriteBehindWriter  # noqa: E402
+
+
+def run(client, messages):
+    samples = []
+    for message in messages:
+        t = time.perf_counter()
+        client.post("/suggest", json={"message": message})
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    messages = synthetic_messages(n, seed=3)
+    client = app_module.app.test_client()
+    client.post("/suggest", json={"message": "warm up"})
+
+    sync = run(client, messages)
+
+    writer = WriteBehindWriter(app_module.app)
+    app_module.write_behind = writer
+    behind = run(client, messages)
+    drain_start = time.perf_counter()
+    writer.shutdown()
+    drain = time.perf_counter() - drain_start
+    stats = writer.snapshot()
+
+    print(f"{n} requests")
+    for name, (p50, p99) in (("sync commit", sync), ("write-behind", behind)):
+        print(f"{name:>13}: p50 {p50 * 1000:6.2f} ms   p99 {p99 * 1000:6.2f} ms")
+    print(
+        f"write-behind: {stats['batches']} batches, avg flush {stats['avg_flush_ms']:.1f} ms, "
+        f"max flush {stats['max_flush_ms']:.1f} ms, drain on shutdown {drain * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
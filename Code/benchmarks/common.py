@@ -0,0 +1,101 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+SAMPLE_SENTENCES = [
+    "hi",
+    "thanks!",
+    "lol what?",
+    "I am so happy today!",
+    "I feel really sad.",
+    "I'm happy but also a bit sad.",
+    "Hello there, how are you doing?",
+    "This is extremely urgent, there is a warning on the dashboard.",
+    "Yeah right, like that is going to work.",
+    "I love this so much, it is amazing!",
+    "Why would anyone do that? I am so confused.",
+    "I'm a little nervous but really excited about tomorrow.",
+    "That was a terrible, horrible experience and I am furious.",
+    "I adore you and cherish every moment, but I'm mad at you right now.",
+    "Wow, that is seriously amazing news, congratulations!",
+    "The meeting is at 3pm in the small conference room.",
+    "Sure... whatever you say.",
+    "I am very very happy and really good and extremely cheerful.",
+    "Huh, what happened here?",
+    "We are completely thrilled, hey everyone!",
+]
+
+
+FILLER_WORDS = (
+    "the", "a", "we", "you", "it", "this", "that", "meeting", "project", "weekend", "team",
+    "today", "tomorrow", "about", "with", "for", "again", "finally", "just", "was", "is",
+    "feel", "think", "got", "news", "message", "plan", "coffee", "deploy", "review", "call",
+    "after", "before", "dinner", "trip", "result", "update", "and", "but", "our", "my",
+)
+ENDINGS = (".", ".", "!", "?", "...")
+
+
+def timed(fn, *args, repeat=5, number=200):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / number
+
+
+def temp_database_uri():
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="emotai-bench-")
+    os.close(fd)
+    return f"sqlite:///{path}"
+
+
+def synthetic_messages(n, seed=0, sentences=(1, 3), words=(4, 12)):
+    # Deterministic messages built from the lexicon's keywords, intensity
+    # words and sarcasm phrases mixed into filler words. Sentences are
+    # practically never repeated, so caches and batch de-duplication do not
+    # flatter results, yet every classification path is exercised.
+    lexicon = json.loads((BACKEND_DIR / "data" / "lexicon.json").read_text(encoding="utf-8"))
+    keywords = sorted({w for words_ in lexicon["sentiment_map"].values() for w in words_})
+    intensifiers = sorted(lexicon["intensity_words"])
+    sarcasm = sorted(lexicon.get("sarcasm_phrases", ()))
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(*sentences)):
+            tokens = []
+            for _ in range(rng.randint(*words)):
+                roll = rng.random()
+                if roll < 0.2:
+                    if rng.random() < 0.3:
+                        tokens.append(rng.choice(intensifiers))
+                    tokens.append(rng.choice(keywords))
+                elif roll < 0.22 and sarcasm:
+                    tokens.append(rng.choice(sarcasm).rstrip("."))
+                else:
+                    tokens.append(rng.choice(FILLER_WORDS))
+            sentence = " ".join(tokens)
+            parts.append(sentence[0].upper() + sentence[1:] + rng.choice(ENDINGS))
+        messages.append(" ".join(parts))
+    return messages
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,336 @@
+"""Benchmark and regression suite for the analysis and API hot paths.
+
+    python Code/benchmarks/suite.py [--rows 1000 100000 1000000] [--output results.json]
+    python Code/benchmarks/suite.py --compare baseline.json [--threshold 0.15]
+    python Code/benchmarks/suite.py --current results.json --compare baseline.json
+
+Cases (select with --cases, a glob over the case names):
+
+- analysis/<fn>/<size>: SentimentAnalyzer.detect_sentiment, get_emojis and
+  AIAgent.suggest_emojis on short (1 sentence), medium (3) and long (20)
+  messages from common.synthetic_messages
+- api/<rows>/<endpoint>: POST /suggest, GET /history (first page of a user
+  holding a tenth of the rows), GET /analytics and /analytics?hours=24
+  through the Flask test client, against a database seeded with <rows>
+  messages. Each size runs in its own interpreter, since app.py binds its
+  database at import. Seeded databases are cached in --db-dir (per day,
+  as /analytics?hours=24 depends on the timestamps) and copied per run.
+
+Every case is timed in three rounds and reports the best round's ops/s,
+mean and p50 latency, and the median round's p99; --output writes them
+as JSON along with the revision and machine. --compare checks the results
+(fresh, or loaded with --current) against a stored baseline and exits with
+status 1 when a case's ops/s or p50 regressed by more than --threshold, or
+its p99 by more than --p99-threshold.
+"""
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from common import BACKEND_DIR, git_revision, synthetic_messages
+
+SEED = 1234
+# Bump when the seeded data changes, so cached databases are rebuilt
+SEED_VERSION = 1
+SIZES = {"short": (1, 1), "medium": (3, 3), "long": (20, 20)}
+HEAVY_USER = "suite-heavy-user"
+SEED_BATCH = 10000
+
+
+def measure_round(fn, min_time, min_iterations):
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_iterations or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples
+
+
+def measure(fn, min_time=1.0, rounds=3, min_iterations=20, warmup=5):
+    # Best of `rounds` for throughput and p50, which filters out rounds
+    # disturbed by the rest of the machine; p99 is the median round's
+    for _ in range(warmup):
+        fn()
+    stats = []
+    for _ in range(rounds):
+        samples = measure_round(fn, min_time / rounds, min_iterations)
+        total = sum(samples)
+        stats.append({
+            "iterations": len(samples),
+            "ops_per_s": len(samples) / total,
+            "mean_ms": total / len(samples) * 1000,
+            "p50_ms": samples[len(samples) // 2] * 1000,
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        })
+    best = max(stats, key=lambda s: s["ops_per_s"])
+    return {
+        "iterations": sum(s["iterations"] for s in stats),
+        "ops_per_s": best["ops_per_s"],
+        "mean_ms": best["mean_ms"],
+        "p50_ms": min(s["p50_ms"] for s in stats),
+        "p99_ms": sorted(s["p99_ms"] for s in stats)[len(stats) // 2],
+    }
+
+
+def analysis_cases(selected, min_time):
+    from emotai import AIAgent
+
+    agent = AIAgent(seed=SEED)
+    agent.warm_up()
+    analyzer = agent.sentiment
+    results = {}
+    for size, sentences in SIZES.items():
+        messages = synthetic_messages(200, seed=SEED, sentences=sentences)
+        analyzed = [analyzer.detect_sentiment(m) for m in messages]
+        cases = {
+            "detect_sentiment": (analyzer.detect_sentiment, messages),
+            "get_emojis": (analyzer.get_emojis, analyzed),
+            "suggest_emojis": (agent.suggest_emojis, messages),
+        }
+        for name, (fn, inputs) in cases.items():
+            case = f"analysis/{name}/{size}"
+            if not selected(case):
+                continue
+            cycle = itertools.cycle(inputs)
+            results[case] = measure(lambda: fn(next(cycle)), min_time)
+            report(case, results[case])
+    return results
+
+
+def seed_database(rows):
+    # Child process with EMOTAI_DATABASE_URI pointing at the file to fill
+    from app import app, agent, ensure_schema
+    from models import db, Feedback, Message, MessageSentence, User, compact_suggestion
+    import rollups
+
+    rng = random.Random(SEED)
+    agent.sentiment.rng.seed(SEED)
+    texts = synthetic_messages(500, seed=SEED)
+    suggestions = [agent.suggest_emojis(text).dict() for text in texts]
+    users = [HEAVY_USER] + [f"suite-user-{i}" for i in range(max(1, rows // 100))]
+    now = datetime.now(timezone.utc)
+    span = timedelta(days=30).total_seconds()
+    ensure_schema()
+    with app.app_context():
+        db.session.execute(db.insert(User), [{"id": user} for user in users])
+        for start in range(0, rows, SEED_BATCH):
+            messages, sentences, feedback = [], [], []
+            for i in range(start, min(rows, start + SEED_BATCH)):
+                k = rng.randrange(len(texts))
+                suggestion = suggestions[k]
+                user = HEAVY_USER if i % 10 == 0 else rng.choice(users)
+                message_id = i + 1
+                messages.append({
+                    "id": message_id,
+                    "user_id": user,
+                    "text": texts[k],
+                    "suggestion": compact_suggestion(suggestion),
+                    "primary_sentiment": suggestion["sentiment"],
+                    "intensity": suggestion["intensity"],
+                    "mixed_type": suggestion["mixed"],
+                    "polarity": suggestion["polarity"],
+                    "lexicon_version": suggestion["lexicon_version"],
+                    "created_at": now - timedelta(seconds=(rows - i) * span / rows),
+                })
+                sentences += [
+                    {
+                        "message_id": message_id,
+                        "position": position,
+                        "primary_sentiment": sent["sentiment"],
+                        "intensity": sent["intensity"],
+                        "mixed_type": sent["mixed"],
+                        "polarity": sent["polarity"],
+                    }
+                    for position, sent in enumerate(suggestion["sentences"])
+                ]
+                if i % 10 == 3:
+                    feedback.append({"message_id": message_id, "user_id": user, "rating": 1 + i % 3})
+            db.session.execute(db.insert(Message), messages)
+            db.session.execute(db.insert(MessageSentence), sentences)
+            if feedback:
+                db.session.execute(db.insert(Feedback), feedback)
+            db.session.commit()
+        rollups.backfill()
+
+
+def api_cases(rows, selected, min_time):
+    # Child process with EMOTAI_DATABASE_URI pointing at a seeded copy
+    from app import app, warm_up
+
+    warm_up()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = HEAVY_USER
+    messages = itertools.cycle(synthetic_messages(2000, seed=SEED + 1))
+    cases = {
+        "suggest": lambda: client.post("/suggest", json={"message": next(messages)}),
+        "history": lambda: client.get("/history"),
+        "analytics": lambda: client.get("/analytics"),
+        "analytics_24h": lambda: client.get("/analytics?hours=24"),
+    }
+    results = {}
+    for name, fn in cases.items():
+        case = f"api/{rows}/{name}"
+        if not selected(case):
+            continue
+        status = fn().status_code
+        if status != 200:
+            raise RuntimeError(f"{case}: HTTP {status}")
+        results[case] = measure(fn, min_time)
+    return results
+
+
+def child_env(database):
+    env = dict(os.environ, EMOTAI_DATABASE_URI=f"sqlite:///{database}")
+    env["EMOTAI_DB_PATH"] = f"{database}.store"
+    env["EMOTAI_WEBHOOK_SPOOL"] = f"{database}.webhooks"
+    env.setdefault("EMOTAI_EMOJI_SEED", str(SEED))
+    return env
+
+
+def run_child(args, database):
+    proc = subprocess.run(
+        [sys.executable, __file__, *args], cwd=BACKEND_DIR, env=child_env(database),
+        capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr}")
+    return proc.stdout
+
+
+def seeded_database(rows, db_dir):
+    db_dir.mkdir(parents=True, exist_ok=True)
+    path = db_dir / f"suite-{rows}-v{SEED_VERSION}-{date.today().isoformat()}.db"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        for stale in db_dir.glob(f"{partial.name}*"):
+            stale.unlink()
+        started = time.perf_counter()
+        run_child(["--child", "seed", "--rows", str(rows)], partial)
+        os.replace(partial, path)
+        print(f"seeded {rows} rows in {time.perf_counter() - started:.1f}s ({path})", file=sys.stderr)
+    return path
+
+
+def api_results(rows, db_dir, cases, min_time):
+    work = Path(tempfile.mkdtemp(prefix="emotai-suite-")) / "work.db"
+    shutil.copy(seeded_database(rows, db_dir), work)
+    try:
+        out = run_child(
+            ["--child", "api", "--rows", str(rows), "--cases", *cases, "--min-time", str(min_time)],
+            work,
+        )
+    finally:
+        shutil.rmtree(work.parent, ignore_errors=True)
+    results = json.loads(out.strip().splitlines()[-1])
+    for case, result in results.items():
+        report(case, result)
+    return results
+
+
+def report(case, result):
+    print(
+        f"{case:<36} {result['ops_per_s']:10.0f} ops/s  mean {result['mean_ms']:8.3f} ms  "
+        f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms"
+    )
+
+
+def compare(baseline, current, threshold, p99_threshold):
+    # Returns the regressed case names; prints one line per case
+    regressions = []
+    for case in sorted(set(baseline["results"]) | set(current["results"])):
+        if case not in current["results"]:
+            print(f"{case:<36} missing from the current results")
+            continue
+        if case not in baseline["results"]:
+            print(f"{case:<36} new (no baseline)")
+            continue
+        old, new = baseline["results"][case], current["results"][case]
+        changes = {
+            "ops/s": (new["ops_per_s"] / old["ops_per_s"] - 1, -threshold),
+            "p50": (new["p50_ms"] / old["p50_ms"] - 1, threshold),
+            "p99": (new["p99_ms"] / old["p99_ms"] - 1, p99_threshold),
+        }
+        # ops/s regresses downwards, latencies upwards
+        failed = [
+            name for name, (change, limit) in changes.items()
+            if (change < limit if limit < 0 else change > limit)
+        ]
+        if failed:
+            regressions.append(case)
+        print(
+            f"{case:<36} " + "  ".join(f"{name} {change:+7.1%}" for name, (change, _) in changes.items())
+            + (f"  REGRESSED ({', '.join(failed)})" if failed else "")
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100_000, 1_000_000])
+    parser.add_argument("--cases", nargs="+", default=["*"], help="glob patterns over case names")
+    parser.add_argument("--min-time", type=float, default=3.0, help="seconds per case, over 3 rounds")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="fail on regressions against this results file")
+    parser.add_argument("--current", help="compare this results file instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--p99-threshold", type=float, default=0.5)
+    parser.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "emotai-suite"))
+    parser.add_argument("--child", choices=("seed", "api"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    def selected(case):
+        return any(fnmatch.fnmatch(case, pattern) for pattern in args.cases)
+
+    if args.child:
+        sys.path.insert(0, str(BACKEND_DIR))
+        if args.child == "seed":
+            return seed_database(args.rows[0])
+        print(json.dumps(api_cases(args.rows[0], selected, args.min_time)))
+        return
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        results = analysis_cases(selected, args.min_time)
+        for rows in args.rows:
+            if any(selected(f"api/{rows}/{name}") for name in ("suggest", "history", "analytics", "analytics_24h")):
+                results.update(api_results(rows, Path(args.db_dir), args.cases, args.min_time))
+        current = {
+            "revision": git_revision(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "results": results,
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nagainst {args.compare} (revision {baseline.get('revision')}):")
+        regressions = compare(baseline, current, args.threshold, args.p99_threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed beyond the thresholds")
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
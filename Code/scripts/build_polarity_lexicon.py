@@ -0,0 +1,33 @@
+"""Export TextBlob's pattern sentiment lexicon to backend/data/polarity_lexicon.tsv.
+
+The lexicon (PDDL licensed) is flattened to the per-word averages pattern
+itself uses when no part-of-speech tag is given, so the built-in "lexicon"
+polarity backend can score sentences without importing TextBlob.
+
+Run with ``python Code/scripts/build_polarity_lexicon.py``.
+"""
+import re
+from pathlib import Path
+
+from textblob.en import sentiment
+
+OUT = Path(__file__).resolve().parent.parent / "backend" / "data" / "polarity_lexicon.tsv"
+WORD = re.compile(r"^\w+$")
+
+
+def main():
+    sentiment.load()
+    rows = []
+    for word, senses in dict.items(sentiment):
+        if not WORD.match(word):
+            continue
+        polarity, _subjectivity, intensity = senses[None]
+        modifier = int(any(pos in senses for pos in sentiment.modifiers))
+        rows.append(f"{word}\t{polarity:.6g}\t{intensity:.6g}\t{modifier}")
+    rows.sort()
+    OUT.write_text("# word\tpolarity\tintensity\tmodifier\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    print(f"wrote {len(rows)} words to {OUT}")
+
+
+if __name__ == "__main__":
+    main()
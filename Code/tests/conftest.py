@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# app.py imports its sibling modules as top-level modules, as it does when
+# run from the backend directory
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+_fd, _db_path = tempfile.mkstemp(suffix=".db", prefix="emotai-test-")
+os.close(_fd)
+os.environ.setdefault("EMOTAI_DATABASE_URI", f"sqlite:///{_db_path}")
+os.environ.setdefault("EMOTAI_DB_PATH", _db_path + ".store")
+os.environ.setdefault("EMOTAI_WEBHOOK_SPOOL", _db_path + ".webhooks")
+os.environ.setdefault("EMOTAI_ADMIN_TOKEN", "test-admin-token")
+os.environ.setdefault("EMOTAI_WEBHOOK_VERIFICATION_TOKEN", "test-verification-token")
+os.environ.setdefault("EMOTAI_PREFERENCES", "1")
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    with app.test_client() as client:
+        yield client
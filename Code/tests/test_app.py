@@ -0,0 +1,313 @@
+def test_history_pages_with_cursor_and_feedback(client):
+    ids = []
+    for i in range(5):
+        res = client.post("/suggest", json={"message": f"I am so happy {i}!"})
+        ids.append(res.get_json()["message_id"])
+    client.post("/feedback", json={"message_id": ids[-1], "rating": 3, "comment": "nice"})
+
+    first = client.get("/history?limit=3").get_json()
+    assert [h["message_id"] for h in first["history"]] == ids[:1:-1]
+    assert first["history"][0]["feedback"] == {"rating": 3, "comment": "nice"}
+    second = client.get(f"/history?limit=3&cursor={first['next_cursor']}").get_json()
+    assert [h["message_id"] for h in second["history"]] == ids[1::-1]
+    assert second["next_cursor"] is None
+
+def test_feedback_rejects_invalid_ratings(client):
+    from app import app
+    from models import Feedback
+
+    message_id = client.post("/suggest", json={"message": "I am so happy!"}).get_json()["message_id"]
+    for rating in ("3", 7, 2.5, True):
+        assert client.post("/feedback", json={"message_id": message_id, "rating": rating}).status_code == 400
+    with app.app_context():
+        assert Feedback.query.filter_by(message_id=message_id).count() == 0
+
+def test_history_rejects_bad_cursor(client):
+    assert client.get("/history?cursor=not-a-cursor").status_code == 400
+
+def test_analytics_rollups_match_full_recount(client):
+    import rollups
+    from app import app
+
+    before = client.get("/analytics").get_json()["message_count"]
+    res = client.post("/suggest", json={"message": "Hello there. I am so happy!"})
+    client.post("/feedback", json={"message_id": res.get_json()["message_id"], "rating": 2})
+    client.post("/feedback", json={"message_id": res.get_json()["message_id"], "rating": 3})
+    stats = client.get("/analytics").get_json()
+    assert stats["message_count"] == before + 1
+    assert sum(stats["sentiment_stats"].values()) == stats["message_count"]
+    assert client.get("/analytics?hours=1").get_json()["message_count"] >= 1
+    assert client.get("/analytics?hours=0").status_code == client.get("/analytics?hours=-3").status_code == 400
+
+    client.post("/delete_user_data")
+    with app.app_context():
+        assert rollups.check() == []
+        rollups.backfill()
+        assert rollups.check() == []
+
+def test_rating_update_leaves_the_original_hour(client):
+    from datetime import datetime, timedelta, timezone
+
+    import rollups
+    from app import app
+    from models import db, Feedback, RollupCount
+
+    message_id = client.post("/suggest", json={"message": "I am so happy!"}).get_json()["message_id"]
+    client.post("/feedback", json={"message_id": message_id, "rating": 1})
+    earlier = datetime.now(timezone.utc) - timedelta(hours=5)
+    with app.app_context():
+        # As if the rating had been given five hours ago
+        Feedback.query.filter_by(message_id=message_id).one().created_at = earlier
+        rollups.apply_counts(rollups.rating_counts(None, 1))
+        rollups.apply_counts(rollups.rating_counts(1), when=earlier)
+        db.session.commit()
+        old_hour = RollupCount.query.filter_by(kind="rating", key="1", bucket=rollups.hour_bucket(earlier)).one().count
+
+    client.post("/feedback", json={"message_id": message_id, "rating": 3})
+    with app.app_context():
+        row = RollupCount.query.filter_by(kind="rating", key="1", bucket=rollups.hour_bucket(earlier)).one()
+        assert row.count == old_hour - 1
+
+def test_feedback_retries_a_locked_commit(client, monkeypatch):
+    import sqlite3
+
+    from sqlalchemy.exc import OperationalError
+
+    from app import app
+    from models import db, Feedback
+
+    message_id = client.post("/suggest", json={"message": "I am so happy!"}).get_json()["message_id"]
+    commit, calls = db.session.commit, []
+
+    def locked_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+        commit()
+
+    monkeypatch.setattr(db.session, "commit", locked_once)
+    assert client.post("/feedback", json={"message_id": message_id, "rating": 2}).status_code == 200
+    monkeypatch.undo()
+    assert len(calls) == 2
+    with app.app_context():
+        assert Feedback.query.filter_by(message_id=message_id).one().rating == 2
+
+def test_structured_sentiment_is_stored_and_migrated(client):
+    import json
+    import migrations
+    from app import app, agent
+    from models import db, Message, MessageSentence
+
+    res = client.post("/suggest", json={"message": "I feel really sad. Why?"}).get_json()
+    assert [s["sentiment"] for s in res["sentences"]] == ["sad", "confused"]
+    assert res["sentiment"] == "sad"
+    item = client.get("/history?limit=1").get_json()["history"][0]
+    assert item["explanation"] == res["explanation"]
+    assert item["sentences"] == res["sentences"]
+
+    with app.app_context():
+        legacy = Message(
+            user_id="legacy-user", text="I am so happy today!",
+            suggestion=json.dumps(agent.suggest_emojis("I am so happy today!").dict()),
+        )
+        db.session.add(legacy)
+        db.session.commit()
+        assert migrations.backfill_structured_sentiment(agent) >= 1
+        migrated = db.session.get(Message, legacy.id)
+        assert migrated.primary_sentiment == "happy"
+        assert MessageSentence.query.filter_by(message_id=legacy.id).count() == 1
+        assert "message" not in json.loads(migrated.suggestion)
+
+def test_write_behind_returns_usable_message_ids(client, monkeypatch):
+    import app as app_module
+    from models import Feedback, Message
+    from writebehind import WriteBehindWriter
+
+    writer = WriteBehindWriter(app_module.app, max_size=2, flush_interval=0.01, policy="sync")
+    monkeypatch.setattr(app_module, "write_behind", writer)
+    try:
+        ids = [
+            client.post("/suggest", json={"message": f"Hello number {i}!"}).get_json()["message_id"]
+            for i in range(6)
+        ]
+        assert len(set(ids)) == 6
+        assert client.post("/feedback", json={"message_id": ids[-1], "rating": 3}).status_code == 200
+        history = client.get("/history?limit=10").get_json()["history"]
+        assert [h["message_id"] for h in history] == ids[::-1]
+    finally:
+        writer.shutdown()
+    with app_module.app.app_context():
+        assert Message.query.filter(Message.id.in_(ids)).count() == 6
+        assert Feedback.query.filter_by(message_id=ids[-1]).count() == 1
+    assert writer.snapshot()["written"] == 6
+    assert writer.snapshot()["queue_depth"] == 0
+
+def test_write_behind_retries_and_isolates_failed_rows(client):
+    from datetime import datetime, timezone
+
+    import app as app_module
+    from models import Message
+    from writebehind import MessageRecord, WriteBehindWriter
+
+    writer = WriteBehindWriter(app_module.app, flush_interval=0.2, retry_delay=0)
+    write, calls = writer._write, []
+
+    def flaky_write(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        if any(record.text == "poison" for record in records):
+            raise RuntimeError("bad row")
+        write(records)
+
+    writer._write = flaky_write
+    suggestion = app_module.agent.suggest_emojis("I am so happy!").dict()
+    records = [
+        MessageRecord(writer.ids.next_id(), "wb-user", text, suggestion, datetime.now(timezone.utc))
+        for text in ("first", "poison", "last")
+    ]
+    try:
+        for record in records:
+            writer.submit(record)
+        assert writer.is_pending(str(records[0].id))  # ids arrive as JSON strings too
+        writer.flush()
+    finally:
+        writer.shutdown()
+    with app_module.app.app_context():
+        written = {m.text for m in Message.query.filter(Message.id.in_([r.id for r in records]))}
+    assert written == {"first", "last"}
+    assert writer.snapshot()["lost"] == 1 and writer.snapshot()["retries"] >= 1
+    assert not writer.is_pending(records[0].id)
+
+def test_write_behind_flush_waits_only_for_earlier_records(client):
+    import threading
+    from datetime import datetime, timedelta, timezone
+
+    import app as app_module
+    import rollups
+    from models import RollupCount
+    from writebehind import MessageRecord, WriteBehindWriter
+
+    writer = WriteBehindWriter(app_module.app, flush_interval=0.01)
+    write, writing = writer._write, threading.Event()
+    gates = {"first": threading.Event(), "second": threading.Event()}
+
+    def gated_write(records):
+        writing.set()
+        for record in records:
+            gates[record.text].wait()
+        write(records)
+
+    writer._write = gated_write
+    suggestion = app_module.agent.suggest_emojis("I am so happy!").dict()
+    earlier = datetime.now(timezone.utc) - timedelta(hours=3)
+    records = [
+        MessageRecord(writer.ids.next_id(), "wb-user", text, suggestion, earlier)
+        for text in ("first", "second")
+    ]
+    try:
+        writer.submit(records[0])
+        writing.wait(timeout=5)  # the writer thread holds a batch of just the first
+        flusher = threading.Thread(target=writer.flush)
+        flusher.start()
+        writer.submit(records[1])  # after the flush started, so not waited for
+        gates["first"].set()
+        flusher.join(timeout=5)
+        assert not flusher.is_alive() and writer.is_pending(records[1].id)
+    finally:
+        gates["second"].set()
+        writer.shutdown()
+    with app_module.app.app_context():
+        hour = RollupCount.query.filter_by(kind="sentiment", bucket=rollups.hour_bucket(earlier)).all()
+    assert sum(row.count for row in hour) == 2
+
+def test_suggest_stream_sends_sentence_events_then_done(client):
+    import json
+
+    res = client.post("/suggest/stream", json={"message": "I am so happy. I feel really sad. Why?"})
+    assert res.mimetype == "text/event-stream"
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in res.get_data(as_text=True).strip().split("\n\n")
+    ]
+    assert [e for e, _ in events] == ["sentence", "sentence", "sentence", "done"]
+    assert [d["sentence"] for _, d in events[:3]] == ["I am so happy.", "I feel really sad.", "Why?"]
+    done = events[-1][1]
+    stored = client.get("/history?limit=1").get_json()["history"][0]
+    assert stored["message_id"] == done["message_id"]
+    assert stored["emojis"] == done["emojis"]
+
+def test_lexicon_version_is_stored_and_reload_needs_admin(client):
+    res = client.post("/suggest", json={"message": "I am so happy!"}).get_json()
+    version = client.get("/stats/lexicon").get_json()["version"]
+    assert res["lexicon_version"] == version
+    assert client.get("/history?limit=1").get_json()["history"][0]["lexicon_version"] == version
+
+    assert client.post("/admin/lexicon/reload").status_code == 403
+    res = client.post("/admin/lexicon/reload", headers={"X-Admin-Token": "test-admin-token"})
+    assert res.status_code == 200
+    assert res.get_json()["reloaded"] is False
+
+def test_metrics_endpoint_and_profiler_toggle(client):
+    client.post("/suggest", json={"message": "I am so happy. I feel really sad."})
+    text = client.get("/metrics").data.decode()
+    for stage in ("split", "keywords", "emoji_selection", "serialize", "db_commit"):
+        assert f'emotai_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'emotai_requests_total{route="/suggest",method="POST",status="200"}' in text
+    assert 'emotai_stage_seconds_bucket{stage="split",le="+Inf"}' in text
+
+    assert client.post("/admin/profiler", json={"enabled": True}).status_code == 403
+    headers = {"X-Admin-Token": "test-admin-token"}
+    assert client.post("/admin/profiler", json={"enabled": True, "interval_ms": 0}, headers=headers).status_code == 400
+    assert client.post("/admin/profiler", json={"enabled": True, "interval_ms": 1}, headers=headers).get_json()["running"]
+    for i in range(20):
+        client.post("/suggest", json={"message": f"I love this {i}!"})
+    report = client.post("/admin/profiler", json={"enabled": False}, headers=headers).get_json()
+    assert not report["running"] and report["samples"] > 0
+    assert client.get("/admin/profiler?format=folded", headers=headers).status_code == 200
+
+def test_user_rows_are_written_with_the_first_message(client):
+    from sqlalchemy import event
+    import identity
+    from app import app, known_users
+    from models import db, User
+
+    commits = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn: commits.append(1)
+    event.listen(engine, "commit", record)
+    try:
+        res = client.get("/history")
+        token = res.headers["X-EmotAI-User"]
+        assert res.get_json()["history"] == [] and commits == []  # reads don't write
+    finally:
+        event.remove(engine, "commit", record)
+    with client.session_transaction() as session:
+        user_id = session["user_id"]
+    with app.app_context():
+        assert db.session.get(User, user_id) is None
+
+    # A client without the cookie keeps its identity through the token
+    cookieless = app.test_client()
+    message_id = cookieless.post("/suggest", json={"message": "I am so happy!"}, headers={"X-EmotAI-User": token}).get_json()["message_id"]
+    assert "X-EmotAI-User" not in client.get("/history").headers
+    assert client.get("/history").get_json()["history"][0]["message_id"] == message_id
+    assert known_users.missing([user_id]) == []
+    with app.app_context():
+        assert db.session.get(User, user_id) is not None
+    forged = cookieless.get("/history", headers={"X-EmotAI-User": token[:-2] + "xx"})
+    assert forged.get_json()["history"] == [] and "X-EmotAI-User" in forged.headers
+
+    # Purging revokes the id, in this worker right away and in others on refresh
+    copied_cookie = app.test_client()
+    with client.session_transaction() as session, copied_cookie.session_transaction() as copy:
+        copy["user_id"] = session["user_id"]
+    client.post("/delete_user_data")
+    revoked = app.test_client().get("/history", headers={"X-EmotAI-User": token})
+    assert "X-EmotAI-User" in revoked.headers  # a new id was minted
+    assert "X-EmotAI-User" in copied_cookie.get("/history").headers
+    other_worker = identity.RevokedUsers()
+    with app.app_context():
+        other_worker.refresh(db.session)
+    assert other_worker.is_revoked(user_id)
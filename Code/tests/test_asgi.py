@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def asgi_client():
+    from starlette.testclient import TestClient
+    from asgi import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_asgi_serves_the_flask_contract(asgi_client):
+    token = asgi_client.get("/history").headers["X-EmotAI-User"]
+    ids = [
+        asgi_client.post("/suggest", json={"message": f"I am so happy {i}!"}).json()["message_id"]
+        for i in range(3)
+    ]
+    res = asgi_client.post("/feedback", json={"message_id": ids[-1], "rating": 3, "comment": "nice"})
+    assert res.json() == {"msg": "Feedback recorded"}
+    assert asgi_client.post("/feedback", json={"rating": 3}).status_code == 400
+    assert asgi_client.post("/feedback", json={"message_id": ids[0], "rating": "3"}).status_code == 400
+
+    first = asgi_client.get("/history?limit=2").json()
+    assert [h["message_id"] for h in first["history"]] == ids[:0:-1]
+    assert first["history"][0]["feedback"] == {"rating": 3, "comment": "nice"}
+    assert first["history"][0]["sentiment"] == "happy"
+    second = asgi_client.get(f"/history?limit=2&cursor={first['next_cursor']}").json()
+    assert [h["message_id"] for h in second["history"]] == ids[:1]
+    assert asgi_client.get("/history?cursor=not-a-cursor").status_code == 400
+
+    stats = asgi_client.get("/analytics").json()
+    assert stats["message_count"] >= 3
+    assert stats["feedback_stats"]["3"] >= 1
+    assert asgi_client.get("/analytics?hours=x").status_code == 400
+    assert asgi_client.get("/analytics?hours=0").status_code == 400
+
+    before = stats["message_count"]
+    assert asgi_client.post("/delete_user_data").status_code == 200
+    assert asgi_client.get("/analytics").json()["message_count"] == before - 3
+    assert asgi_client.get("/history").json()["history"] == []
+    asgi_client.cookies.clear()
+    assert "X-EmotAI-User" in asgi_client.get("/history", headers={"X-EmotAI-User": token}).headers  # revoked
+
+
+def test_asgi_metrics_are_labelled_by_route(asgi_client):
+    asgi_client.post("/suggest", json={"message": "I am so happy!"})
+    asgi_client.get("/nowhere")
+    text = asgi_client.get("/metrics").text
+    assert 'emotai_requests_total{route="/suggest",method="POST",status="200"}' in text
+    assert 'emotai_requests_total{route="unmatched",method="GET",status="404"}' in text
+    assert asgi_client.get("/admin/profiler").status_code == 403
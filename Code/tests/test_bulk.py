@@ -0,0 +1,63 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from Code.backend import bulk
+
+MESSAGES = ["I am so happy today!", "I feel really sad. Why?", "hi", "I love this!", "lol what?"]
+
+def write_jsonl(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": f"m{i}", "message": MESSAGES[i % len(MESSAGES)]}) + "\n")
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_jsonl_resume_after_a_partial_write(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(source, 23)
+    args = [str(source), "-o", str(output), "--workers", "0", "--chunk-size", "5", "--seed", "1", "--quiet"]
+    totals = bulk.main(args)
+    assert (totals["records"], totals["chunks"]) == (23, 5)
+    complete = read_jsonl(output)
+    assert [row["id"] for row in complete] == [f"m{i}" for i in range(23)]
+    assert complete[1]["sentiment"] == "sad" and complete[0]["explanation"] is None
+
+    with pytest.raises(SystemExit):
+        bulk.main(args)  # refuses to overwrite without --resume/--overwrite
+
+    # Simulate a crash while writing chunk 4: its rows are cut short and the
+    # checkpoint only covers chunks 0-3
+    checkpoint_path = tmp_path / "out.jsonl.checkpoint"
+    checkpoint = json.loads(checkpoint_path.read_text())
+    lines = output.read_text(encoding="utf-8").splitlines(keepends=True)
+    checkpoint["done"] = [[0, 4]]
+    checkpoint["offset"] = len("".join(lines[:20]).encode("utf-8"))
+    checkpoint_path.write_text(json.dumps(checkpoint))
+    output.write_text("".join(lines[:21]) + '{"id": "m21", "emo', encoding="utf-8")
+
+    totals = bulk.main(args + ["--resume"])
+    assert (totals["records"], totals["skipped_chunks"]) == (3, 4)
+    assert read_jsonl(output) == complete
+
+def test_csv_to_sqlite_with_worker_processes(tmp_path):
+    source, output = tmp_path / "in.csv", tmp_path / "out.db"
+    with open(source, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "text"])
+        for i in range(40):
+            writer.writerow([i, MESSAGES[i % len(MESSAGES)]])
+    totals = bulk.main([
+        str(source), "-o", str(output), "--text-field", "text",
+        "--workers", "2", "--chunk-size", "7", "--unordered", "--quiet",
+    ])
+    assert totals["records"] == 40 and totals["peak_worker_rss_mb"] > 0
+    conn = sqlite3.connect(output)
+    rows = conn.execute("SELECT id, emojis, sentiment FROM scores").fetchall()
+    assert sorted(int(row[0]) for row in rows) == list(range(40))
+    assert all(json.loads(row[1]) for row in rows)
+    assert conn.execute("SELECT COUNT(*) FROM scores_checkpoint").fetchone()[0] == 6
@@ -0,0 +1,34 @@
+from Code.backend.cache import LRUCache
+from Code.backend.emotai import SentimentAnalyzer
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1, 1)
+
+def test_lru_respects_max_bytes():
+    cache = LRUCache(max_entries=0, max_bytes=300)
+    for i in range(10):
+        cache.put(f"key-{i}", (("happy", 2),))
+    assert cache.bytes <= 300
+    assert cache.evictions > 0
+
+def test_long_sentences_count_against_max_bytes():
+    analyzer = SentimentAnalyzer(cache=LRUCache(max_entries=0, max_bytes=50_000))
+    long_sentence = "I am so happy " * 700  # ~10k chars
+    for i in range(10):
+        analyzer.detect_sentiment(f"{long_sentence}{i}")
+    assert analyzer.cache.bytes <= 50_000
+    assert len(analyzer.cache) < 10 and analyzer.cache.evictions > 0
+
+def test_detect_sentiment_cache_hits():
+    analyzer = SentimentAnalyzer(cache=LRUCache(max_entries=10))
+    first = analyzer.detect_sentiment("I am so happy today!")
+    second = analyzer.detect_sentiment("I am so happy today!")
+    assert first == second
+    assert analyzer.cache.hits == 1 and analyzer.cache.misses == 1
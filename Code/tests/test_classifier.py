@@ -0,0 +1,76 @@
+import threading
+import time
+
+from Code.backend.classifier import MicroBatcher, to_sentiments
+from Code.backend.emotai import AIAgent
+
+
+class FakeClassifier:
+    # Labels "...irony..." sentences as irony, everything else as joy/sadness
+    def __init__(self, delay=0.0, gate=None):
+        self.delay = delay
+        self.gate = gate
+        self.batches = []
+
+    def predict(self, texts):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.batches.append(len(texts))
+        return [
+            [("irony", 0.93), ("joy", 0.05)] if "irony" in text else [("joy", 0.7), ("sadness", 0.4)]
+            for text in texts
+        ]
+
+
+def test_concurrent_requests_share_micro_batches():
+    fake = FakeClassifier(delay=0.01)
+    batcher = MicroBatcher(fake, max_batch=8, max_wait=0.02)
+    results = {}
+
+    def request(i):
+        results[i] = batcher.classify([f"sentence {i}", f"irony {i}"])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results[i][1][0] == ("irony", 0.93) for i in range(12))
+    assert 1 < max(fake.batches) <= 8 and sum(fake.batches) == 24
+    assert batcher.snapshot()["mean_batch"] > 1
+    batcher.shutdown()
+
+
+def test_saturated_or_slow_model_falls_back_to_the_rules():
+    gate = threading.Event()
+    batcher = MicroBatcher(FakeClassifier(gate=gate), max_batch=1, max_wait=0, max_queue=2, timeout=0.05)
+    try:
+        assert batcher.classify(["a"]) is None  # timed out: the model is stuck
+        assert batcher.classify(["b", "c", "d"]) is None  # queue full
+        assert batcher.snapshot()["saturated"] == 1 and batcher.snapshot()["timeouts"] == 1
+    finally:
+        gate.set()
+        batcher.shutdown()
+
+    gate = threading.Event()
+    agent = AIAgent(seed=0, model=MicroBatcher(FakeClassifier(gate=gate), max_queue=1, timeout=0.01))
+    try:
+        assert agent.suggest_emojis("I am so happy today!").sentiment == "happy"
+    finally:
+        gate.set()
+        agent.model.shutdown()
+
+
+def test_predictions_map_onto_lexicon_sentiments():
+    assert to_sentiments([("joy", 0.95), ("sadness", 0.4)]) == {"happy": 3, "sad": 1}
+    assert to_sentiments([("neutral", 0.9), ("anger", 0.05)]) == {}
+    assert to_sentiments([("fear", 0.7)], known={"happy"}) == {}
+
+    agent = AIAgent(seed=0, model=MicroBatcher(FakeClassifier()))
+    suggestion = agent.suggest_emojis("The meeting is at 3pm. What an irony.")
+    first, second = suggestion.sentences
+    assert (first["sentiment"], first["mixed"]) == ("happy", "happy_sad")  # was neutral
+    assert any(name == "sarcasm" for name, _ in agent.sentiment.merge_prediction([("neutral", 1)], [("irony", 0.93)]))
+    assert second["emojis"]
+    agent.model.shutdown()
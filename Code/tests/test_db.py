@@ -1,5 +1,9 @@
-from Code.backend.emotai import store_suggestion, fetch_user_history, EmojiSuggestion
-from Code.backend.db import init_db
+import threading
+
+import pytest
+
+from Code.backend.emotai import EmojiSuggestion
+from Code.backend.db import init_db, store_suggestion, fetch_user_history, fetch_user_preferences, transaction
 
 def test_store_and_fetch_suggestion():
     init_db()
@@ -13,4 +17,26 @@ def test_store_and_fetch_suggestion():
     store_suggestion(username, msg, suggestion)
     history = fetch_user_history(username)
     assert any(msg in h["message"] for h in history)
-    assert any("❤️" in h["emojis"] for h in history)
\ No newline at end of file
+    assert any("❤️" in h["emojis"] for h in history)
+
+def test_concurrent_writers_upsert_preferences():
+    init_db()
+    suggestion = EmojiSuggestion(emojis=["😊", "😊", "🎉"], message="hi")
+    threads = [
+        threading.Thread(target=lambda: [store_suggestion("busyuser", "hi", suggestion) for _ in range(10)])
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetch_user_preferences("busyuser")[:2] == ["😊", "🎉"]
+
+def test_transaction_keeps_the_error_when_sqlite_already_rolled_back():
+    init_db()
+    with pytest.raises(ValueError, match="original error"):
+        with transaction() as db:
+            db.execute("ROLLBACK")  # as SQLite does itself after e.g. SQLITE_FULL
+            raise ValueError("original error")
+    with transaction() as db:  # the pooled connection is usable again
+        assert db.in_transaction
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+def start_receiver(fail_first=0):
+    # Answers 503 to the first `fail_first` deliveries, then 200
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                calls[0] += 1
+                failed = calls[0] <= fail_first
+                if not failed:
+                    received.append(body)
+            self.send_response(503 if failed else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    lock, calls = threading.Lock(), [0]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def test_webhook_events_are_scored_and_delivered_with_retries(client, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module.webhooks, "retry_delay", 0.01)
+    server, received = start_receiver(fail_first=2)
+    url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+    assert client.post("/integrations/webhook/targets", json={"url": url}).status_code == 403
+    res = client.post("/integrations/webhook/targets", json={"url": url, "concurrency": 2}, headers=ADMIN)
+    assert res.status_code == 201
+    target_id = res.get_json()["id"]
+    try:
+        challenge = {"type": "url_verification", "challenge": "abc"}
+        assert client.post("/integrations/webhook", json=challenge).status_code == 403
+        res = client.post("/integrations/webhook", json={**challenge, "token": "test-verification-token"})
+        assert res.get_json() == {"challenge": "abc"}
+        assert client.post("/integrations/webhook", json={"user": "U1"}).status_code == 400
+        payloads = [
+            {"type": "event_callback", "event": {"type": "message", "text": "I am so happy today!"}},
+            {"text": "This is terrible, I am so angry."},
+            {"message": "Thanks a lot!"},
+        ]
+        ids = []
+        for payload in payloads:
+            res = client.post("/integrations/webhook", json=payload)
+            assert res.status_code == 202
+            ids.append(res.get_json()["event_id"])
+        for _ in range(200):
+            stats = client.get("/integrations/stats").get_json()
+            if stats["delivered"] == 3:
+                break
+            time.sleep(0.02)
+        assert stats["retried"] == 2 and stats["pending_deliveries"] == stats["dead_deliveries"] == 0
+        by_id = {body["event_id"]: body for body in received}
+        assert sorted(by_id) == sorted(ids)
+        for event_id, payload in zip(ids, payloads):
+            assert by_id[event_id]["payload"] == payload
+            assert by_id[event_id]["emojis"]
+        assert by_id[ids[0]]["sentiment"] == "happy"
+    finally:
+        assert client.delete(f"/integrations/webhook/targets/{target_id}", headers=ADMIN).status_code == 200
+        server.shutdown()
+
+
+def test_webhook_requires_a_valid_signature_when_a_secret_is_set(client, monkeypatch):
+    import hashlib
+    import hmac
+
+    import integrations
+
+    monkeypatch.setattr(integrations, "SIGNING_SECRET", "s3cret")
+    body = json.dumps({"type": "url_verification", "challenge": "abc"}).encode()
+
+    def signed(timestamp, secret="s3cret"):
+        digest = hmac.new(secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+        return {"X-Slack-Request-Timestamp": str(timestamp), "X-Slack-Signature": f"v0={digest}"}
+
+    def post(headers):
+        return client.post("/integrations/webhook", data=body, content_type="application/json", headers=headers)
+
+    assert post({}).status_code == 401
+    assert post(signed(int(time.time()), secret="wrong")).status_code == 401
+    assert post(signed(int(time.time()) - 3600)).status_code == 401  # replayed
+    assert post(signed(int(time.time()))).get_json() == {"challenge": "abc"}
+
+
+def test_webhook_queue_is_bounded_and_shared_by_workers(tmp_path):
+    from flask import Flask
+
+    import integrations
+    from emotai import AIAgent
+
+    class BlockedAgent:
+        # Keeps claimed events unscored until released
+        def __init__(self):
+            self.release = threading.Event()
+
+        def suggest_emojis_batch(self, messages, **kwargs):
+            self.release.wait()
+            return AIAgent().suggest_emojis_batch(messages, **kwargs)
+
+    agent = BlockedAgent()
+    app = Flask(__name__)
+    pipeline = integrations.WebhookPipeline(agent, path=tmp_path / "spool.db", max_queue=2, targets=())
+    integrations.init_app(app, agent, pipeline)
+    assert pipeline.spool is None  # nothing is opened until first use
+    client = app.test_client()
+    try:
+        assert [client.post("/integrations/webhook", json={"text": "hi"}).status_code for _ in range(3)] == [202, 202, 503]
+    finally:
+        agent.release.set()
+        pipeline.shutdown()
+
+    # Two workers on one spool never claim the same event
+    first, second = integrations.Spool(tmp_path / "workers.db"), integrations.Spool(tmp_path / "workers.db")
+    ids = [first.add_event('{"text": "hi"}', max_queue=10) for _ in range(3)]
+    assert second.add_event('{"text": "hi"}', max_queue=4) is not None
+    assert second.add_event('{"text": "hi"}', max_queue=4) is None
+    claimed = [row[0] for row in first.claim_events(3, lease=60)]
+    assert claimed == ids and len(second.claim_events(10, lease=60)) == 1
+    assert second.claim_events(10, lease=60) == [] and first.pending() == second.pending() == 4
+    first.release_events(claimed[:1])  # e.g. scoring failed
+    assert [row[0] for row in second.claim_events(10, lease=60)] == claimed[:1]
+    first.close()
+    second.close()
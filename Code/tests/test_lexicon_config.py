@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from Code.backend.cache import LRUCache
+from Code.backend.emotai import AIAgent, SentimentAnalyzer
+from Code.backend.lexicon_config import DEFAULT_LEXICON_PATH, load_lexicon
+
+def write_lexicon(path, version, happy_mild):
+    data = json.loads(DEFAULT_LEXICON_PATH.read_text(encoding="utf-8"))
+    data["version"] = version
+    data["emoji_library"]["happy"]["mild"] = happy_mild
+    data["sentiment_map"]["happy"].append("sunny")
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+def test_reload_swaps_config_and_keeps_old_on_error(tmp_path):
+    path = tmp_path / "lexicon.json"
+    write_lexicon(path, "1", ["🙂"])
+    analyzer = SentimentAnalyzer(cache=LRUCache(100), config=load_lexicon(path), seed=0)
+    agent = AIAgent(seed=0)
+    agent.sentiment = analyzer
+    old = analyzer.config
+    assert agent.suggest_emojis("A sunny day").lexicon_version == "1"
+    assert analyzer.reload_config() is False
+
+    write_lexicon(path, "2", ["🌞"])
+    assert analyzer.reload_config() is True
+    assert analyzer.config.version == "2" and analyzer.config is not old
+    suggestion = agent.suggest_emojis("A sunny day")
+    assert suggestion.lexicon_version == "2"
+    assert suggestion.emojis == ["🌞"]
+    # The old version is untouched for requests that still hold it
+    assert old.emoji_library["happy"]["mild"] == ("🙂",)
+    assert analyzer.get_emojis([("happy", 1)], config=old)[0] == ["🙂"]
+
+    path.write_text("{not json", encoding="utf-8")
+    with pytest.raises(ValueError):
+        analyzer.reload_config()
+    assert analyzer.config.version == "2"
+
+def test_config_is_immutable():
+    config = load_lexicon()
+    with pytest.raises(TypeError):
+        config.emoji_library["happy"] = {}
+    with pytest.raises(TypeError):
+        config.sentiment_map["happy"] = ("x",)
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from Code.backend.emotai import SentimentAnalyzer
+from Code.backend.polarity import LexiconScorer, TextBlobScorer, polarity_bucket
+
+CORPUS = Path(__file__).parent / "data" / "polarity_corpus.tsv"
+
+def load_corpus():
+    rows = []
+    for line in CORPUS.read_text(encoding="utf-8").splitlines():
+        if line and not line.startswith("#"):
+            label, sentence = line.split("\t", 1)
+            rows.append((label, sentence))
+    return rows
+
+def bucket_label(polarity):
+    bucket = polarity_bucket(polarity)
+    return bucket[0] if bucket else "neutral"
+
+def test_lexicon_scorer_agrees_with_textblob():
+    corpus = load_corpus()
+    textblob, lexicon = TextBlobScorer(), LexiconScorer()
+    agree = exact = fast_correct = blob_correct = 0
+    for label, sentence in corpus:
+        slow, fast = textblob.score(sentence), lexicon.score(sentence)
+        agree += bucket_label(slow) == bucket_label(fast)
+        exact += polarity_bucket(slow) == polarity_bucket(fast)
+        blob_correct += bucket_label(slow) == label
+        fast_correct += bucket_label(fast) == label
+    n = len(corpus)
+    print(
+        f"\npolarity parity on {n} sentences: label agreement {agree / n:.1%}, "
+        f"bucket agreement {exact / n:.1%}, accuracy textblob {blob_correct / n:.1%}, "
+        f"lexicon {fast_correct / n:.1%}"
+    )
+    assert agree / n >= 0.9
+    assert fast_correct >= blob_correct - 2
+
+def test_lexicon_scorer_negation_and_modifiers():
+    scorer = LexiconScorer()
+    assert scorer.score("very good") > scorer.score("good") > 0
+    assert scorer.score("not good") < 0
+    assert scorer.score("no words here xyz") == 0.0
+
+def test_analyzer_uses_configured_backend():
+    analyzer = SentimentAnalyzer(polarity="lexicon")
+    assert isinstance(analyzer.scorer, LexiconScorer)
+    assert analyzer.detect_sentiment("I feel really sad.")[0][0] == "sad"
+
+def test_analyzer_loads_backend_lazily():
+    analyzer = SentimentAnalyzer(polarity="lexicon")
+    assert analyzer._scorer is None
+    analyzer.warm_up()
+    assert isinstance(analyzer._scorer, LexiconScorer)
+    with pytest.raises(ValueError):
+        SentimentAnalyzer(polarity="no-such-backend")
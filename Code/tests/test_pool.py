@@ -0,0 +1,26 @@
+from Code.backend.emotai import AIAgent, SentimentAnalyzer
+from Code.backend.pool import AnalysisPool
+
+SENTENCES = ["I am so happy today!", "I feel really sad.", "Why?"]
+
+def test_pool_matches_inline_and_falls_back():
+    inline = SentimentAnalyzer()
+    pool = AnalysisPool(1, timeout=30.0, chunk_size=2).start()
+    try:
+        expected = inline.analyze_batch(SENTENCES)
+        assert pool.analyze_batch(SENTENCES, fallback=inline.analyze_batch) == expected
+        assert pool.snapshot()["completed"] == 2
+
+        result = pool.analyze_batch(SENTENCES * 50, fallback=inline.analyze_batch)
+        assert result == expected * 50
+        assert pool.snapshot()["saturated"] == 1
+
+        pool.timeout, pool.chunk_size = 0.0, 64
+        result = pool.analyze_batch(SENTENCES * 50, fallback=inline.analyze_batch)
+        assert result == expected * 50
+        assert pool.snapshot()["timeouts"] == 1
+
+        agent = AIAgent(pool=pool)
+        assert len(agent.suggest_emojis("I am so happy today! Why?").sentences) == 2
+    finally:
+        pool.shutdown()
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from Code.backend.emotai import SentimentAnalyzer
+from Code.backend.preferences import PreferenceCache
+
+def test_usage_and_ratings_rank_and_persist():
+    cache = PreferenceCache(flush_interval=60)
+    assert cache.ranking("pref-user") is None  # first sight: loaded in the background
+    cache.record_usage("pref-user", ["😄", "😄", "🙂"])
+    cache.record_rating("pref-user", ["🙂"], 3)
+    cache.flush()
+    assert cache.ranking("pref-user") == {"🙂": 4, "😄": 2}
+    cache.record_rating("pref-user", ["🙂"], 1, previous=3)
+    assert list(cache.ranking("pref-user")) == ["😄"]
+    cache.shutdown()
+
+    fresh = PreferenceCache(flush_interval=60)
+    fresh.ranking("pref-user")
+    fresh.flush()
+    assert fresh.ranking("pref-user") == {"😄": 2}
+    stats = fresh.snapshot()
+    assert (stats["hits"], stats["misses"]) == (1, 1) and stats["loads"] >= 1
+    fresh.forget("pref-user")
+    fresh.ranking("pref-user")
+    fresh.flush()
+    assert fresh.ranking("pref-user") == {}
+    fresh.shutdown()
+
+def test_eviction_keeps_unflushed_deltas():
+    cache = PreferenceCache(max_users=1, flush_interval=60)
+    cache.record_usage("evicted-a", ["🎉"])
+    cache.record_usage("evicted-b", ["🥳"])
+    assert cache.snapshot()["evictions"] == 1
+    cache.ranking("evicted-a")
+    cache.flush()
+    assert cache.ranking("evicted-a") == {"🎉": 1}
+    cache.shutdown()
+
+def test_failed_flushes_are_logged_and_retried(monkeypatch, caplog):
+    import Code.backend.preferences as preferences
+
+    cache = PreferenceCache(flush_interval=60)
+    write = preferences.add_user_preference_stats
+
+    def failing_write(rows):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(preferences, "add_user_preference_stats", failing_write)
+    cache.record_usage("flaky-user", ["🎈"])
+    cache.flush()
+    assert cache.snapshot()["flush_errors"] == 1
+    assert "failed to flush 1 rows" in caplog.text and "database is locked" in caplog.text
+    monkeypatch.setattr(preferences, "add_user_preference_stats", write)
+    cache.flush()
+    assert cache.snapshot()["flushed_rows"] == 1
+
+    monkeypatch.setattr(preferences, "add_user_preference_stats", failing_write)
+    cache.record_usage("flaky-user", ["🎈"])
+    cache.shutdown()
+    assert "1 rows for 1 users were not written before shutdown" in caplog.text
+
+def test_get_emojis_prefers_the_users_emoji():
+    cache = PreferenceCache(flush_interval=60)
+    analyzer = SentimentAnalyzer(seed=0, preferences=cache)
+    cache.record_usage("ranked-user", ["😀"] * 30)
+    cache.flush()
+    picks = Counter(analyzer.get_emojis([("happy", 1)], username="ranked-user")[0][0] for _ in range(200))
+    assert picks.most_common(1)[0][0] == "😀" and picks["😀"] > 100
+    assert len(picks) > 1  # still a weighted random choice
+    others = {analyzer.get_emojis([("happy", 1)], username="someone-else")[0][0] for _ in range(20)}
+    assert len(others) > 1
+    cache.shutdown()
@@ -0,0 +1,49 @@
+import time
+
+
+def rollup_drift():
+    import rollups
+
+    return {(kind, key): stored - expected for kind, key, stored, expected in rollups.check()}
+
+
+def test_background_purge_empties_both_stores_in_batches(client, monkeypatch):
+    import app as app_module
+    import db as store
+
+    monkeypatch.setattr(app_module.purger, "batch_size", 3)
+    monkeypatch.setattr(app_module.purger, "pause", 0)
+    ids = [
+        client.post("/suggest", json={"message": f"I am so happy {i}. Why?"}).get_json()["message_id"]
+        for i in range(7)
+    ]
+    client.post("/feedback", json={"message_id": ids[0], "rating": 3})
+    with client.session_transaction() as sess:
+        user_id = sess["user_id"]
+    store.init_db()
+    for i in range(4):
+        store.store_suggestion(user_id, "hi", app_module.agent.suggest_emojis("I am so happy!"))
+        store.record_emoji_usage(user_id, "😀", "happy")
+    store.store_feedback(user_id, "hi", "nice", 3)
+    with app_module.app.app_context():
+        drift = rollup_drift()  # other tests insert rows without rollups
+
+    res = client.post("/delete_user_data", json={"background": True})
+    assert res.status_code == 202
+    status_url = res.get_json()["status_url"]
+    for _ in range(100):
+        status = client.get(status_url).get_json()
+        if status["state"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert status["state"] == "done"
+    assert status["deleted"]["message"] == 7 and status["deleted"]["feedback"] == 1
+    assert status["deleted"]["store.suggestions"] == 4 and status["deleted"]["store.emoji_analytics"] == 4
+    assert status["batches"] >= 3 + 2 + 2  # 7 messages in threes, 4 legacy rows per table
+
+    with app_module.app.app_context():
+        assert rollup_drift() == drift
+    with store.get_db() as conn:
+        for table in store.PURGE_TABLES:
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE username=?", (user_id,)).fetchone()[0] == 0
+    assert client.get("/delete_user_data/status/unknown").status_code == 404
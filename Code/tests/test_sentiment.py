@@ -1,4 +1,5 @@
-from Code.backend.emotai import SentimentAnalyzer
+from Code.backend.document import Document
+from Code.backend.emotai import SENTENCE_SPLIT, AIAgent, SentimentAnalyzer
 
 def test_happy_sentiment():
     analyzer = SentimentAnalyzer()
@@ -14,4 +15,54 @@ def test_mixed_emotion():
     analyzer = SentimentAnalyzer()
     sentiments = analyzer.detect_sentiment("I'm happy but also a bit sad.")
     mixed = analyzer.get_mixed_emotion(sentiments)
-    assert mixed == "happy_sad"
\ No newline at end of file
+    assert mixed == "happy_sad"
+
+
+def test_lexicon_matches_keywords_and_modifiers():
+    analyzer = SentimentAnalyzer()
+    words = analyzer.lexicon.tokenize("i am extremely happy and a little mad")
+    result = analyzer.lexicon.apply(words, {"sad": 2})
+    assert result == {"sad": 2, "happy": 3, "angry": 1}
+    assert analyzer.lexicon.apply(analyzer.lexicon.tokenize("amazing"), {}) == {"excited": 3}
+    assert analyzer.lexicon.is_sarcastic("oh yeah right")
+
+def test_suggest_emojis_batch_keeps_input_order():
+    agent = AIAgent()
+    messages = ["I am so happy today!", "", "I feel really sad. Why?", "I am so happy today!"]
+    results = agent.suggest_emojis_batch(messages)
+    assert [r.message for r in results] == messages
+    assert results[1].emojis == []
+    assert [s["sentence"] for s in results[2].sentences] == ["I feel really sad.", "Why?"]
+    single = agent.suggest_emojis("I feel really sad. Why?")
+    assert [s["explanation"] for s in results[2].sentences] == [s["explanation"] for s in single.sentences]
+
+def test_seeded_emoji_choice_is_reproducible():
+    messages = ["I am so happy today!", "I'm happy but also a bit sad.", "Hello! What?"] * 5
+    first = [s.emojis for s in AIAgent(seed=7).suggest_emojis_batch(messages)]
+    second = [s.emojis for s in AIAgent(seed=7).suggest_emojis_batch(messages)]
+    assert first == second
+
+def test_get_emojis_tables_and_lazy_explanations():
+    analyzer = SentimentAnalyzer(seed=0)
+    emojis, explanation = analyzer.get_emojis([("happy", 3), ("sad", 2)])
+    assert explanation == "Mixed emotions detected: happy + sad."
+    emojis, explanation = analyzer.get_emojis([("love", 2), ("danger", 1)])
+    assert emojis[0] in analyzer.emoji_library["love"]["moderate"]
+    assert explanation == "Primary sentiment: love (moderate). Secondary sentiment (danger) not strong enough for emoji."
+    emojis, explanation = analyzer.get_emojis([("sarcasm", 1)], explain=False)
+    assert emojis[0] in analyzer.emoji_library["neutral"]["mild"] and explanation is None
+    suggestion = AIAgent(seed=0).suggest_emojis("I feel really sad. Why?", explain=False)
+    assert suggestion.explanation is None
+    assert [s["explanation"] for s in suggestion.sentences] == [None, None]
+
+def test_document_matches_per_sentence_analysis():
+    analyzer = SentimentAnalyzer(seed=0)
+    for message in ("  Oh YEAH RIGHT, so happy!!  Not  sad?\tWhat. . x...\n", "İstanbul was great... really?"):
+        doc = Document(message)
+        texts = doc.texts()
+        assert texts == [piece.strip() for piece in SENTENCE_SPLIT.split(message.strip()) if piece.strip()]
+        for i, sent in enumerate(texts):
+            lower, start, end = doc.lowered(i)
+            assert analyzer.lexicon.tokenize(lower, start, end) == analyzer.lexicon.tokenize(sent.lower())
+            assert analyzer._classify(sent, doc=doc, index=i) == analyzer._classify(sent)
+    assert Document(" \n").texts() == []